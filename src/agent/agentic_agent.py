@@ -1,23 +1,30 @@
 import os
 import uuid
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable, Tuple
 from datetime import datetime
 import json
+import time
+import asyncio
 from openai import AsyncOpenAI
 
 from src.agent.planning.planning import planning
 from src.agent.code_act import complete_code_act
 from src.agent.task_manager import TaskManager
+from src.agent.scheduler import TaskScheduler
 from src.agent.prompt import auto_reply, generate_result
 from src.utils.llm import call as call_llm
+from src.utils.telemetry import get_telemetry
+from src.utils.deadline import Deadline, get_deadline
 from src.utils.message import MessageFormatter
+from src.utils.blob_store import resolve_blobs
 from src.models.file import File
 from src.utils.planning import get_todo_md
 from src.runtime import LocalRuntime
 # from src.runtime.docker_runtime import DockerRuntime
 from src.logger import get_logger
 from .memory.conversation_memory import ConversationMemory
+from .memory.local_memory import cancel_summarizations
 from src.agent.prompt.system import SYSTEM_PROMPT, TOOL_PROMPT
 from src.tools import ToolManager
 
@@ -56,24 +63,66 @@ class AgenticAgent:
         
         self.on_token_stream = self.context.get('on_token_stream')
         self.is_stop = False
+        self.timing: Dict[str, Any] = {}
+        # 本次运行各类失败的重试次数与耗时（按任务汇总）
+        self.retry_stats: Dict[str, Dict[str, Any]] = {}
+        # 当前运行的任务树根节点，stop()通过取消它中断进行中的LLM请求、子进程和任务循环
+        self._run_task: Optional[asyncio.Task] = None
         
         self.logger.info('AgenticAgent initialized.')
 
-    async def run(self, user_input: str) -> Dict[str, Any]:
+    async def run(self, user_input: str, resume: bool = False) -> Dict[str, Any]:
+        """
+        运行代理：整个运行在一个可取消的任务中执行
+        
+        Args:
+            user_input: 用户输入
+            resume: 恢复模式，对话已有完整的任务规划时跳过规划和已完成的任务，从中断处继续执行
+            
+        Returns:
+            Dict[str, Any]: 运行结果
+        """
+        self._run_task = asyncio.ensure_future(self._run(user_input, resume))
+        try:
+            return await self._run_task
+        except asyncio.CancelledError:
+            # 仅吞掉stop()发起的取消，外部取消继续向上传播
+            if not self.is_stop or not self._run_task.cancelled():
+                raise
+            self.logger.info('Agent stopped.')
+            return {"status": "stopped"}
+        finally:
+            self._run_task = None
+            # 运行结束后任务记忆的后台摘要已无用处，取消以免继续消耗LLM调用
+            await cancel_summarizations(self.context.get('conversation_id', 'default'))
+
+    async def _run(self, user_input: str, resume: bool = False) -> Dict[str, Any]:
         """运行代理"""
         try:
-            # 1. 记录用户输入
-            self.memory.add_message("user", user_input)
-            
-            # 2. 规划阶段
-            await self.plan(user_input)
-            if self.is_stop:
-                self.logger.info('Agent stopped.')
-                return {"status": "stopped"}
+            # 整个会话的截止时间，随context传递给规划、思考和动作各阶段
+            deadline = Deadline(self.context['config'].AGENT_RUN_TIMEOUT)
+            self.context['deadline'] = deadline
             
-            # 3. 执行阶段
-            self.logger.info('====== start execute ======')
-            results = await self.execute()
+            if resume and self.task_manager.planned and self.task_manager.get_tasks():
+                # 恢复模式：沿用已有的任务规划，跳过已完成的任务
+                results = await deadline.run(self.resume_execute(), 'conversation')
+            elif self.context['config'].AGENT_PIPELINE_EXECUTION:
+                # 1. 记录用户输入
+                self.memory.add_message("user", user_input)
+                # 2-3. 流水线模式：规划产出第一个任务后即开始执行
+                results = await deadline.run(self.plan_and_execute(user_input), 'conversation')
+            else:
+                # 1. 记录用户输入
+                self.memory.add_message("user", user_input)
+                # 2. 规划阶段
+                await deadline.run(self.plan(user_input), 'conversation')
+                if self.is_stop:
+                    self.logger.info('Agent stopped.')
+                    return {"status": "stopped"}
+                
+                # 3. 执行阶段
+                self.logger.info('====== start execute ======')
+                results = await deadline.run(self.execute(), 'conversation')
             if self.is_stop:
                 self.logger.info('Agent stopped.')
                 return {"status": "stopped"}
@@ -84,8 +133,11 @@ class AgenticAgent:
             # 5. 返回最终结果
             return {
                 "status": "success",
-                "results": results,
-                "summary": summary
+                # 任务结果中只保存了blob引用，返回给调用方前解析为原文
+                "results": resolve_blobs(results),
+                "summary": summary,
+                "timing": self.timing,
+                "retries": self.retry_stats
             }
             
         except Exception as e:
@@ -96,6 +148,12 @@ class AgenticAgent:
                 "status": "failed",
                 "error": error_msg
             }
+        finally:
+            # 写入LLM调用遥测汇总（与task_log.md同目录）
+            get_telemetry().write_summary(
+                self.context['conversation_id'],
+                self.context.get('log_file', 'task_log.md')
+            )
     
     def _parse_tool_parameters(self, params_text: str) -> Dict[str, Any]:
         """解析工具参数"""
@@ -112,8 +170,14 @@ class AgenticAgent:
     
 
 
-    async def plan(self, goal: str) -> None:
-        """任务规划阶段"""
+    async def plan(self, goal: str, on_task: Optional[Callable[[Dict[str, Any]], Any]] = None) -> None:
+        """
+        任务规划阶段
+        
+        Args:
+            goal: 用户目标
+            on_task: 可选，每个任务生成完毕并加入任务列表后立即调用（流水线模式）
+        """
         self.logger.info('Planning phase started.')
         try:
             # 1. 获取文件列表
@@ -127,18 +191,31 @@ class AgenticAgent:
             # todo: 暂时关闭之前的执行结果
             previous_result = ''
             
-            # 3. 生成任务计划
-            planned_tasks = await planning(goal, files, previous_result, self.context['conversation_id']) or []
+            # 3. 生成任务计划：每个任务的JSON生成完毕即加入任务列表并增量更新todo.md
+            await self.task_manager.set_tasks([])
             
-            # 4. 设置任务，添加必要的上下文信息
-            for task in planned_tasks:
+            def on_planned_task(task: Dict[str, Any]) -> None:
                 task['conversation_id'] = self.context['conversation_id']
-                task['on_token_stream'] = self.on_token_stream
-                
-            await self.task_manager.set_tasks(planned_tasks)
+                task = self.task_manager.add_task(task)
+                self._write_todo()
+                if self.on_token_stream:
+                    self.on_token_stream(MessageFormatter.format({
+                        'status': 'running',
+                        'action_type': 'plan',
+                        'content': task.get('title', '')
+                    }))
+                if on_task:
+                    on_task(task)
+            
+            await get_deadline(self.context).run(
+                planning(goal, files, previous_result, self.context['conversation_id'], self.on_token_stream, on_planned_task),
+                'planning',
+                self.context['config'].AGENT_PLANNING_TIMEOUT
+            )
+            self.task_manager.mark_planned()
             
-            # 5. 发送规划成功消息
-            tasks = await self.task_manager.get_tasks()
+            # 4. 发送规划成功消息
+            tasks = self.task_manager.get_tasks()
             msg = MessageFormatter.format({
                 'status': 'success',
                 'action_type': "plan",
@@ -149,8 +226,7 @@ class AgenticAgent:
             await MessageFormatter.save_to_db(msg, self.context['conversation_id'])
             self.logger.info(f'Planning completed. {len(tasks)} tasks generated.')
             
-            # 6. 生成并写入TODO文件
-            dir_name = f"Conversation_{self.context['conversation_id'][:6]}"
+            # 5. 生成并写入TODO文件
             uuid_str = str(uuid.uuid4())
             
             # 发送TODO文件写入开始消息
@@ -164,9 +240,7 @@ class AgenticAgent:
             await MessageFormatter.save_to_db(todo_running_msg, self.context['conversation_id'])
             
             # 生成TODO内容并写入文件
-            todo_md = await get_todo_md(tasks)
-            todo_path = Path(dir_name) / "todo.md"
-            todo_path.write_text(todo_md, encoding='utf-8')
+            todo_path, todo_md = self._write_todo()
             
             # 更新生成文件列表
             if not self.context.get('generate_files'):
@@ -193,105 +267,154 @@ class AgenticAgent:
             self.logger.error(error_msg)
             raise Exception(error_msg)
 
+    def _write_todo(self) -> Tuple[Path, str]:
+        """
+        根据当前任务列表重写 todo.md
+        
+        Returns:
+            Tuple[Path, str]: (文件路径, 内容)
+        """
+        todo_md = get_todo_md(self.task_manager.get_tasks())
+        todo_path = Path(f"Conversation_{self.context['conversation_id'][:6]}") / "todo.md"
+        todo_path.parent.mkdir(parents=True, exist_ok=True)
+        todo_path.write_text(todo_md, encoding='utf-8')
+        return todo_path, todo_md
+
+    async def execute_task(self, task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        执行单个任务并推送状态消息
+        
+        Args:
+            task: 任务信息
+            
+        Returns:
+            Optional[Dict[str, Any]]: 执行结果，任务异常失败时返回None
+        """
+        # 并行任务各自使用上下文副本（memory/task_id/reflection等按任务隔离），生成文件列表共享
+        task_context = {**self.context, 'generate_files': self.context.setdefault('generate_files', [])}
+        
+        # 更新任务状态为运行中
+        self.task_manager.update_task_status(task['id'], 'running')
+        self.logger.info(f"Executing task {task['id']}: {task['requirement']}")
+        
+        # 发送任务开始消息
+        msg = MessageFormatter.format({
+            'status': 'running',
+            'task_id': task['id'],
+            'action_type': 'task'
+        })
+        self.on_token_stream(msg)
+        await MessageFormatter.save_to_db(msg, self.context['conversation_id'])
+        
+        try:
+            # 使用 CodeAct 执行任务
+            result = await complete_code_act(task, task_context)
+            self._merge_retry_stats(result.get('retries'))
+            
+            # 更新任务状态为完成（重试耗尽返回failure时记为失败）
+            self.task_manager.update_task_status(
+                task['id'], 
+                'failed' if result.get('status') == 'failure' else 'completed',
+                {'result': result.get('content') or result.get('comments'), 'memorized': result.get('memorized', '')}
+            )
+            
+            # 更新上下文中的任务列表
+            self.context['tasks'] = self.task_manager.get_tasks()
+            
+            # 发送 TODO 更新消息
+            todo_msg = MessageFormatter.format({
+                'content': "todo.md",
+                'uuid': str(uuid.uuid4()),
+                'status': 'running',
+                'task_id': task['id'],
+                'action_type': 'write_code'
+            })
+            self.on_token_stream(todo_msg)
+            await MessageFormatter.save_to_db(todo_msg, self.context['conversation_id'])
+            
+            # 写入 TODO 文件
+            self._write_todo()
+            
+            # 发送任务完成消息
+            success_msg = MessageFormatter.format({
+                'status': 'success',
+                'task_id': task['id'],
+                'action_type': 'task',
+                'json': result
+            })
+            self.on_token_stream(success_msg)
+            await MessageFormatter.save_to_db(success_msg, self.context['conversation_id'])
+            
+            return result
+            
+        except Exception as e:
+            # 更新任务状态为失败
+            self.task_manager.update_task_status(
+                task['id'],
+                'failed',
+                {'error': str(e)}
+            )
+            self.logger.error(f"Task {task['id']} failed: {str(e)}")
+            
+            # 发送任务失败消息
+            failure_msg = MessageFormatter.format({
+                'status': 'failure',
+                'task_id': task['id'],
+                'action_type': 'task',
+                'json': str(e)
+            })
+            self.on_token_stream(failure_msg)
+            await MessageFormatter.save_to_db(failure_msg, self.context['conversation_id'])
+            return None
+
+    def _merge_retry_stats(self, stats: Optional[Dict[str, Dict[str, Any]]]) -> None:
+        """汇总任务的重试统计"""
+        for failure_class, entry in (stats or {}).items():
+            total = self.retry_stats.setdefault(failure_class, {})
+            for key, value in entry.items():
+                total[key] = round(total.get(key, 0) + value, 3)
+        if stats:
+            self.logger.info(f'Retry cost by failure class: {self.retry_stats}')
+
+    def _create_scheduler(self) -> TaskScheduler:
+        """创建依赖感知的任务调度器"""
+        def on_cancel(task: Dict[str, Any], reason: str) -> None:
+            # 依赖失败的任务直接取消，其余独立任务继续执行
+            msg = MessageFormatter.format({
+                'status': 'failure',
+                'task_id': task['id'],
+                'action_type': 'task',
+                'comments': f'Task cancelled: {reason}'
+            })
+            self.on_token_stream(msg)
+            asyncio.ensure_future(MessageFormatter.save_to_db(msg, self.context['conversation_id']))
+        
+        return TaskScheduler(
+            self.task_manager,
+            self.execute_task,
+            max_parallel=self.context['config'].AGENT_MAX_PARALLEL_TASKS,
+            should_stop=lambda: self.is_stop,
+            on_cancel=on_cancel
+        )
+
     async def execute(self) -> List[Dict]:
-        """执行任务"""
+        """执行任务：按depends_on依赖并行执行就绪任务"""
         self.logger.info('Execution phase started.')
-        results = []
         
         try:
             # 获取任务列表
-            tasks = await self.task_manager.get_tasks()
+            tasks = self.task_manager.get_tasks()
             
             if not tasks:
                 self.logger.info('No tasks to execute.')
-                return results
+                return []
             
-            # 执行每个任务
+            scheduler = self._create_scheduler()
             for task in tasks:
-                if self.is_stop:
-                    self.logger.info('Agent stopped.')
-                    return results
-                    
-                # 更新任务状态为运行中
-                await self.task_manager.update_task_status(task['id'], 'running')
-                self.logger.info(f"Executing task {task['id']}: {task['requirement']}")
-                
-                # 发送任务开始消息
-                msg = MessageFormatter.format({
-                    'status': 'running',
-                    'task_id': task['id'],
-                    'action_type': 'task'
-                })
-                self.on_token_stream(msg)
-                await MessageFormatter.save_to_db(msg, self.context['conversation_id'])
-                
-                try:
-                    # 使用 CodeAct 执行任务
-                    result = await complete_code_act(task, self.context)
-                    
-                    # 更新任务状态为完成
-                    await self.task_manager.update_task_status(
-                        task['id'], 
-                        'completed',
-                        {'result': result.get('content'), 'memorized': result.get('memorized', '')}
-                    )
-                    
-                    # 更新上下文中的任务列表
-                    self.context['tasks'] = await self.task_manager.get_tasks()
-                    
-                    # 更新 TODO 文件
-                    new_tasks = await self.task_manager.get_tasks()
-                    todo_md = await get_todo_md(new_tasks)
-                    dir_name = f"Conversation_{self.context['conversation_id'][:6]}"
-                    
-                    # 发送 TODO 更新消息
-                    todo_msg = MessageFormatter.format({
-                        'content': "todo.md",
-                        'uuid': str(uuid.uuid4()),
-                        'status': 'running',
-                        'task_id': task['id'],
-                        'action_type': 'write_code'
-                    })
-                    self.on_token_stream(todo_msg)
-                    await MessageFormatter.save_to_db(todo_msg, self.context['conversation_id'])
-                    
-                    # 写入 TODO 文件
-                    todo_path = Path(dir_name) / "todo.md"
-                    todo_path.write_text(todo_md, encoding='utf-8')
-                    
-                    # 发送任务完成消息
-                    success_msg = MessageFormatter.format({
-                        'status': 'success',
-                        'task_id': task['id'],
-                        'action_type': 'task',
-                        'json': result
-                    })
-                    self.on_token_stream(success_msg)
-                    await MessageFormatter.save_to_db(success_msg, self.context['conversation_id'])
-                    
-                    results.append(result)
-                    
-                except Exception as e:
-                    # 更新任务状态为失败
-                    await self.task_manager.update_task_status(
-                        task['id'],
-                        'failed',
-                        {'error': str(e)}
-                    )
-                    self.logger.error(f"Task {task['id']} failed: {str(e)}")
-                    
-                    # 发送任务失败消息
-                    failure_msg = MessageFormatter.format({
-                        'status': 'failure',
-                        'task_id': task['id'],
-                        'action_type': 'task',
-                        'json': str(e)
-                    })
-                    self.on_token_stream(failure_msg)
-                    await MessageFormatter.save_to_db(failure_msg, self.context['conversation_id'])
-                    
-                    # 如果任务失败，停止执行
-                    break
+                scheduler.add(task)
+            scheduler.close()
+            results = await scheduler.run()
+            self.timing = scheduler.critical_path()
                 
             self.logger.info('All tasks processed.')
             return results
@@ -300,10 +423,97 @@ class AgenticAgent:
             self.logger.error(f'Execution failed: {str(e)}')
             raise
 
-    async def stop(self) -> None:
-        """停止执行"""
+    async def plan_and_execute(self, goal: str) -> List[Dict]:
+        """
+        流水线模式：规划仍在生成时即开始执行已产出的任务
+        
+        规划每产出一个任务就放入队列，由调度器消费，依赖已满足的任务立即执行，
+        总耗时约为 max(规划, 执行) 而不是两者之和
+        
+        Args:
+            goal: 用户目标
+            
+        Returns:
+            List[Dict]: 执行结果
+        """
+        scheduler = self._create_scheduler()
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        async def produce() -> None:
+            try:
+                await self.plan(goal, on_task=queue.put_nowait)
+            finally:
+                # 规划结束（或失败）后不再有新任务
+                queue.put_nowait(None)
+        
+        async def consume() -> None:
+            while True:
+                task = await queue.get()
+                if task is None:
+                    break
+                scheduler.add(task)
+            scheduler.close()
+        
+        self.logger.info('====== start pipelined execute ======')
+        planner = asyncio.ensure_future(produce())
+        feeder = asyncio.ensure_future(consume())
+        try:
+            results = await scheduler.run()
+            self.timing = scheduler.critical_path()
+            # 抛出规划阶段的异常
+            await planner
+            self.logger.info('All tasks processed.')
+            return results
+        finally:
+            pending = [future for future in (planner, feeder) if not future.done()]
+            for future in pending:
+                future.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def resume_execute(self) -> List[Dict]:
+        """
+        恢复执行：跳过已完成的任务，其余任务从各自记忆中最后提交的动作处继续
+        
+        Returns:
+            List[Dict]: 执行结果（含之前已完成任务的结果）
+        """
+        reset = self.task_manager.reset_unfinished()
+        self._write_todo()
+        self.logger.info(
+            f"Resuming conversation {self.context['conversation_id']}: "
+            f"{len(self.task_manager.get_tasks()) - len(reset)} completed tasks skipped, {len(reset)} to run"
+        )
+        self.context['resume'] = True
+        try:
+            return await self.execute()
+        finally:
+            self.context['resume'] = False
+
+    async def stop(self) -> float:
+        """
+        停止执行：取消运行中的任务树并等待其退出
+        
+        取消会传递到进行中的LLM请求（连接和限流槽位随之释放）、终端子进程组和各任务的执行循环
+        
+        Returns:
+            float: 从调用到运行结束的耗时（秒）
+        """
         self.is_stop = True
-        self.logger.info('Execution stopped by user.')
+        started_at = time.monotonic()
+        task = self._run_task
+        if task and not task.done():
+            task.cancel()
+            # 在运行任务内部调用stop时不能等待自身
+            if task is not asyncio.current_task():
+                await asyncio.wait([task], timeout=self.context['config'].AGENT_STOP_TIMEOUT)
+        # 后台摘要任务不在运行任务树内，单独取消
+        await cancel_summarizations(self.context.get('conversation_id', 'default'), self.context['config'].AGENT_STOP_TIMEOUT)
+        elapsed = time.monotonic() - started_at
+        if task and not task.done() and task is not asyncio.current_task():
+            self.logger.warning(f'Execution did not stop within {self.context["config"].AGENT_STOP_TIMEOUT * 1000:.0f} ms')
+        else:
+            self.logger.info(f'Execution stopped by user in {elapsed * 1000:.0f} ms.')
+        return elapsed
 
 
     # async def _get_all_files(self, dir_path: Path) -> List[Dict[str, Any]]:
@@ -1,21 +1,27 @@
 import asyncio
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Optional, Tuple, List
 import os
 
 from src.agent.code_act.thinking import thinking
-from src.utils.resolve import resolve_actions
+from src.utils.resolve import parse_action, parse_actions, ActionParseError
 from src.utils.message import MessageFormatter
+from src.utils.blob_store import get_blob_store, resolve_blobs
 from src.agent.memory.local_memory import LocalMemory
 from src.agent.reflection import reflection
+from src.utils.llm import CircuitOpenError
+from src.config import get_config
+from src.utils.deadline import DeadlineExceeded, get_deadline
+from src.utils.retry import FailureRetryPolicy, classify_failure, create_failure_retry_policy
+from src.logger import get_logger
+
+logger = get_logger(__name__)
 
 MAX_RETRY_TIMES = 3
 MAX_TOTAL_RETRIES = 10
+# 可安全重放的动作：恢复执行时若中断发生在这些动作执行过程中，直接重新执行
+IDEMPOTENT_ACTIONS = {'write_code', 'search', 'finish'}
 
-async def delay(ms: int) -> None:
-    """延迟执行"""
-    await asyncio.sleep(ms / 1000)
-
-def retry_handle(retry_count: int, total_retry_attempts: int, max_retries: int, max_total_retries: int, error_message: str = "") -> Tuple[bool, Dict[str, Any]]:
+def retry_handle(retry_count: int, total_retry_attempts: int, max_retries: int, max_total_retries: int, error_message: str = "", policy: Optional[FailureRetryPolicy] = None) -> Tuple[bool, Dict[str, Any]]:
     """
     处理重试逻辑
     
@@ -25,22 +31,26 @@ def retry_handle(retry_count: int, total_retry_attempts: int, max_retries: int,
         max_retries: 最大连续重试次数
         max_total_retries: 最大总重试次数
         error_message: 错误信息
+        policy: 可选，任务级重试策略，放弃重试时在结果中附带各类失败的耗时统计
         
     Returns:
         Tuple[bool, Dict[str, Any]]: (是否继续重试, 结果)
     """
+    retries = {'retries': policy.get_stats()} if policy else {}
     # 检查是否达到最大连续重试次数
     if retry_count >= max_retries:
         return False, {
             'status': 'failure',
-            'comments': f'连续{"异常" if error_message else "执行失败"}达到最大次数({max_retries}){": " + error_message if error_message else ""}'
+            'comments': f'连续{"异常" if error_message else "执行失败"}达到最大次数({max_retries}){": " + error_message if error_message else ""}',
+            **retries
         }
     
     # 检查是否达到最大总重试次数
     if total_retry_attempts >= max_total_retries:
         return False, {
             'status': 'failure',
-            'comments': f'达到最大总重试次数({max_total_retries}){": " + error_message if error_message else ""}'
+            'comments': f'达到最大总重试次数({max_total_retries}){": " + error_message if error_message else ""}',
+            **retries
         }
     
     # 可以继续重试
@@ -65,12 +75,15 @@ async def finish_action(action: Dict[str, Any], context: Dict[str, Any], task_id
         'status': 'success',
         'comments': 'Task Success !',
         'content': action['params']['message'],
-        'memorized': memorized_content,
+        # 任务结果和消息记录中只保存引用
+        'memorized': get_blob_store().ref(memorized_content),
         'meta': {
             'action_type': 'finish',
         },
         'timestamp': asyncio.get_event_loop().time() * 1000
     }
+    if context.get('retry_policy'):
+        result['retries'] = context['retry_policy'].get_stats()
     
     msg = MessageFormatter.format({
         'status': 'success',
@@ -82,11 +95,56 @@ async def finish_action(action: Dict[str, Any], context: Dict[str, Any], task_id
     })
     
     if context.get('on_token_stream'):
-        context['on_token_stream'](msg)
+        # 推送给客户端的消息需要原文
+        context['on_token_stream'](resolve_blobs(msg))
     await MessageFormatter.save_to_db(msg, context['conversation_id'])
     
     return result
 
+def parse_reply(content: str) -> List[Dict[str, Any]]:
+    """
+    解析thinking的回复（批量动作模式下可能是<actions>包裹的多个动作）
+
+    Raises:
+        ActionParseError: 回复中没有可解析的动作
+    """
+    config = get_config()
+    if config.AGENT_MULTI_ACTION:
+        return parse_actions(content, config.AGENT_MAX_ACTIONS_PER_TURN)
+    return [parse_action(content)]
+
+def same_action(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """两个动作的类型和参数是否相同"""
+    return a['type'] == b['type'] and a.get('params') == b.get('params')
+
+async def recover_interrupted_action(memory: LocalMemory) -> List[Dict[str, Any]]:
+    """
+    恢复执行：上次中断发生在动作执行过程中（已记录checkpoint但没有执行结果）时，
+    幂等动作由thinking返回上一条回复后直接重放；非幂等动作（如terminal_run）不重放，
+    在模型执行其他动作检查当前状态之前，原样重新发出的被中断动作也不会执行
+    
+    Args:
+        memory: 任务记忆
+        
+    Returns:
+        List[Dict[str, Any]]: 检查状态之前不允许执行的被中断动作
+    """
+    messages = await memory.get_messages()
+    if not messages or messages[-1].get('action_type') != 'checkpoint':
+        return []
+    action_types = messages[-1]['content'].split(',')
+    unsafe = [action_type for action_type in action_types if action_type not in IDEMPOTENT_ACTIONS]
+    if not unsafe:
+        return []
+    logger.warning(f'Not replaying interrupted non-idempotent actions: {unsafe}')
+    reply = next((msg['content'] for msg in reversed(messages) if msg['role'] == 'assistant'), '')
+    try:
+        blocked = [action for action in parse_reply(resolve_blobs(reply)) if action['type'] in unsafe]
+    except ActionParseError:
+        blocked = []
+    await memory.add_message("user", f"Execution was interrupted while running: {', '.join(action_types)}. It may have partially completed. Check the current state with a different command before running it again; the interrupted command will not be re-run until then.", action_type='reflection', memorized=True)
+    return blocked
+
 async def complete_code_act(task: Dict[str, Any] = None, context: Dict[str, Any] = None) -> Dict[str, Any]:
     """
     执行代码行为直到任务完成或达到最大重试次数
@@ -106,48 +164,93 @@ async def complete_code_act(task: Dict[str, Any] = None, context: Dict[str, Any]
     max_retries = context.get('max_retry_times', MAX_RETRY_TIMES)
     max_total_retries = context.get('max_total_retries', MAX_TOTAL_RETRIES)
     
-    memory = LocalMemory(options={'key': task_id})
-    memory._load_memory()
+    # 记忆按会话和任务隔离；恢复执行时从上次提交的动作处继续，否则从头开始
+    memory = LocalMemory(options={
+        'key': f"{context.get('conversation_id', 'default')}_{task_id}",
+        'conversation_id': context.get('conversation_id'),
+        'task_id': task_id
+    })
+    blocked = []
+    if context.get('resume'):
+        blocked = await recover_interrupted_action(memory)
+    else:
+        await memory.clear_memory()
     context['memory'] = memory
+    context['task_id'] = task_id
     
     retry_count = 0
     total_retry_attempts = 0
+    config = get_config()
+    deadline = get_deadline(context)
+    retry_policy = create_failure_retry_policy()
+    context['retry_policy'] = retry_policy
 
     # 主执行循环
     while True:
+        retry_policy.start_attempt()
         try:
             # 1. LLM思考
             print("thinking.requirement", requirement)
-            content = await thinking(requirement, context)
+            content = await deadline.run(thinking(requirement, context), 'thinking', config.AGENT_THINK_TIMEOUT)
             print("thinking.结果\r\n", content)
 
-            # 2. 解析动作
-            actions = resolve_actions(content)
-            action = actions[0] if actions else None
-            print("action", action)
+            # 2. 解析动作（批量动作模式下可能是<actions>包裹的多个动作）
+            try:
+                actions = parse_reply(content)
+                parse_error = None
+            except ActionParseError as e:
+                actions, parse_error = [], str(e)
+            print("actions", actions)
 
             
             # 3. 验证动作 - thinking结果不一定是符合期望的action xml格式 解析action失败就重试
-            if not action:
-                should_continue, result = retry_handle(retry_count, total_retry_attempts, max_retries, max_total_retries)
+            if not actions:
+                should_continue, result = retry_handle(retry_count, total_retry_attempts, max_retries, max_total_retries, policy=retry_policy)
                 if not should_continue:
                     return result
-                await delay(500)
+                # 把解析失败的位置反馈给模型重新生成，否则下一轮thinking会原样返回同一条回复
+                await memory.add_message("user", f"Your reply could not be parsed as an XML action: {parse_error}. Reply with exactly one XML action.", action_type='reflection', memorized=True)
+                # 解析失败无需等待
+                await retry_policy.backoff_for(FailureRetryPolicy.PARSE, retry_count + 1)
                 retry_count += 1
                 total_retry_attempts += 1
                 context['retry_count'] = retry_count
                 continue
             
-            # 4. 如果thinking阶段判断task已经完成，则直接返回
-            if action['type'] == 'finish':
-                return await finish_action(action, context, task_id)
+            # 4. 如果thinking阶段判断task已经完成，则直接返回（批量中的finish在其余动作成功后处理）
+            finish = next((action for action in actions if action['type'] == 'finish'), None)
+            actions = [action for action in actions if action['type'] != 'finish']
+            if not actions:
+                return await finish_action(finish, context, task_id)
             
-            # 5. 执行动作
-            action_result = await context['runtime'].execute_action(action, context, task_id)
+            # 恢复执行后，被中断的非幂等动作在检查当前状态之前不再原样执行（可能已经产生了副作用）
+            if blocked and any(same_action(action, interrupted) for action in actions for interrupted in blocked):
+                should_continue, result = retry_handle(retry_count, total_retry_attempts, max_retries, max_total_retries, policy=retry_policy)
+                if not should_continue:
+                    return result
+                await memory.add_message("user", "This command was interrupted in the previous run and may have already taken effect, so it was not executed again. First check the current state with a different command (for example list the files or inspect the output it should have produced), then decide whether it is still needed.", action_type='reflection', memorized=True)
+                await retry_policy.backoff_for(FailureRetryPolicy.PARSE, retry_count + 1)
+                retry_count += 1
+                total_retry_attempts += 1
+                context['retry_count'] = retry_count
+                continue
+            # 模型执行了其他动作（检查状态）后，被中断的动作可以再次执行
+            blocked = []
+            
+            # 5. 执行动作（先记录checkpoint，执行结果写入记忆即视为提交）
+            await memory.add_message("system", ','.join(action['type'] for action in actions), action_type='checkpoint')
+            memory.sync()
+            if len(actions) > 1:
+                execution = context['runtime'].execute_actions(actions, context, task_id)
+            else:
+                execution = context['runtime'].execute_action(actions[0], context, task_id)
+            action_result = await deadline.run(execution, 'action', config.AGENT_ACTION_TIMEOUT)
             print("action_result", action_result)
             if not context.get('generate_files'):
                 context['generate_files'] = []
-            if action_result.meta.get('filepath'):
+            if action_result.meta.get('filepaths'):
+                context['generate_files'].extend(action_result.meta['filepaths'])
+            elif action_result.meta.get('filepath'):
                 context['generate_files'].append(action_result.meta['filepath'])
             
             print("context['generate_files']", context['generate_files'])
@@ -164,12 +267,17 @@ async def complete_code_act(task: Dict[str, Any] = None, context: Dict[str, Any]
             # 7. 处理执行结果
             if status == 'success':
                 retry_count = 0  # 重置重试计数
-                if action['type'] == task['tools'][0]:
+                if finish:
+                    return await finish_action(finish, context, task_id)
+                if any(action['type'] == task['tools'][0] for action in actions):
                     finish_result = {'params': {'message': action_result.meta.get('content')}}
                     return await finish_action(finish_result, context, task_id)
+                if config.AGENT_MULTI_ACTION:
+                    # 批量动作模式：执行结果作为观察反馈给模型，否则下一轮thinking会原样返回上一条回复
+                    await memory.add_message("user", f"Observation:\n{action_result.meta.get('content')}", action_type='observation', memorized=True)
                 continue
             else:
-                should_continue, result = retry_handle(retry_count, total_retry_attempts, max_retries, max_total_retries)
+                should_continue, result = retry_handle(retry_count, total_retry_attempts, max_retries, max_total_retries, policy=retry_policy)
                 if not should_continue:
                     return result
                 retry_count += 1
@@ -177,16 +285,39 @@ async def complete_code_act(task: Dict[str, Any] = None, context: Dict[str, Any]
                 context['reflection'] = comments
                 print("code-act.memory logging user prompt")
                 await memory.add_message("user", comments, action_type='reflection', memorized=True)
-                await delay(500)
+                await retry_policy.backoff_for(FailureRetryPolicy.TOOL, retry_count)
                 print(f"Retrying ({retry_count}/{max_retries}). Total attempts: {total_retry_attempts}/{max_total_retries}...")
                 
         except Exception as error:
             # 8. 异常处理
             print("An error occurred:", error)
-            raise error
-            should_continue, result = retry_handle(retry_count, total_retry_attempts, max_retries, max_total_retries, str(error))
+            # 熔断打开说明模型服务不可用，任务级重试只会白白消耗次数
+            if isinstance(error, CircuitOpenError):
+                raise error
+            # 只重试已知的失败类别（回复解析、限流、超时、LLM请求/网络错误），
+            # 其余异常（TypeError、KeyError等）属于代码错误，重试只会重复同样的失败
+            failure_class = classify_failure(error)
+            if failure_class == FailureRetryPolicy.TOOL:
+                raise error
+            # 超时的思考/动作计为一次重试；整体截止时间已到则直接失败
+            if isinstance(error, DeadlineExceeded):
+                if deadline.expired:
+                    return {
+                        'status': 'failure',
+                        'comments': f'任务超时: {error}',
+                        'retries': retry_policy.get_stats()
+                    }
+                if error.stage == 'action':
+                    await memory.add_message("user", f"The last action did not finish{f' within {error.timeout:.0f}s' if error.timeout is not None else ''} and was cancelled. Try a faster approach.", action_type='reflection', memorized=True)
+            # 动作执行抛出异常时同样提交结果，否则下一轮会原样重放同一个动作
+            messages = await memory.get_messages()
+            if messages and messages[-1].get('action_type') == 'checkpoint':
+                await memory.add_message("user", f"The last action raised an error: {error}", action_type='reflection', memorized=True)
+            should_continue, result = retry_handle(retry_count, total_retry_attempts, max_retries, max_total_retries, str(error), policy=retry_policy)
             if not should_continue:
                 return result
             retry_count += 1
             total_retry_attempts += 1
+            waited = await retry_policy.backoff_for(failure_class, retry_count, error)
+            logger.info(f'Task {task_id} retry after {failure_class} failure, waited {waited:.2f}s')
             print(f"Retrying ({retry_count}/{max_retries}). Total attempts: {total_retry_attempts}/{max_total_retries}...")
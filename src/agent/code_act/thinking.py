@@ -1,9 +1,29 @@
 from typing import Dict, Any, Optional, List
 from ..prompt import resolve_think_prompt
 from src.utils.llm import call
+from src.utils.message import MessageFormatter
+from src.utils.resolve import ActionParser
+from src.utils.context_packer import get_context_packer
+from src.utils.blob_store import resolve_blobs
+from src.tools.tool_manager import ToolManager
+from src.config import get_config
 from ..memory import LocalMemory
 
 
+def action_stop_sequences() -> List[str]:
+    """
+    动作结束标签作为服务端stop序列（OpenAI最多支持4个，finish优先）；
+    批量动作模式下finish可能位于批次内，只以</actions>结束（单个动作由stop_when在客户端截断）
+
+    Returns:
+        List[str]: stop序列
+    """
+    if get_config().AGENT_MULTI_ACTION:
+        return ['</actions>']
+    names = ['finish'] + [schema['name'] for schema in ToolManager().get_tool_schemas()]
+    return [f'</{name}>' for name in names][:4]
+
+
 async def thinking(requirement: str, context: Dict[str, Any]) -> str:
     """
     执行思考过程
@@ -22,8 +42,12 @@ async def thinking(requirement: str, context: Dict[str, Any]) -> str:
         memory = LocalMemory(options={'key': context.get('conversation_id', 'default')})
         context['memory'] = memory
         
-    # 获取消息历史
-    messages = await memory.get_messages(summarize=False)
+    # 获取消息历史（压缩视图：后台摘要已覆盖的较早消息由摘要代替）
+    messages = await memory.get_messages(summarize=True)
+    # checkpoint只用于恢复执行，不发送给模型
+    messages = [msg for msg in messages if msg.get('action_type') != 'checkpoint']
+    # 记忆中的大段内容只保存了blob引用，发送给模型前解析为原文
+    messages = [{**msg, 'content': resolve_blobs(msg['content'])} for msg in messages]
     # print("current history messages", messages)
     
     # 如果最后一条消息是助手的回复，直接返回
@@ -39,14 +63,22 @@ async def thinking(requirement: str, context: Dict[str, Any]) -> str:
         print(prompt)
     else:
         prompt = ''
-    # 对话记录
+    # 对话记录按token预算装配，避免提示词随轮次和重试无限增长
     options = {
-        'messages': [
-            {'role': msg['role'], 'content': msg['content']}
-            for msg in messages
-        ]
+        'messages': get_context_packer().pack(messages),
+        'stage': 'thinking',
+        'task_id': context.get('task_id'),
+        # 每轮只使用第一个动作（或第一个<actions>批次）：生成完毕后立即停止，不再为后续内容付费和等待
+        'stream': True,
+        'stop': action_stop_sequences(),
+        'stop_when': ActionParser()
     }
     
+    # 流式推送思考过程
+    on_delta = MessageFormatter.stream_handler(context.get('on_token_stream'), 'thinking', context.get('task_id'))
+    if on_delta:
+        options['on_delta'] = on_delta
+    
     content = await call(prompt, context.get('conversation_id'), role='assistant', options=options)
     
     # 保存思考结果
@@ -1,3 +1,4 @@
-from .local_memory import LocalMemory
+from .local_memory import LocalMemory, cancel_summarizations
+from .memory_index import MemoryIndex, get_memory_index
 
-__all__ = ['LocalMemory'] 
\ No newline at end of file
+__all__ = ['LocalMemory', 'cancel_summarizations', 'MemoryIndex', 'get_memory_index'] 
\ No newline at end of file
@@ -1,54 +1,229 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set
+import asyncio
 import json
 import os
+import time
 from pathlib import Path
 from datetime import datetime
+from src.config import get_config
+from src.utils.blob_store import get_blob_store, resolve_blobs
+from src.logger import get_logger
+from .memory_index import MemoryIndex, get_memory_index
+
+logger = get_logger(__name__)
+
+# 进行中的后台摘要任务（按对话），代理停止或运行结束时取消，避免继续消耗LLM调用
+_summarizations: Dict[str, Set[asyncio.Task]] = {}
+
+
+async def cancel_summarizations(conversation_id: str, timeout: Optional[float] = None) -> int:
+    """
+    取消对话中进行中的后台摘要任务并等待其退出
+
+    Args:
+        conversation_id: 对话ID
+        timeout: 最长等待时间（秒），None表示等待全部退出
+
+    Returns:
+        int: 被取消的任务数
+    """
+    tasks = [task for task in _summarizations.pop(conversation_id, set()) if not task.done()]
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.wait(tasks, timeout=timeout)
+    return len(tasks)
 
 class LocalMemory:
-    """本地记忆实现，用于存储和检索执行历史"""
+    """
+    本地记忆实现，用于存储和检索执行历史
+    
+    记忆以追加写的JSONL日志持久化（每行一条消息或一条操作记录），消息列表常驻内存，
+    读取不访问磁盘；日志中的无效记录累积到阈值后在后台压缩重写；消息中的大段内容只保存blob引用
+
+    未归档的助手轮次达到阈值后，后台任务用LLM把较早的消息总结为一条摘要消息，
+    原消息保留在日志中并标记为archived，压缩视图中由摘要代替
+    """
     
     def __init__(self, options: Dict[str, Any] = None):
         """
         初始化本地记忆
         
         Args:
-            options: 配置选项，包含key等
+            options: 配置选项，包含key等，可选fsync（none / batch / always）、summarize覆盖全局配置，
+                conversation_id/task_id用于摘要调用的遥测标记；有conversation_id时消息同时写入对话的检索索引；
+                cache_dir可指定日志目录
         """
         self.options = options or {}
         self.key = self.options.get('key', 'default')
         print(f"LocalMemory initialized with key: {self.key}")
-        self.cache_dir = Path(__file__).parent.parent.parent.parent / 'cache' / 'memory'
+        self.cache_dir = Path(self.options['cache_dir']) if self.options.get('cache_dir') else \
+            Path(__file__).parent.parent.parent.parent / 'cache' / 'memory'
+        
+        config = get_config()
+        self.fsync = self.options.get('fsync', config.MEMORY_FSYNC)
+        self.fsync_batch = config.MEMORY_FSYNC_BATCH
+        self.fsync_interval = config.MEMORY_FSYNC_INTERVAL
+        self.compact_min_garbage = config.MEMORY_COMPACT_MIN_GARBAGE
+        self.compact_ratio = config.MEMORY_COMPACT_RATIO
+        self.summarize = self.options.get('summarize', config.MEMORY_SUMMARIZE)
+        self.summarize_after = config.MEMORY_SUMMARIZE_AFTER_TURNS
+        self.summarize_keep = max(1, config.MEMORY_SUMMARIZE_KEEP)
         
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.messages = []
+        # 日志中的记录行数（消息 + 操作记录 + 已被截断的消息），用于判断是否需要压缩
+        self._records = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._compaction: Optional[asyncio.Task] = None
+        self._summarization: Optional[asyncio.Task] = None
         self._load_memory()
+        self.index: Optional[MemoryIndex] = None
+        if self.options.get('conversation_id') and config.MEMORY_INDEX_ENABLED:
+            self.index = get_memory_index(self.options['conversation_id'], self.cache_dir)
         
     def _get_file_path(self) -> Path:
         """获取记忆文件路径"""
-        return self.cache_dir / f"{self.key}.json"
+        return self.cache_dir / f"{self.key}.jsonl"
+        
+    def _apply(self, record: Dict[str, Any]) -> None:
+        """重放一条日志记录"""
+        op = record.get('op')
+        if op is None:
+            self.messages.append(record)
+        elif op == 'truncate':
+            keep = record.get('keep', 0)
+            self.messages = self.messages[-keep:] if keep > 0 else []
+        elif op == 'summarize':
+            # 归档[start, end)的消息并在其后插入摘要；替换为新对象，进行中的压缩会检测到变化
+            start, end = record['start'], record['end']
+            self.messages[start:end] = [{**message, 'archived': True} for message in self.messages[start:end]]
+            self.messages.insert(end, record['summary'])
         
     def _load_memory(self) -> None:
-        """加载记忆"""
+        """加载记忆：重放日志，末尾被截断的半行（写入过程中崩溃）丢弃并从文件中截掉"""
         file_path = self._get_file_path()
-        if file_path.exists():
+        legacy_path = file_path.with_suffix('.json')
+        self.messages = []
+        self._records = 0
+        if not file_path.exists() and legacy_path.exists():
+            # 兼容旧格式：整个列表的JSON文件，迁移为JSONL日志
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
+                with open(legacy_path, 'r', encoding='utf-8') as f:
                     self.messages = json.load(f)
+                self._save_memory()
+                os.remove(legacy_path)
             except Exception as e:
                 print(f"Error loading memory for {self.key}: {e}")
                 self.messages = []
+            return
+        if not file_path.exists():
+            return
+        try:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+        except Exception as e:
+            print(f"Error loading memory for {self.key}: {e}")
+            return
+        *lines, tail = data.split(b'\n')
+        offset = 0
+        for line in lines:
+            if line.strip():
+                try:
+                    self._apply(json.loads(line))
+                    self._records += 1
+                except json.JSONDecodeError:
+                    # 损坏的记录计为无效记录，压缩时清除
+                    self._records += 1
+                    logger.warning(f"Skip corrupted memory record for {self.key} at byte {offset}")
+            offset += len(line) + 1
+        if tail.strip():
+            with open(file_path, 'r+b') as f:
+                try:
+                    self._apply(json.loads(tail))
+                    self._records += 1
+                    # 最后一条记录完整但缺少换行符：补上
+                    f.seek(0, os.SEEK_END)
+                    f.write(b'\n')
+                except json.JSONDecodeError:
+                    # 写入过程中崩溃留下的半行：截掉
+                    f.truncate(offset)
+                    logger.warning(f"Recovered torn memory log for {self.key} at byte {offset}")
+                
+    def _append(self, record: Dict[str, Any]) -> None:
+        """追加一条记录，按fsync策略落盘"""
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with open(self._get_file_path(), 'ab') as f:
+            f.write(line.encode('utf-8'))
+            f.flush()
+            self._unsynced += 1
+            if self.fsync == 'always' or (
+                self.fsync == 'batch' and (
+                    self._unsynced >= self.fsync_batch or
+                    time.monotonic() - self._last_sync >= self.fsync_interval
+                )
+            ):
+                os.fsync(f.fileno())
+                self._unsynced = 0
+                self._last_sync = time.monotonic()
+        self._records += 1
+        self._maybe_compact()
                 
     def _save_memory(self) -> None:
-        """保存记忆"""
+        """保存记忆：把当前消息重写为新日志（先写临时文件再替换）"""
         file_path = self._get_file_path()
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.messages, f, ensure_ascii=False, indent=2)
+            self._write_snapshot(file_path.with_suffix('.tmp'), list(self.messages))
+            os.replace(file_path.with_suffix('.tmp'), file_path)
+            self._records = len(self.messages)
+            self._unsynced = 0
             print(f"Memory for task {self.key} saved successfully.")
         except Exception as e:
             print(f"Error saving memory for {self.key}: {e}")
             raise Exception(f"Failed to save memory for task {self.key}")
             
+    def _write_snapshot(self, path: Path, messages: List[Dict[str, Any]]) -> None:
+        """把消息写入文件并落盘"""
+        with open(path, 'wb') as f:
+            for message in messages:
+                f.write((json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8'))
+            f.flush()
+            if self.fsync != 'none':
+                os.fsync(f.fileno())
+            
+    def _maybe_compact(self) -> None:
+        """无效记录超过阈值时在后台压缩日志"""
+        garbage = self._records - len(self.messages)
+        if garbage < max(self.compact_min_garbage, self.compact_ratio * len(self.messages)):
+            return
+        if self._compaction and not self._compaction.done():
+            return
+        try:
+            self._compaction = asyncio.get_running_loop().create_task(self.compact())
+        except RuntimeError:
+            # 没有运行中的事件循环时同步压缩
+            self._save_memory()
+            
+    async def compact(self) -> None:
+        """
+        压缩日志：在线程中写入当前消息的快照，完成后补上期间新增的消息再原子替换
+        """
+        file_path = self._get_file_path()
+        tmp_path = file_path.with_suffix('.tmp')
+        snapshot = list(self.messages)
+        await asyncio.get_running_loop().run_in_executor(None, self._write_snapshot, tmp_path, snapshot)
+        if self.messages[:len(snapshot)] != snapshot:
+            # 压缩期间发生了截断等非追加操作，下次再压缩
+            os.remove(tmp_path)
+            return
+        # 以下在事件循环线程中同步执行，期间不会有新的追加
+        with open(tmp_path, 'ab') as f:
+            for message in self.messages[len(snapshot):]:
+                f.write((json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8'))
+        os.replace(tmp_path, file_path)
+        self._records = len(self.messages)
+            
     async def add_message(self, role: str, content: str, action_type: str = '', memorized: bool = False) -> None:
         """
         添加消息
@@ -59,28 +234,131 @@ class LocalMemory:
             action_type: 动作类型
             memorized: 是否记忆
         """
-        self.messages.append({
+        message = {
             'role': role,
-            'content': content,
+            # 代码等大段内容存入blob存储，日志和内存中只保存引用，发送给模型前再解析
+            'content': get_blob_store().dehydrate(content),
             'action_type': action_type,
             'memorized': memorized,
             'timestamp': str(datetime.now())
-        })
-        self._save_memory()
+        }
+        self.messages.append(message)
+        self._append(message)
+        if self.index:
+            self.index.add(self.key, message)
+        self._maybe_summarize()
         
     async def get_messages(self, summarize: bool = False) -> List[Dict[str, Any]]:
         """
         获取消息历史
         
         Args:
-            summarize: 是否总结消息
+            summarize: 是否返回压缩视图（已归档的消息由摘要代替）
             
         Returns:
             List[Dict[str, Any]]: 消息列表
         """
-        if summarize and len(self.messages) > 10:
-            return self.messages[-10:]
+        if summarize:
+            return [message for message in self.messages if not message.get('archived')]
         return self.messages
+
+    def _summary_range(self) -> Optional[range]:
+        """
+        需要总结的消息范围：任务提示之后、最近若干条之前的未归档消息（含上一次的摘要）
+
+        Returns:
+            Optional[range]: 消息下标范围，不足两条时返回None
+        """
+        live = [i for i, message in enumerate(self.messages) if i > 0 and not message.get('archived')]
+        candidates = live[:-self.summarize_keep]
+        if len(candidates) < 2:
+            return None
+        return range(candidates[0], candidates[-1] + 1)
+
+    def _maybe_summarize(self) -> None:
+        """未归档的助手轮次达到阈值时在后台总结较早的消息"""
+        if not self.summarize or (self._summarization and not self._summarization.done()):
+            return
+        turns = sum(
+            1 for message in self.messages[1:]
+            if message['role'] == 'assistant' and not message.get('archived')
+        )
+        if turns < self.summarize_after or self._summary_range() is None:
+            return
+        try:
+            self._summarization = asyncio.get_running_loop().create_task(self.summarize_history())
+        except RuntimeError:
+            # 没有运行中的事件循环时跳过，下次添加消息时再尝试
+            return
+        # 登记到对话，stop()时随代理一起取消
+        tasks = _summarizations.setdefault(self.options.get('conversation_id') or self.key, set())
+        tasks.add(self._summarization)
+        self._summarization.add_done_callback(tasks.discard)
+
+    async def summarize_history(self) -> Optional[Dict[str, Any]]:
+        """
+        用LLM总结较早的消息：摘要作为memorized消息插入，原消息标记为归档（仍保留在日志中）
+
+        在后台执行，期间可以继续添加消息；总结期间较早的消息发生变化（截断、清除）时放弃本次结果
+
+        Returns:
+            Optional[Dict[str, Any]]: 摘要消息，未执行或失败时返回None
+        """
+        from src.agent.prompt import resolve_memory_summary_prompt
+        from src.utils.context_packer import ContextPacker, estimate_text_tokens
+        from src.utils.llm import call
+        from src.utils.telemetry import get_telemetry
+
+        span = self._summary_range()
+        if span is None:
+            return None
+        started_at = time.monotonic()
+        originals = self.messages[span.start:span.stop]
+        # 摘要输入中的大段代码替换为文件引用，控制摘要调用的成本
+        packer = ContextPacker(0, elide_chars=get_config().CONTEXT_ELIDE_CHARS)
+        history = '\n\n'.join(
+            f"[{message.get('action_type') or message['role']}] {packer.elide({**message, 'content': resolve_blobs(message['content'])})['content']}"
+            for message in originals if message.get('action_type') != 'checkpoint'
+        )
+        telemetry = {
+            'conversation_id': self.options.get('conversation_id'),
+            'task_id': self.options.get('task_id'),
+            'key': self.key,
+            'messages': len(originals),
+            'tokens_before': sum(estimate_text_tokens(resolve_blobs(message.get('content') or '')) for message in originals)
+        }
+        try:
+            content = await call(
+                resolve_memory_summary_prompt(history),
+                self.options.get('conversation_id'),
+                options={'stage': 'memory_summary', 'task_id': self.options.get('task_id'), 'temperature': 0}
+            )
+        except Exception as e:
+            logger.error(f"Error summarizing memory for {self.key}: {e}")
+            get_telemetry().record_compaction(**telemetry, duration=time.monotonic() - started_at, status='error', error=str(e))
+            return None
+        current = self.messages[span.start:span.stop]
+        if len(current) != len(originals) or any(a is not b for a, b in zip(current, originals)):
+            logger.info(f"Memory for {self.key} changed during summarization, discarded")
+            return None
+        summary = {
+            'role': 'user',
+            'content': f"Summary of {len(originals)} earlier messages:\n{content.strip()}",
+            'action_type': 'summary',
+            'memorized': True,
+            'timestamp': str(datetime.now())
+        }
+        record = {'op': 'summarize', 'start': span.start, 'end': span.stop, 'summary': summary}
+        self._apply(record)
+        self._append(record)
+        if self.index:
+            self.index.add(self.key, summary)
+        duration = time.monotonic() - started_at
+        stats = get_telemetry().record_compaction(
+            **telemetry, tokens_after=estimate_text_tokens(summary['content']), duration=duration
+        )
+        logger.info(f"Summarized {len(originals)} messages for {self.key} in {duration:.2f}s (ratio {stats['ratio'] or 0:.2f})")
+        return summary
         
     async def get_memorized_content(self) -> str:
         """
@@ -91,6 +369,9 @@ class LocalMemory:
         """
         list = []
         for message in self.messages:
+            if message.get('archived'):
+                # 已归档的消息由摘要代替
+                continue
             action_type = message.get('action_type', '')
             memorized = message.get('memorized', False)
             if not memorized:
@@ -98,9 +379,24 @@ class LocalMemory:
             list.append(f"{action_type.upper()}: {message['content']}")
         return "\n".join(list)
 
+    def sync(self) -> None:
+        """立即把已追加的记录落盘（batch策略下在关键节点调用）"""
+        file_path = self._get_file_path()
+        if self._unsynced and file_path.exists():
+            with open(file_path, 'ab') as f:
+                os.fsync(f.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
     async def clear_memory(self) -> None:
         """清除所有记忆"""
         file_path = self._get_file_path()
+        if self._summarization and not self._summarization.done():
+            self._summarization.cancel()
+        if self.index:
+            self.index.remove(self.key)
+        self.messages = []
+        self._records = 0
         try:
             if file_path.exists():
                 os.remove(file_path)
@@ -130,5 +426,5 @@ class LocalMemory:
             max_messages: 新的最大消息数量
         """
         if len(self.messages) > max_messages:
-            self.messages = self.messages[-max_messages:]
-            self._save_memory() 
\ No newline at end of file
+            self._apply({'op': 'truncate', 'keep': max_messages})
+            self._append({'op': 'truncate', 'keep': max_messages})
@@ -0,0 +1,254 @@
+from typing import Dict, Any, List, Optional, Iterable
+from collections import Counter
+from pathlib import Path
+import math
+import re
+from src.logger import get_logger
+from src.utils.blob_store import resolve_blobs
+
+logger = get_logger(__name__)
+
+# 英文/数字按单词切分，中文按单字切分
+TOKEN_PATTERN = re.compile(r'[a-z0-9_]+|[\u4e00-\u9fff]')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    把文本切分为检索词
+
+    Args:
+        text: 文本
+
+    Returns:
+        List[str]: 检索词列表
+    """
+    return TOKEN_PATTERN.findall((text or '').lower())
+
+
+def is_indexable(message: Dict[str, Any]) -> bool:
+    """
+    是否建立索引：只索引需要记忆的消息，跳过任务提示本身（role为user的thinking消息）
+
+    Args:
+        message: 记忆中的消息
+
+    Returns:
+        bool: 是否建立索引
+    """
+    if not message.get('memorized') or not message.get('content'):
+        return False
+    return not (message.get('role') == 'user' and message.get('action_type') == 'thinking')
+
+
+class MemoryIndex:
+    """
+    对话内所有任务记忆的BM25倒排索引
+
+    随LocalMemory.add_message增量更新，思考提示据此只带上与当前任务相关的少量历史片段
+    """
+
+    def __init__(self, conversation_id: str, k1: float = 1.2, b: float = 0.75):
+        """
+        初始化索引
+
+        Args:
+            conversation_id: 对话ID
+            k1: BM25词频饱和参数
+            b: BM25文档长度归一化参数
+        """
+        self.conversation_id = conversation_id
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[int, Dict[str, Any]] = {}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.by_key: Dict[str, List[int]] = {}
+        self.total_length = 0
+        self._next_id = 0
+        self.stats = {
+            'searches': 0,
+            'hits': 0
+        }
+
+    def task_id(self, key: str) -> str:
+        """从记忆key（<conversation_id>_<task_id>）中取出任务ID"""
+        prefix = f'{self.conversation_id}_'
+        return key[len(prefix):] if key.startswith(prefix) else key
+
+    def add(self, key: str, message: Dict[str, Any]) -> Optional[int]:
+        """
+        索引一条消息
+
+        Args:
+            key: 记忆key
+            message: 消息
+
+        Returns:
+            Optional[int]: 文档ID，不需要索引时返回None
+        """
+        if not is_indexable(message):
+            return None
+        terms = Counter(tokenize(resolve_blobs(message['content'])))
+        if not terms:
+            return None
+        doc_id = self._next_id
+        self._next_id += 1
+        length = sum(terms.values())
+        self.docs[doc_id] = {
+            'key': key,
+            'action_type': message.get('action_type') or message.get('role'),
+            'content': message['content'],
+            'terms': terms,
+            'length': length
+        }
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.by_key.setdefault(key, []).append(doc_id)
+        self.total_length += length
+        return doc_id
+
+    def remove(self, key: str) -> None:
+        """
+        移除一个记忆key的全部文档（记忆被清除时调用）
+
+        Args:
+            key: 记忆key
+        """
+        for doc_id in self.by_key.pop(key, []):
+            doc = self.docs.pop(doc_id)
+            for term in doc['terms']:
+                posting = self.postings[term]
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+            self.total_length -= doc['length']
+
+    def load(self, cache_dir: Path) -> None:
+        """
+        从磁盘上该对话的所有记忆日志重建索引
+
+        Args:
+            cache_dir: 记忆日志目录
+        """
+        from .local_memory import LocalMemory
+
+        prefix = f'{self.conversation_id}_'
+        for path in sorted(cache_dir.glob(f'{prefix}*.jsonl')):
+            # 只加载本对话的任务（abc_* 也会匹配对话 abc_1 的 abc_1_2）
+            task_id = path.stem[len(prefix):]
+            if not task_id or '_' in task_id:
+                continue
+            memory = LocalMemory(options={'key': path.stem, 'summarize': False, 'cache_dir': cache_dir})
+            for message in memory.messages:
+                self.add(path.stem, message)
+        logger.info(f'Memory index for {self.conversation_id} loaded: {len(self.docs)} documents')
+
+    def snippet(self, content: str, terms: Iterable[str], chars: int) -> str:
+        """
+        截取内容中最先命中检索词附近的片段
+
+        Args:
+            content: 文档内容
+            terms: 检索词
+            chars: 片段长度
+
+        Returns:
+            str: 片段
+        """
+        if len(content) <= chars:
+            return content
+        lowered = content.lower()
+        positions = [lowered.find(term) for term in terms]
+        positions = [position for position in positions if position >= 0]
+        start = max(0, min(positions) - chars // 4) if positions else 0
+        start = min(start, len(content) - chars)
+        text = content[start:start + chars]
+        return ('...' if start > 0 else '') + text + ('...' if start + chars < len(content) else '')
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        exclude_keys: Iterable[str] = (),
+        snippet_chars: int = 500
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25检索
+
+        Args:
+            query: 查询文本
+            top_k: 返回的结果数
+            exclude_keys: 排除的记忆key（例如当前任务自身）
+            snippet_chars: 每个结果的片段长度
+
+        Returns:
+            List[Dict[str, Any]]: 结果（task_id, action_type, score, snippet），按得分降序
+        """
+        self.stats['searches'] += 1
+        terms = set(tokenize(query))
+        excluded = set(exclude_keys)
+        count = len(self.docs)
+        if not terms or not count:
+            return []
+        average_length = self.total_length / count
+        scores: Dict[int, float] = {}
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                length = self.docs[doc_id]['length']
+                norm = tf + self.k1 * (1 - self.b + self.b * length / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        ranked = sorted(
+            (doc_id for doc_id in scores if self.docs[doc_id]['key'] not in excluded),
+            key=lambda doc_id: scores[doc_id],
+            reverse=True
+        )[:top_k]
+        self.stats['hits'] += len(ranked)
+        return [
+            {
+                'task_id': self.task_id(self.docs[doc_id]['key']),
+                'action_type': self.docs[doc_id]['action_type'],
+                'score': scores[doc_id],
+                # 文档只保存blob引用，命中后才解析原文
+                'snippet': self.snippet(resolve_blobs(self.docs[doc_id]['content']), terms, snippet_chars)
+            }
+            for doc_id in ranked
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取索引统计
+
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        return {
+            **self.stats,
+            'documents': len(self.docs),
+            'terms': len(self.postings),
+            'keys': len(self.by_key)
+        }
+
+
+_indexes: Dict[str, MemoryIndex] = {}
+
+
+def get_memory_index(conversation_id: str, cache_dir: Optional[Path] = None) -> MemoryIndex:
+    """
+    获取对话的记忆索引，首次获取时从磁盘上的记忆日志重建
+
+    Args:
+        conversation_id: 对话ID
+        cache_dir: 记忆日志目录，为空时不从磁盘加载
+
+    Returns:
+        MemoryIndex: 记忆索引
+    """
+    if conversation_id not in _indexes:
+        index = MemoryIndex(conversation_id)
+        _indexes[conversation_id] = index
+        if cache_dir is not None:
+            index.load(cache_dir)
+    return _indexes[conversation_id]
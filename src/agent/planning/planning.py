@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 import os
 from datetime import datetime
 
@@ -6,11 +6,18 @@ from src.agent.prompt import resolve_planning_prompt
 from src.logger import get_logger
 from src.utils.llm import call as call_llm
 from src.models import File, Experience
+from src.utils.message import MessageFormatter
+from src.utils.json_stream import JSONArrayStreamParser
 
 logger = get_logger(__name__)
 
 
-async def planning(goal: str, files: List[File], previous_result: Dict[str, Any], conversation_id: str) -> List[Dict[str, Any]]:
+def _is_valid_task(task: Any) -> bool:
+    """任务必须是对象且至少包含一个工具"""
+    return isinstance(task, dict) and bool(task.get('tools'))
+
+
+async def planning(goal: str, files: List[File], previous_result: Dict[str, Any], conversation_id: str, on_token_stream: Optional[Callable] = None, on_task: Optional[Callable[[Dict[str, Any]], Any]] = None) -> List[Dict[str, Any]]:
     """
     规划任务执行
     
@@ -19,6 +26,8 @@ async def planning(goal: str, files: List[File], previous_result: Dict[str, Any]
         files: 相关文件列表
         previous_result: 之前的执行结果
         conversation_id: 对话ID
+        on_token_stream: 消息回调，传入时流式推送规划内容
+        on_task: 任务回调，每个任务的JSON对象生成完毕时立即调用，无需等待整个规划结束
         
     Returns:
         List[Dict[str, Any]]: 任务列表
@@ -41,45 +50,45 @@ async def planning(goal: str, files: List[File], previous_result: Dict[str, Any]
         prompt_path.write_text(prompt, encoding='utf-8')
         
         # 调用LLM进行规划
+        options = {
+            # 'response_format': 'json',
+            # todo: 暂时关闭response_format 改用手动解析
+            'temperature': 0,
+            'stage': 'planning'
+        }
+        # 边生成边解析任务数组
+        parser = JSONArrayStreamParser()
+        stream_delta = MessageFormatter.stream_handler(on_token_stream, 'plan')
+        streamed = []
+        
+        def on_delta(delta: str) -> None:
+            if stream_delta:
+                stream_delta(delta)
+            for task in parser.feed(delta):
+                streamed.append(task)
+                if on_task and _is_valid_task(task):
+                    on_task(task)
+        
+        options['on_delta'] = on_delta
         result = await call_llm(
             prompt, 
             conversation_id, 
             'assistant',
-            {
-                # 'response_format': 'json',
-                # todo: 暂时关闭response_format 改用手动解析
-                'temperature': 0
-            }
+            options
         )
         
         logger.info("\n==== planning result ====")
         logger.info(result)
 
-        # 解析JSON结果
-        import json
-        try:
-            # 尝试直接解析JSON
-            tasks = json.loads(result)
-        except json.JSONDecodeError:
-            # 如果直接解析失败,尝试提取JSON部分
-            import re
-            json_match = re.search(r'```json\n(.*?)\n```', result, re.DOTALL)
-            if json_match:
-                tasks = json.loads(json_match.group(1))
-            else:
-                # 如果还是失败,尝试提取数组部分
-                array_match = re.search(r'\[(.*?)\]', result, re.DOTALL)
-                if array_match:
-                    tasks = json.loads(f"[{array_match.group(1)}]")
-                else:
-                    raise Exception("无法解析规划结果")
-        
-        # 确保tasks是列表
-        if not isinstance(tasks, list):
-            tasks = [tasks]
+        # 解析JSON结果（代码块、数组前后的说明文字、多余逗号、单引号均可容错）
+        tasks = parser.close()
+        # 结束时才确认的任务（没有任务数组时的单个对象计划）在这里补发
+        for task in tasks[len(streamed):]:
+            if on_task and _is_valid_task(task):
+                on_task(task)
             
         # 过滤有效任务
-        tasks = [task for task in tasks if task.get('tools') and len(task['tools']) > 0]
+        tasks = [task for task in tasks if _is_valid_task(task)]
         
         return tasks
     except Exception as e:
@@ -5,6 +5,7 @@ from .generate_title import resolve_generate_title_prompt
 from .generate_result import resolve_result_prompt
 from .think import resolve_think_prompt
 from .plan import resolve_planning_prompt
+from .summarize_memory import resolve_memory_summary_prompt
 
 
 __all__ = [
@@ -14,5 +15,6 @@ __all__ = [
     'resolve_generate_title_prompt',
     'resolve_result_prompt',
     'resolve_think_prompt',
-    'resolve_planning_prompt'
+    'resolve_planning_prompt',
+    'resolve_memory_summary_prompt'
 ] 
\ No newline at end of file
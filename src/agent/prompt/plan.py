@@ -49,6 +49,10 @@ async def resolve_planning_prompt(
 {{
   "type": "object",
   "properties": {{
+    "id": {{
+      "type": "integer",
+      "description": "Task id, starting from 1 in array order"
+    }},
     "title": {{
       "type": "string",
       "description": "Task title"
@@ -65,12 +69,21 @@ async def resolve_planning_prompt(
         "type": "string",
         "description": "Tool name"
       }}
+    }},
+    "depends_on": {{
+      "type": "array",
+      "description": "Ids of earlier tasks whose results this task needs; empty if it can run independently",
+      "items": {{
+        "type": "integer"
+      }}
     }}
   }},
   "required": [
+    "id",
     "title",
     "description",
-    "tools"
+    "tools",
+    "depends_on"
   ]
 }}
 === END ===
@@ -80,6 +93,7 @@ async def resolve_planning_prompt(
 2. Task planning: First complete the acquisition of prerequisites (files, search content, etc.) based on task requirements, then complete the task goal based on relevant knowledge
 3. File search: Please first use the file search tool to determine the file to depend on, then use the file read tool to read the file content
 4. When need write code, please describe the requirements for code writing in one go, do not describe and implement separately
+5. Dependencies: only list a task in depends_on when its result is really needed; independent tasks (e.g. researching different entities) leave depends_on empty so they can run in parallel
 === END ===
 
 {experience_prompt}
@@ -93,14 +107,18 @@ For instance, if the Task Goal implies "Research major landmarks including Landm
 
 [
   {{
+    "id": 1,
     "title": "Research LandmarkA Details",
     "description": "Use web search tool to find open hours, ticket prices, and other relevant information for LandmarkA.",
-    "tools": ["web_search"]
+    "tools": ["web_search"],
+    "depends_on": []
   }},
   {{
+    "id": 2,
     "title": "Research LandmarkB Details",
     "description": "Use web search tool to find open hours, ticket prices, and other relevant information for LandmarkB.",
-    "tools": ["web_search"]
+    "tools": ["web_search"],
+    "depends_on": []
   }}
 ]
 This explicit example clarifies that each distinct entity/item that requires specific action becomes an individual task in the JSON array, rather than being grouped together or listed as bullet points within a single task's description.
@@ -0,0 +1,26 @@
+def resolve_memory_summary_prompt(history: str) -> str:
+    """
+    生成任务记忆摘要提示
+
+    Args:
+        history: 需要压缩的较早执行记录（每条消息一段）
+
+    Returns:
+        str: 记忆摘要提示
+    """
+    prompt = f"""
+You are compressing the working memory of Lemon, an AI agent that solves a task step by step with tools.
+Below are the earlier steps of the current task (the agent's actions, their observations and feedback).
+Write a concise summary that lets the agent continue the task without the original messages:
+- files created or modified and what they contain
+- commands run and their important results
+- errors met and how they were handled
+- decisions made and what remains to be done
+If the steps start with an earlier summary, merge it into the new summary.
+Use short bullet points, keep exact file paths and identifiers, and reply with the summary only.
+
+Earlier steps:
+{history}
+"""
+
+    return prompt
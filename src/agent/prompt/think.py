@@ -2,6 +2,8 @@ from typing import List, Dict, Any
 from .tool import resolve_tool_prompt
 import os
 from datetime import datetime
+from src.config import get_config
+from ..memory.memory_index import get_memory_index
 
 
 async def resolve_think_prompt(goal: str, context: Dict[str, Any]) -> str:
@@ -18,17 +20,22 @@ async def resolve_think_prompt(goal: str, context: Dict[str, Any]) -> str:
     # 获取工具提示
     tools = await resolve_tool_prompt()
     
-    # todo: 暂时不处理tasks完成状态
-    # 处理已完成任务
-    # tasks = (context.get('tasks', []) or []).filter(lambda x: x.get('status') == 'completed')
+    # 较早任务的记忆：按任务目标从对话记忆索引中检索最相关的片段，不拼接全部历史
     memory = ""
-#     if tasks:
-#         memory = "== Task Completion Status ==:\n"
-#         for task in tasks:
-#             memory += f"""=== TaskID: {task.get('id')}
-# Task Goal: {task.get('requirement')}
-# Task Execute Memory: {task.get('memorized', '')}
-# Task Result: {task.get('result')}\n"""
+    config = get_config()
+    if config.MEMORY_INDEX_ENABLED and context.get('conversation_id'):
+        conversation_id = context['conversation_id']
+        hits = get_memory_index(conversation_id).search(
+            goal,
+            top_k=config.MEMORY_INDEX_TOP_K,
+            exclude_keys=[f"{conversation_id}_{context.get('task_id')}"],
+            snippet_chars=config.MEMORY_INDEX_SNIPPET_CHARS
+        )
+        if hits:
+            memory = "== Relevant Memory From Earlier Tasks ==\n"
+            for hit in hits:
+                memory += f"""=== TaskID: {hit['task_id']} ({hit['action_type']})
+{hit['snippet']}\n"""
     
     # 处理上传文件
     upload_file_description = ""
@@ -39,9 +46,35 @@ async def resolve_think_prompt(goal: str, context: Dict[str, Any]) -> str:
     # 获取应用端口
     app_ports = ['6666', '6667']
     
+    # 单动作/批量动作回复规则
+    multi_action = get_config().AGENT_MULTI_ACTION
+    if multi_action:
+        action_rule = f"""In your single reply you may return **a batch of up to {get_config().AGENT_MAX_ACTIONS_PER_TURN} independent XML execution commands wrapped in <actions></actions>** when the next steps do not depend on each other's results (for example writing several files and then running one command). Commands run in order; if you add <depends_on> (comma separated 1-based positions of earlier commands in the batch) to any command, commands without it run in parallel. Never batch a command that needs to see the output of another command in the same batch. Use a single command when the next step depends on feedback. Wait for the combined execution result before you proceed."""
+        example = """<actions>
+<write_code>
+<path>code path here</path>
+<content>
+// code full content here
+</content>
+</write_code>
+<terminal_run>
+<command>command here</command>
+<cwd>.</cwd>
+<depends_on>1</depends_on>
+</terminal_run>
+</actions>"""
+    else:
+        action_rule = """**in your single reply, you must and only return one XML formatted execution command**. It is strictly forbidden to include multiple action tags in one reply (for example, do not return two <web_search> commands at the same time). Wait for the user to execute the command you provided and provide feedback on the result before you proceed with the next step based on the feedback."""
+        example = """<write_code>
+<path>code path here</path>
+<content>
+// code full content here
+</content>
+</write_code>"""
+    
     prompt = f"""You are an intelligent assistant, an AI helper capable of guiding users in interacting with computers, writing code, and solving tasks. 
 Based on the <Task Goal> and <Tool List>, as well as the context, plan the execution steps and use the appropriate tools to complete the task.
-According to the current situation, **in your single reply, you must and only return one XML formatted execution command**. It is strictly forbidden to include multiple action tags in one reply (for example, do not return two <web_search> commands at the same time). Wait for the user to execute the command you provided and provide feedback on the result before you proceed with the next step based on the feedback.
+According to the current situation, {action_rule}
 
 ==== Current System Environment ===
 - Operating System: {os.name}
@@ -117,12 +150,7 @@ If you believe the task is complete, please use the finish tool to return a task
 {tools}
 
 === Example Return Format ===
-<write_code>
-<path>code path here</path>
-<content>
-// code full content here
-</content>
-</write_code>
+{example}
 === END ===
 
 please response with xml format with action and params"""
@@ -0,0 +1,215 @@
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+import asyncio
+import time
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TaskScheduler:
+    """
+    依赖感知的任务调度器
+
+    任务通过depends_on声明依赖的任务ID，所有依赖完成后即可执行（没有depends_on字段的任务依赖之前的全部任务，
+    即按顺序执行），就绪任务在并发上限内同时执行；任务失败时取消所有（传递）依赖它的任务，其余任务继续
+    """
+
+    def __init__(
+        self,
+        task_manager,
+        run_task: Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]],
+        max_parallel: int = 3,
+        should_stop: Optional[Callable[[], bool]] = None,
+        on_cancel: Optional[Callable[[Dict[str, Any], str], Any]] = None
+    ):
+        """
+        初始化调度器
+
+        Args:
+            task_manager: 任务管理器，记录每个任务的状态
+            run_task: 执行单个任务，失败时返回None或status为failure的结果
+            max_parallel: 最大并发任务数
+            should_stop: 可选，返回True时不再启动新任务
+            on_cancel: 可选，任务因依赖失败被取消时回调（任务, 原因）
+        """
+        self.task_manager = task_manager
+        self.run_task = run_task
+        self.max_parallel = max(1, max_parallel)
+        self.should_stop = should_stop or (lambda: False)
+        self.on_cancel = on_cancel
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.order: List[str] = []
+        self.status: Dict[str, str] = {}
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.started_at: Dict[str, float] = {}
+        self.finished_at: Dict[str, float] = {}
+        self.running: Dict[asyncio.Task, str] = {}
+        self.closed = False
+        self._wakeup = asyncio.Event()
+        self._start_time: Optional[float] = None
+
+    @staticmethod
+    def _key(task_id: Any) -> str:
+        return str(task_id)
+
+    def _deps(self, task: Dict[str, Any]) -> List[str]:
+        key = self._key(task['id'])
+        if task.get('depends_on') is None:
+            # 旧计划或未声明依赖的任务保持原来的顺序执行
+            return self.order[:self.order.index(key)] if key in self.order else list(self.order)
+        return [self._key(dep) for dep in task['depends_on'] if self._key(dep) != key]
+
+    def add(self, task: Dict[str, Any]) -> None:
+        """
+        加入一个任务（可在调度进行中加入，例如流水线规划产出的任务）
+
+        Args:
+            task: 任务信息，需包含id，可选depends_on（缺省时依赖之前的全部任务）；status为completed的任务视为已完成
+        """
+        key = self._key(task['id'])
+        self.tasks[key] = task
+        self.order.append(key)
+        if task.get('status') == 'completed':
+            # 恢复执行时已完成的任务不再执行，依赖它的任务直接就绪
+            self.status[key] = 'completed'
+            self.results[key] = self.task_manager.get_task_result(task)
+        else:
+            self.status[key] = 'pending'
+        self._wakeup.set()
+
+    def close(self) -> None:
+        """不再有新任务加入"""
+        self.closed = True
+        self._wakeup.set()
+
+    def _cancel(self, key: str, reason: str) -> None:
+        """标记任务为已取消"""
+        self.status[key] = 'cancelled'
+        self.task_manager.update_task_status(self.tasks[key]['id'], 'cancelled', {'error': reason})
+        logger.warning(f'Task {key} cancelled: {reason}')
+        if self.on_cancel:
+            self.on_cancel(self.tasks[key], reason)
+
+    def _schedule(self) -> None:
+        """取消依赖失败的任务，并在并发上限内启动就绪任务"""
+        changed = True
+        while changed:
+            changed = False
+            for key in self.order:
+                if self.status[key] != 'pending':
+                    continue
+                deps = self._deps(self.tasks[key])
+                failed = [dep for dep in deps if self.status.get(dep) in ('failed', 'cancelled')]
+                if failed:
+                    self._cancel(key, f'dependency {failed[0]} {self.status[failed[0]]}')
+                    # 取消会传递给依赖本任务的后续任务
+                    changed = True
+                    continue
+                # 规划结束后仍不存在的依赖视为无效依赖
+                waiting = [dep for dep in deps if self.status.get(dep) != 'completed' and (dep in self.status or not self.closed)]
+                if waiting or len(self.running) >= self.max_parallel or self.should_stop():
+                    continue
+                self._start(key)
+
+    def _start(self, key: str) -> None:
+        """启动任务"""
+        self.status[key] = 'running'
+        self.started_at[key] = time.monotonic()
+        self.running[asyncio.ensure_future(self.run_task(self.tasks[key]))] = key
+
+    def _finish(self, future: asyncio.Task) -> None:
+        """记录任务结束状态"""
+        key = self.running.pop(future)
+        self.finished_at[key] = time.monotonic()
+        result = None if future.cancelled() or future.exception() else future.result()
+        if result is None or result.get('status') == 'failure':
+            self.status[key] = 'failed'
+            if future.exception():
+                logger.error(f'Task {key} raised: {future.exception()}')
+        else:
+            self.status[key] = 'completed'
+            self.results[key] = result
+
+    async def run(self) -> List[Dict[str, Any]]:
+        """
+        执行所有任务直到全部结束（或被停止）
+
+        Returns:
+            List[Dict[str, Any]]: 成功任务的结果（按任务顺序）
+        """
+        self._start_time = time.monotonic()
+        try:
+            while True:
+                self._wakeup.clear()
+                self._schedule()
+                if not self.running:
+                    pending = [key for key in self.order if self.status[key] == 'pending']
+                    if self.should_stop() or (self.closed and not pending):
+                        break
+                    if self.closed:
+                        # 剩余任务的依赖无法满足（例如循环依赖）
+                        for key in pending:
+                            self._cancel(key, 'unsatisfiable dependencies')
+                        break
+                wakeup = asyncio.ensure_future(self._wakeup.wait())
+                try:
+                    done, _ = await asyncio.wait([*self.running, wakeup], return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    wakeup.cancel()
+                for future in done:
+                    if future in self.running:
+                        self._finish(future)
+        finally:
+            # 调度器被取消（或停止）时取消所有进行中的任务
+            for future in self.running:
+                future.cancel()
+            if self.running:
+                await asyncio.gather(*self.running, return_exceptions=True)
+        self.report()
+        return [self.results[key] for key in self.order if key in self.results]
+
+    def critical_path(self) -> Dict[str, Any]:
+        """
+        计算已完成任务的关键路径
+
+        Returns:
+            Dict[str, Any]: 关键路径任务、关键路径耗时、任务耗时总和与实际墙钟时间
+        """
+        durations = {
+            key: self.finished_at[key] - self.started_at[key]
+            for key in self.order if key in self.finished_at
+        }
+        # 按任务顺序（依赖总在前）递推最长路径
+        longest: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for key in self.order:
+            if key not in durations:
+                continue
+            best, best_dep = 0.0, None
+            for dep in self._deps(self.tasks[key]):
+                if longest.get(dep, -1.0) > best:
+                    best, best_dep = longest[dep], dep
+            longest[key] = best + durations[key]
+            previous[key] = best_dep
+        path: List[str] = []
+        key = max(longest, key=longest.get) if longest else None
+        while key is not None:
+            path.append(key)
+            key = previous[key]
+        return {
+            'critical_path': list(reversed(path)),
+            'critical_path_time': max(longest.values()) if longest else 0.0,
+            'total_task_time': sum(durations.values()),
+            'wall_time': time.monotonic() - self._start_time if self._start_time else 0.0,
+            'status': dict(self.status)
+        }
+
+    def report(self) -> Dict[str, Any]:
+        """记录并返回关键路径统计"""
+        timing = self.critical_path()
+        logger.info(
+            f"Scheduler finished: wall={timing['wall_time']:.2f}s, "
+            f"critical_path={timing['critical_path_time']:.2f}s {timing['critical_path']}, "
+            f"sum_of_tasks={timing['total_task_time']:.2f}s"
+        )
+        return timing
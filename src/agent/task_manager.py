@@ -15,23 +15,39 @@ class TaskManager:
         self.log_file = log_file
         self.conversation_id = conversation_id
         self.tasks = []
+        # 规划是否已完整结束（恢复执行时据此决定是否需要重新规划）
+        self.planned = False
         self._load_tasks()
 
     def _load_tasks(self) -> None:
-        """从日志文件加载任务"""
+        """从日志文件加载任务（只加载属于当前对话的任务）"""
         try:
             if os.path.exists(self.log_file):
                 with open(self.log_file, 'r', encoding='utf-8') as f:
-                    self.tasks = json.load(f)
+                    data = json.load(f)
+                if isinstance(data, list):
+                    # 兼容旧格式：只有任务列表，任务可能缺少id/status/requirement
+                    for index, task in enumerate(data):
+                        self._fill_defaults(task, index + 1)
+                    data = {'conversation_id': self.conversation_id, 'planned': bool(data), 'tasks': data}
+                if data.get('conversation_id') == self.conversation_id:
+                    self.tasks = data.get('tasks', [])
+                    self.planned = data.get('planned', False)
         except Exception as e:
             print(f"Error loading tasks: {e}")
             self.tasks = []
 
     def _save_tasks(self) -> None:
-        """保存任务到日志文件"""
+        """保存任务到日志文件（先写临时文件再替换，作为恢复执行的检查点）"""
         try:
-            with open(self.log_file, 'w', encoding='utf-8') as f:
-                json.dump(self.tasks, f, ensure_ascii=False, indent=2)
+            tmp_file = f'{self.log_file}.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'conversation_id': self.conversation_id,
+                    'planned': self.planned,
+                    'tasks': self.tasks
+                }, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.log_file)
         except Exception as e:
             print(f"Error saving tasks: {e}")
 
@@ -42,8 +58,54 @@ class TaskManager:
         Args:
             tasks: 任务列表
         """
-        self.tasks = tasks
+        self.tasks = []
+        self.planned = False
+        for task in tasks:
+            self.add_task(task)
+        self._save_tasks()
+
+    def mark_planned(self) -> None:
+        """记录规划已完整结束"""
+        self.planned = True
+        self._save_tasks()
+
+    def reset_unfinished(self) -> List[Dict[str, Any]]:
+        """
+        恢复执行前把未完成的任务（中断时运行中、失败或取消的任务）重置为待执行
+        
+        Returns:
+            List[Dict[str, Any]]: 被重置的任务
+        """
+        reset = []
+        for task in self.tasks:
+            if task.get('status') != 'completed':
+                task['status'] = 'pending'
+                task.pop('result', None)
+                reset.append(task)
         self._save_tasks()
+        return reset
+
+    @staticmethod
+    def _fill_defaults(task: Dict[str, Any], task_id: int) -> None:
+        """补全任务缺少的id/status/requirement"""
+        task.setdefault('id', task_id)
+        task.setdefault('status', 'pending')
+        task.setdefault('requirement', task.get('description') or task.get('title', ''))
+
+    def add_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        追加一个任务（流水线模式下规划每产出一个任务即追加）
+        
+        Args:
+            task: 任务信息，缺少id/status/requirement时自动补全
+            
+        Returns:
+            Dict[str, Any]: 追加后的任务
+        """
+        self._fill_defaults(task, len(self.tasks) + 1)
+        self.tasks.append(task)
+        self._save_tasks()
+        return task
 
     def get_tasks(self) -> List[Dict[str, Any]]:
         """
@@ -71,6 +133,33 @@ class TaskManager:
                 break
         self._save_tasks()
 
+    @staticmethod
+    def get_task_result(task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        把任务记录中保存的结果（{'result', 'memorized'}）还原为任务执行结果的格式，
+        恢复执行时跳过的已完成任务与重新执行的任务返回同样格式的结果
+        
+        Args:
+            task: 任务信息
+            
+        Returns:
+            Optional[Dict[str, Any]]: 执行结果（status, comments, content, memorized, meta），没有结果时返回None
+        """
+        saved = task.get('result')
+        if saved is None:
+            return None
+        if not isinstance(saved, dict):
+            saved = {'result': saved}
+        return {
+            'status': 'success',
+            'comments': 'Task Success !',
+            'content': saved.get('result'),
+            'memorized': saved.get('memorized', ''),
+            'meta': {
+                'action_type': 'finish',
+            }
+        }
+
     def get_task_by_id(self, task_id: int) -> Optional[Dict[str, Any]]:
         """
         根据ID获取任务
@@ -117,12 +206,14 @@ class TaskManager:
         total = len(self.tasks)
         completed = sum(1 for task in self.tasks if task.get('status') == 'completed')
         failed = sum(1 for task in self.tasks if task.get('status') == 'failed')
-        pending = total - completed - failed
+        cancelled = sum(1 for task in self.tasks if task.get('status') == 'cancelled')
+        pending = total - completed - failed - cancelled
 
         return {
             'total': total,
             'completed': completed,
             'failed': failed,
+            'cancelled': cancelled,
             'pending': pending,
             'progress': (completed / total * 100) if total > 0 else 0
         } 
\ No newline at end of file
@@ -1,5 +1,7 @@
 def get_config():
     """获取配置信息"""
+    import os
+
     class Config:
         """配置类"""
         def __init__(self):
@@ -12,13 +14,126 @@ def get_config():
             self.MODEL_TEMPERATURE = 0.7
             self.MODEL_MAX_TOKENS = 2000
 
+            # 输出预算（默认关闭，使用MODEL_MAX_TOKENS）：各阶段默认（最大）max_tokens，积累足够样本后按历史生成长度的分位 * 余量自适应收紧
+            self.LLM_ADAPTIVE_MAX_TOKENS = False
+            self.LLM_STAGE_MAX_TOKENS = {
+                'planning': 2000,
+                'thinking': 2000,
+                'memory_summary': 600
+            }
+            self.LLM_MAX_TOKENS_PERCENTILE = 99
+            self.LLM_MAX_TOKENS_HEADROOM = 1.25
+            self.LLM_MAX_TOKENS_MIN = 256
+            self.LLM_MAX_TOKENS_MIN_SAMPLES = 20
+            # 响应因max_tokens截断时的最大续写次数
+            self.LLM_MAX_CONTINUATIONS = 2
+
             # API配置
-            self.OPENAI_API_KEY = 'sk-xxxxxxxxx'
-            self.OPENAI_API_BASE = 'https://one.ooo.cool/v1'
+            self.OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', 'sk-xxxxxxxxx')
+            # 设置为 mock://local?ttft=0.3&tps=50 可使用进程内离线模拟（见 src/utils/mock_llm.py）
+            self.OPENAI_API_BASE = os.getenv('OPENAI_API_BASE', 'https://one.ooo.cool/v1')
+
+            # 连接池配置
+            self.LLM_POOL_LIMIT = 100
+            self.LLM_POOL_LIMIT_PER_HOST = 20
+            self.LLM_KEEPALIVE_TIMEOUT = 30
+
+            # 响应缓存配置（默认关闭，开启后仅缓存temperature为0的确定性调用）
+            self.LLM_CACHE_ENABLED = False
+            self.LLM_CACHE_MAX_BYTES = 32 * 1024 * 1024
+            self.LLM_CACHE_TTL = 7 * 24 * 3600
+
+            # 限流配置（按模型，未配置的模型使用default）
+            self.LLM_RATE_LIMITS = {
+                'default': {'rpm': 500, 'tpm': 200000, 'max_concurrency': 16},
+                'gpt-4o': {'rpm': 500, 'tpm': 300000, 'max_concurrency': 32}
+            }
+
+            # 重试与熔断配置
+            self.LLM_RETRY_MAX_ATTEMPTS = 4
+            self.LLM_RETRY_BASE_DELAY = 0.5
+            self.LLM_RETRY_MAX_DELAY = 20.0
+            self.LLM_BREAKER_FAILURE_THRESHOLD = 5
+            self.LLM_BREAKER_RECOVERY_TIMEOUT = 30.0
+
+            # 多提供方路由配置（type: openai_http / openai_sdk / qwen）
+            self.LLM_PROVIDERS = [
+                {
+                    'name': 'openai',
+                    'type': 'openai_http',
+                    'base_url': self.OPENAI_API_BASE,
+                    'api_key': self.OPENAI_API_KEY,
+                    'model': self.MODEL_NAME
+                },
+                # {
+                #     'name': 'qwen',
+                #     'type': 'qwen',
+                #     'base_url': 'https://dashscope.aliyuncs.com/api',
+                #     'api_key': 'sk-xxxxxxxxx',
+                #     'model': 'qwen-plus'
+                # },
+            ]
+            # 对冲请求：主后端超过p95延迟仍未返回时向次优后端重复发送，先返回者胜出
+            self.LLM_HEDGE_ENABLED = False
+            self.LLM_HEDGE_MIN_DELAY = 1.0
+
+            # 模型单价（每百万token），用于遥测费用估算
+            self.LLM_PRICING = {
+                'gpt-4o': {'prompt': 2.5, 'completion': 10.0}
+            }
+
+            # 思考阶段历史消息的token预算：超出时省略早期代码内容并把早期消息折叠为摘要
+            self.CONTEXT_TOKEN_BUDGET = 12000
+            self.CONTEXT_RECENT_MESSAGES = 6
+            self.CONTEXT_ELIDE_CHARS = 1500
+            self.CONTEXT_SUMMARY_CHARS = 200
+
+            # 任务记忆日志：fsync策略 none / batch（每N条或每隔T秒）/ always，无效记录超过阈值时后台压缩
+            self.MEMORY_FSYNC = 'batch'
+            self.MEMORY_FSYNC_BATCH = 32
+            self.MEMORY_FSYNC_INTERVAL = 1.0
+            self.MEMORY_COMPACT_MIN_GARBAGE = 64
+            self.MEMORY_COMPACT_RATIO = 1.0
+            # 任务记忆摘要：未归档的助手轮次达到阈值后在后台用LLM总结较早的消息，原消息在日志中标记为归档，
+            # 最近若干条消息保留原文；get_messages(summarize=True)返回压缩后的视图（默认关闭）
+            self.MEMORY_SUMMARIZE = False
+            self.MEMORY_SUMMARIZE_AFTER_TURNS = 8
+            self.MEMORY_SUMMARIZE_KEEP = 6
+            # 对话内任务记忆的BM25检索索引（默认关闭）：思考提示只带上与当前任务最相关的若干条较早任务记忆片段
+            self.MEMORY_INDEX_ENABLED = False
+            self.MEMORY_INDEX_TOP_K = 5
+            self.MEMORY_INDEX_SNIPPET_CHARS = 500
+            # 按内容寻址的大文本存储：记忆、工具结果、任务结果和消息记录中达到阈值（字符）的文本只保存引用，
+            # 原文压缩后按sha256存入 cache/blobs（相同内容只写一次），使用时再解析（默认关闭）
+            self.BLOB_STORE_ENABLED = False
+            self.BLOB_MIN_SIZE = 1024
+            self.BLOB_CACHE_MAX_BYTES = 16 * 1024 * 1024
+            self.BLOB_COMPRESS_LEVEL = 6
 
             # 代理配置
             self.AGENT_MEMORY_SIZE = 10
             self.AGENT_MAX_ITERATIONS = 3
+            # 流水线模式（默认关闭）：规划仍在生成时即开始执行已产出的任务
+            self.AGENT_PIPELINE_EXECUTION = False
+            # 无依赖关系（depends_on）的任务最多同时执行的数量（默认1，即按顺序执行）
+            self.AGENT_MAX_PARALLEL_TASKS = 1
+            # 批量动作模式（可选）：一次thinking可返回<actions>包裹的多个独立动作，减少LLM往返
+            self.AGENT_MULTI_ACTION = False
+            self.AGENT_MAX_ACTIONS_PER_TURN = 5
+            # stop()等待运行任务树退出的上限（秒）
+            self.AGENT_STOP_TIMEOUT = 0.2
+            # 超时预算（秒，None表示不限制）：整个会话、规划、单次思考、单个动作；超时的思考/动作计为一次重试
+            self.AGENT_RUN_TIMEOUT = 1800
+            self.AGENT_PLANNING_TIMEOUT = 180
+            self.AGENT_THINK_TIMEOUT = 120
+            self.AGENT_ACTION_TIMEOUT = 300
+            # 任务级重试退避（秒）：按失败类别分别配置，rate_limit跟随限流器，parse/timeout立即重试
+            self.AGENT_RETRY_BACKOFF = {
+                'parse': {'base_delay': 0.0, 'max_delay': 0.0},
+                'timeout': {'base_delay': 0.0, 'max_delay': 0.0},
+                'tool': {'base_delay': 0.25, 'max_delay': 2.0},
+                'transport': {'base_delay': 1.0, 'max_delay': 20.0}
+            }
 
     return Config()
 
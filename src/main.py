@@ -54,10 +54,13 @@ class TerminalInterface:
             self.console.print(f"[red]初始化失败: {str(e)}[/red]")
             raise
     
-    async def _handle_token_stream(self, message: Dict[str, Any]) -> None:
+    def _handle_token_stream(self, message: Dict[str, Any]) -> None:
         """处理token流"""
         try:
-            if message.get('status') == 'running':
+            if message.get('status') == 'streaming':
+                # 增量内容直接续写，不换行
+                self.console.print(message.get('content', ''), end='', markup=False, highlight=False)
+            elif message.get('status') == 'running':
                 self.console.print(f"\n[cyan]🔄 {message.get('content', '')}[/cyan]")
             elif message.get('status') == 'success':
                 if message.get('action_type') == 'auto_reply':
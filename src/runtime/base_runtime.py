@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional, List
+import asyncio
+from src.tools.base_tool import ToolResult
 
 class BaseRuntime(ABC):
     """运行时环境基类"""
@@ -29,6 +31,61 @@ class BaseRuntime(ABC):
         """
         pass
 
+    async def execute_actions(self, actions: List[Dict[str, Any]], context: Dict[str, Any], task_id: int) -> ToolResult:
+        """
+        执行一批动作并合并为一个观察结果
+        
+        没有动作声明depends_on时按顺序执行；否则按依赖执行，无依赖的动作并行执行。
+        依赖的动作失败时跳过本动作。
+        
+        Args:
+            actions: 动作列表，depends_on为批内下标列表
+            context: 上下文信息
+            task_id: 任务ID
+            
+        Returns:
+            ToolResult: 合并后的执行结果，meta包含每个动作的结果和合并的content
+        """
+        sequential = not any(action.get('depends_on') for action in actions)
+        futures: List[asyncio.Future] = []
+        
+        async def run(index: int, action: Dict[str, Any]) -> ToolResult:
+            deps = [index - 1] if sequential and index > 0 else action.get('depends_on', [])
+            for dep in deps:
+                dep_result = await futures[dep]
+                if dep_result.status != 'success':
+                    return ToolResult(status='failure', error=f'skipped because action {dep + 1} failed')
+            try:
+                return await self.execute_action(action, context, task_id)
+            except Exception as e:
+                return ToolResult(status='failure', error=str(e))
+        
+        # 依赖只能指向批内更早的动作，不会形成环
+        for index, action in enumerate(actions):
+            futures.append(asyncio.ensure_future(run(index, action)))
+        results = await asyncio.gather(*futures)
+        
+        observations = []
+        filepaths = []
+        for index, (action, result) in enumerate(zip(actions, results), start=1):
+            meta = result.meta if isinstance(result.meta, dict) else {}
+            if meta.get('filepath'):
+                filepaths.append(meta['filepath'])
+            detail = meta.get('content') if result.status == 'success' else result.error
+            observations.append(f"[{index}] {action['type']} {result.status}: {detail}")
+        
+        success = all(result.status == 'success' for result in results)
+        content = '\n'.join(observations)
+        return ToolResult(
+            status='success' if success else 'failure',
+            meta={
+                'content': content,
+                'filepaths': filepaths,
+                'results': [result.model_dump() for result in results]
+            },
+            error=None if success else content
+        )
+
     @abstractmethod
     async def get_status(self) -> Dict[str, Any]:
         """
@@ -13,6 +13,7 @@ from src.runtime.base_runtime import BaseRuntime
 from src.utils.message import Message
 from src.config import get_config, get_workspace_dir, get_log_dir
 from src.logger import get_logger
+from src.utils.transport import close_transports
 
 
 class LocalRuntime(BaseRuntime):
@@ -125,6 +126,8 @@ class LocalRuntime(BaseRuntime):
                     file.unlink()
                 except Exception as e:
                     self.logger.error(f'Error cleaning up file {file}: {e}')
+        # 关闭LLM连接池
+        await close_transports()
 
     async def validate_action(self, action: Dict[str, Any]) -> bool:
         """
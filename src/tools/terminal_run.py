@@ -1,5 +1,7 @@
 from typing import Any, Dict
 import asyncio
+import os
+import signal
 from .base_tool import BaseTool, ToolResult
 
 class TerminalRun(BaseTool):
@@ -23,52 +25,86 @@ class TerminalRun(BaseTool):
                 "cwd": {
                     "description": "The working directory to execute the command.",
                     "type": "string"
+                },
+                "timeout": {
+                    "description": "Optional timeout in seconds; the command is killed when it is exceeded.",
+                    "type": "number"
                 }
             },
             "required": ["command"]
         }
     
     async def execute(self, **kwargs) -> ToolResult:
-        """执行工具"""
+        """执行工具：命令在独立进程组中运行，任务被取消时终止整个进程组"""
         try:
             command = kwargs.get("command")
             cwd = kwargs.get("cwd", ".")
+            timeout = float(kwargs["timeout"]) if kwargs.get("timeout") else None
             
             if not command:
                 return ToolResult(
-                    success=False,
+                    status='failure',
                     error="Missing required parameter: command"
                 )
             
-            # 创建进程
+            # 创建进程（新会话，便于取消时连同子进程一起终止）
             process = await asyncio.create_subprocess_shell(
                 command,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
-                cwd=cwd
+                cwd=cwd,
+                start_new_session=True
             )
             
             # 等待进程完成
-            stdout, stderr = await process.communicate()
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                await kill_process_group(process)
+                return ToolResult(
+                    status='failure',
+                    error=f"Command timed out after {timeout:g}s and was killed"
+                )
+            except asyncio.CancelledError:
+                await kill_process_group(process)
+                raise
             
-            # 检查返回码
+            # 检查返回码（ToolResult没有success/data字段，结果放在status/meta中，meta保留原有的stdout/stderr/returncode）
             if process.returncode == 0:
                 return ToolResult(
-                    success=True,
-                    data={
+                    status='success',
+                    meta={
                         "stdout": stdout.decode() if stdout else "",
                         "stderr": stderr.decode() if stderr else "",
-                        "returncode": process.returncode
+                        "returncode": process.returncode,
+                        # 执行结果作为观察反馈给模型
+                        "content": stdout.decode() if stdout else ""
                     }
                 )
             else:
                 return ToolResult(
-                    success=False,
+                    status='failure',
                     error=f"Command failed with return code {process.returncode}: {stderr.decode() if stderr else ''}"
                 )
             
         except Exception as e:
             return ToolResult(
-                success=False,
+                status='failure',
                 error=str(e)
-            ) 
\ No newline at end of file
+            )
+
+
+async def kill_process_group(process: asyncio.subprocess.Process) -> None:
+    """
+    终止进程及其所在进程组（shell启动的子进程）并回收
+    
+    Args:
+        process: 子进程
+    """
+    if process.returncode is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    await process.wait()
@@ -3,6 +3,7 @@ import os
 from .base_tool import BaseTool, ToolResult
 from pathlib import Path
 from src.config import get_workspace_dir
+from src.utils.blob_store import get_blob_store
 
 class WriteCodeTool(BaseTool):
     """写入代码工具"""
@@ -60,7 +61,8 @@ class WriteCodeTool(BaseTool):
                 meta={
                     "path": str(relative_path),  # 返回相对路径
                     "filepath": str(absolute_path),
-                    "content": content
+                    # 文件内容只保存blob引用（相同内容只存一份），记忆、任务结果和消息记录随之只保存引用
+                    "content": get_blob_store().ref(content)
                 }
             )
             
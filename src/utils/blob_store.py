@@ -0,0 +1,233 @@
+from typing import Dict, Any, Optional
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import os
+import re
+import zlib
+from src.config import get_config
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 文本中的blob引用，例如 [[blob:<sha256>]]
+BLOB_REF_PATTERN = re.compile(r'\[\[blob:([0-9a-f]{64})\]\]')
+# write_code动作中的代码内容
+CONTENT_BODY_PATTERN = re.compile(r'(<content>)(.*?)(</content>)', re.S)
+# 引用可以嵌套（例如记忆汇总中包含代码引用），解析时最多展开的层数
+MAX_RESOLVE_DEPTH = 4
+
+
+class BlobStore:
+    """
+    按内容寻址的大文本存储：sha256 -> 压缩后的字节（磁盘），内存LRU缓存解压后的文本
+
+    记忆、工具结果、任务结果和消息记录只保存引用，相同内容只写一次，需要原文时再解析
+    """
+
+    def __init__(
+        self,
+        min_size: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        level: Optional[int] = None,
+        blob_dir: Optional[Path] = None
+    ):
+        """
+        初始化存储
+
+        Args:
+            min_size: 达到该长度（字符）的文本才替换为引用
+            max_bytes: 内存LRU的最大字节数
+            level: zlib压缩级别
+            blob_dir: 磁盘目录，默认为项目根目录下 cache/blobs
+        """
+        config = get_config()
+        self.enabled = config.BLOB_STORE_ENABLED
+        self.min_size = min_size if min_size is not None else config.BLOB_MIN_SIZE
+        self.max_bytes = max_bytes if max_bytes is not None else config.BLOB_CACHE_MAX_BYTES
+        self.level = level if level is not None else config.BLOB_COMPRESS_LEVEL
+        self.blob_dir = blob_dir or Path(__file__).parent.parent.parent / 'cache' / 'blobs'
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self._memory: 'OrderedDict[str, str]' = OrderedDict()
+        self._memory_bytes = 0
+        self.stats = {
+            'puts': 0,
+            'dedup_hits': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'missing': 0,
+            'bytes_raw': 0,
+            'bytes_written': 0
+        }
+
+    def _get_file_path(self, digest: str) -> Path:
+        """获取blob文件路径"""
+        return self.blob_dir / digest[:2] / f"{digest}.z"
+
+    def _put_memory(self, digest: str, text: str) -> None:
+        """写入内存LRU并按字节数淘汰最久未使用的条目"""
+        size = len(text.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        if digest in self._memory:
+            self._memory_bytes -= len(self._memory.pop(digest).encode('utf-8'))
+        self._memory[digest] = text
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.encode('utf-8'))
+
+    def put(self, text: str) -> str:
+        """
+        保存文本，内容已存在时不再写盘
+
+        Args:
+            text: 文本
+
+        Returns:
+            str: sha256十六进制摘要
+        """
+        raw = text.encode('utf-8')
+        digest = hashlib.sha256(raw).hexdigest()
+        self.stats['puts'] += 1
+        self.stats['bytes_raw'] += len(raw)
+        file_path = self._get_file_path(digest)
+        if digest in self._memory or file_path.exists():
+            self.stats['dedup_hits'] += 1
+        else:
+            compressed = zlib.compress(raw, self.level)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            # 先写临时文件再替换，避免读到半截内容
+            tmp_path = file_path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(compressed)
+            os.replace(tmp_path, file_path)
+            self.stats['bytes_written'] += len(compressed)
+        self._put_memory(digest, text)
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        """
+        读取文本，先查内存LRU再查磁盘
+
+        Args:
+            digest: sha256十六进制摘要
+
+        Returns:
+            Optional[str]: 文本，不存在时返回None
+        """
+        text = self._memory.get(digest)
+        if text is not None:
+            self._memory.move_to_end(digest)
+            self.stats['memory_hits'] += 1
+            return text
+        try:
+            with open(self._get_file_path(digest), 'rb') as f:
+                text = zlib.decompress(f.read()).decode('utf-8')
+        except FileNotFoundError:
+            self.stats['missing'] += 1
+            logger.warning(f'Blob {digest} not found')
+            return None
+        except Exception as e:
+            self.stats['missing'] += 1
+            logger.error(f'Error reading blob {digest}: {e}')
+            return None
+        self._put_memory(digest, text)
+        self.stats['disk_hits'] += 1
+        return text
+
+    def ref(self, text: Any) -> Any:
+        """
+        较长的文本替换为引用
+
+        Args:
+            text: 文本（非字符串原样返回）
+
+        Returns:
+            Any: 引用或原文本
+        """
+        if not self.enabled or not isinstance(text, str) or len(text) < self.min_size:
+            return text
+        if BLOB_REF_PATTERN.fullmatch(text):
+            return text
+        return f'[[blob:{self.put(text)}]]'
+
+    def dehydrate(self, text: Any) -> Any:
+        """
+        替换文本中的大段内容：先替换<content>中的代码，剩余部分仍然较长时整体替换为引用
+
+        Args:
+            text: 文本（例如记忆中的消息内容）
+
+        Returns:
+            Any: 替换后的文本
+        """
+        if not self.enabled or not isinstance(text, str) or len(text) < self.min_size:
+            return text
+        text = CONTENT_BODY_PATTERN.sub(
+            lambda match: match.group(1) + self.ref(match.group(2)) + match.group(3), text
+        )
+        return self.ref(text)
+
+    def resolve(self, value: Any) -> Any:
+        """
+        把引用展开为原文，支持嵌套的dict/list
+
+        Args:
+            value: 文本或包含文本的结构
+
+        Returns:
+            Any: 展开后的值（找不到的blob保留引用）
+        """
+        if isinstance(value, str):
+            for _ in range(MAX_RESOLVE_DEPTH):
+                if '[[blob:' not in value:
+                    break
+                resolved = BLOB_REF_PATTERN.sub(lambda match: self.get(match.group(1)) or match.group(0), value)
+                if resolved == value:
+                    # 剩余的引用都找不到，不再重复查找
+                    break
+                value = resolved
+            return value
+        if isinstance(value, dict):
+            return {key: self.resolve(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.resolve(item) for item in value]
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取存储统计
+
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        return {
+            **self.stats,
+            'memory_entries': len(self._memory),
+            'memory_bytes': self._memory_bytes
+        }
+
+
+_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """获取进程级blob存储"""
+    global _store
+    if _store is None:
+        _store = BlobStore()
+    return _store
+
+
+def resolve_blobs(value: Any) -> Any:
+    """
+    展开文本（或dict/list）中的blob引用
+
+    Args:
+        value: 文本或包含文本的结构
+
+    Returns:
+        Any: 展开后的值
+    """
+    return get_blob_store().resolve(value)
@@ -0,0 +1,236 @@
+from typing import Dict, Any, List, Optional, Callable
+import re
+from src.config import get_config
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+# write_code动作中的代码内容
+CODE_BODY_PATTERN = re.compile(r'<content>(.*?)(</content>|$)', re.S)
+PATH_PATTERN = re.compile(r'<path>(.*?)</path>', re.S)
+ACTION_TAG_PATTERN = re.compile(r'<([A-Za-z_][\w-]*)\s*>')
+# 每条消息的固定开销（role等字段）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_text_tokens(text: str) -> int:
+    """
+    离线估算文本token数：ASCII字符约4个/token，其他字符（中文等）约1个/token
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: 估算的token数
+    """
+    if not text:
+        return 0
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+_estimator: Callable[[str], int] = estimate_text_tokens
+
+
+def get_token_estimator() -> Callable[[str], int]:
+    """获取当前的token估算函数"""
+    return _estimator
+
+
+def set_token_estimator(estimator: Callable[[str], int]) -> None:
+    """
+    替换token估算函数（例如接入本地分词器）
+
+    Args:
+        estimator: 输入文本返回token数的函数
+    """
+    global _estimator
+    _estimator = estimator
+
+
+class ContextPacker:
+    """
+    按token预算装配发送给模型的历史消息
+
+    - 始终保留第一条消息（任务提示）、最近一条反思和最近若干条消息
+    - 超出预算时先把较早消息中的大段代码替换为文件引用、截断较长的执行结果
+    - 仍超出预算时把最早的消息折叠为滚动摘要，必要时再压缩最近消息中的代码
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        recent: int = 6,
+        elide_chars: int = 1500,
+        summary_chars: int = 200,
+        estimator: Optional[Callable[[str], int]] = None
+    ):
+        """
+        初始化装配器
+
+        Args:
+            budget: 历史消息的token预算
+            recent: 始终保留原文的最近消息数
+            elide_chars: 超过该长度的代码/执行结果才会被省略
+            summary_chars: 折叠为摘要时每条消息保留的字符数
+            estimator: token估算函数，默认使用全局估算函数
+        """
+        self.budget = budget
+        self.recent = recent
+        self.elide_chars = elide_chars
+        self.summary_chars = summary_chars
+        self.estimator = estimator
+        self.stats = {
+            'packed': 0,
+            'elided': 0,
+            'folded': 0,
+            'tokens_before': 0,
+            'tokens_after': 0
+        }
+
+    def count(self, message: Dict[str, Any]) -> int:
+        """估算单条消息的token数"""
+        estimator = self.estimator or get_token_estimator()
+        return estimator(message.get('content') or '') + MESSAGE_OVERHEAD_TOKENS
+
+    def elide(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        省略消息中的大段内容：代码替换为文件引用，其他长文本保留首尾
+
+        Args:
+            message: 消息
+
+        Returns:
+            Dict[str, Any]: 省略后的消息（未超长时原样返回）
+        """
+        content = message.get('content') or ''
+        if len(content) <= self.elide_chars:
+            return message
+        path = PATH_PATTERN.search(content)
+
+        def replace(match: re.Match) -> str:
+            body = match.group(1)
+            if len(body) <= self.elide_chars:
+                return match.group(0)
+            target = path.group(1).strip() if path else 'the file'
+            return f'<content>[{body.count(chr(10)) + 1} lines elided, already written to {target}]</content>'
+
+        elided = CODE_BODY_PATTERN.sub(replace, content)
+        if len(elided) > self.elide_chars:
+            half = self.elide_chars // 2
+            elided = f'{elided[:half]}\n[... {len(elided) - 2 * half} characters elided ...]\n{elided[-half:]}'
+        self.stats['elided'] += 1
+        return {**message, 'content': elided}
+
+    def summary_line(self, message: Dict[str, Any]) -> str:
+        """把一条消息压缩为摘要中的一行"""
+        content = message.get('content') or ''
+        if message.get('role') == 'assistant':
+            tag = ACTION_TAG_PATTERN.search(content)
+            path = PATH_PATTERN.search(content)
+            action = tag.group(1) if tag else 'reply'
+            target = f' {path.group(1).strip()}' if path else ''
+            return f'- assistant: {action}{target}'
+        text = ' '.join(content.split())
+        if len(text) > self.summary_chars:
+            text = text[:self.summary_chars] + '...'
+        return f"- {message.get('action_type') or message.get('role')}: {text}"
+
+    def pack(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        按预算装配消息
+
+        Args:
+            messages: 记忆中的消息（含role/content/action_type）
+
+        Returns:
+            List[Dict[str, Any]]: 发送给模型的消息（只含role/content）
+        """
+        messages = [{'role': msg['role'], 'content': msg['content'], 'action_type': msg.get('action_type')} for msg in messages]
+        total = original_total = sum(self.count(msg) for msg in messages)
+        self.stats['tokens_before'] += total
+        if total <= self.budget or len(messages) <= 1:
+            self.stats['tokens_after'] += total
+            return [{'role': msg['role'], 'content': msg['content']} for msg in messages]
+
+        # 1. 确定必须保留原文的消息：任务提示、最近一条反思、最近若干条消息
+        count = len(messages)
+        pinned = {0, *range(max(1, count - self.recent), count)}
+        reflections = [i for i, msg in enumerate(messages) if msg.get('action_type') == 'reflection']
+        if reflections:
+            pinned.add(reflections[-1])
+        older = [i for i in range(1, count) if i not in pinned]
+
+        # 2. 省略较早消息中的大段内容
+        for i in older:
+            messages[i] = self.elide(messages[i])
+        tokens = [self.count(msg) for msg in messages]
+
+        # 3. 从最早的消息开始折叠为滚动摘要，直到满足预算
+        folded: List[int] = []
+        summary_lines: List[str] = []
+        summary_tokens = 0
+        total = sum(tokens)
+        for i in older:
+            if total + summary_tokens <= self.budget:
+                break
+            line = self.summary_line(messages[i])
+            summary_lines.append(line)
+            summary_tokens += self.count({'content': line})
+            total -= tokens[i]
+            folded.append(i)
+
+        # 4. 仍超出预算：省略最近消息中的大段内容（最后一条除外），再丢弃最早的摘要行
+        if total + summary_tokens > self.budget:
+            for i in sorted(pinned - {0, count - 1}):
+                messages[i] = self.elide(messages[i])
+                total += self.count(messages[i]) - tokens[i]
+                tokens[i] = self.count(messages[i])
+        while summary_lines and total + summary_tokens > self.budget:
+            summary_tokens -= self.count({'content': summary_lines.pop(0)})
+
+        folded_set = set(folded)
+        packed = [messages[0]]
+        if folded:
+            packed.append({
+                'role': 'user',
+                'content': f'Summary of {len(folded)} earlier messages:\n' + '\n'.join(summary_lines)
+            })
+        packed.extend(msg for i, msg in enumerate(messages) if i > 0 and i not in folded_set)
+        result = [{'role': msg['role'], 'content': msg['content']} for msg in packed]
+
+        packed_tokens = sum(self.count(msg) for msg in result)
+        self.stats['packed'] += 1
+        self.stats['folded'] += len(folded)
+        self.stats['tokens_after'] += packed_tokens
+        logger.info(
+            f'Packed context: {len(messages)} -> {len(result)} messages, '
+            f'{original_total} -> {packed_tokens} tokens (budget {self.budget})'
+        )
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取装配统计
+
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        return dict(self.stats)
+
+
+_packer: Optional[ContextPacker] = None
+
+
+def get_context_packer() -> ContextPacker:
+    """获取进程级上下文装配器"""
+    global _packer
+    if _packer is None:
+        config = get_config()
+        _packer = ContextPacker(
+            config.CONTEXT_TOKEN_BUDGET,
+            recent=config.CONTEXT_RECENT_MESSAGES,
+            elide_chars=config.CONTEXT_ELIDE_CHARS,
+            summary_chars=config.CONTEXT_SUMMARY_CHARS
+        )
+    return _packer
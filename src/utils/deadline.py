@@ -0,0 +1,121 @@
+from typing import Optional, Awaitable, TypeVar
+import asyncio
+import time
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar('T')
+
+
+class DeadlineExceeded(Exception):
+    """阶段超时或整体截止时间已到"""
+
+    def __init__(self, stage: str, timeout: Optional[float]):
+        self.stage = stage
+        self.timeout = timeout
+        super().__init__(f'{stage} timed out' + (f' after {timeout:.1f}s' if timeout is not None else ''))
+
+
+class Deadline:
+    """
+    整体截止时间，随context在各阶段间传递
+
+    每个阶段的可用时间取阶段预算与整体剩余时间中较小者，超时时取消该阶段并抛出DeadlineExceeded
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        """
+        初始化截止时间
+
+        Args:
+            timeout: 整体预算（秒），None表示不限制
+        """
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout if timeout is not None else None
+        self.stats = {}
+
+    def remaining(self) -> Optional[float]:
+        """
+        剩余时间
+
+        Returns:
+            Optional[float]: 剩余秒数，不限制时返回None
+        """
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """整体截止时间是否已到"""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def budget(self, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        计算阶段可用时间
+
+        Args:
+            timeout: 阶段预算（秒），None表示只受整体截止时间限制
+
+        Returns:
+            Optional[float]: 可用秒数，不限制时返回None
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return remaining if timeout is None else min(timeout, remaining)
+
+    async def run(self, awaitable: Awaitable[T], stage: str, timeout: Optional[float] = None) -> T:
+        """
+        在阶段预算内执行
+
+        Args:
+            awaitable: 阶段协程
+            stage: 阶段名称（planning / thinking / action ...），用于错误信息和统计
+            timeout: 阶段预算（秒）
+
+        Returns:
+            T: 阶段结果
+
+        Raises:
+            DeadlineExceeded: 阶段超时或整体截止时间已到
+        """
+        budget = self.budget(timeout)
+        if budget is None:
+            return await awaitable
+        if budget <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded(stage, 0.0)
+        # 不使用wait_for：阶段内部（工具、传输层）抛出的TimeoutError原样传出，只有本阶段预算用尽才转换为DeadlineExceeded
+        task = asyncio.ensure_future(awaitable)
+        try:
+            done, _ = await asyncio.wait([task], timeout=budget)
+        except asyncio.CancelledError:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            raise
+        if task not in done:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            self.stats[stage] = self.stats.get(stage, 0) + 1
+            logger.warning(f'Stage {stage} timed out after {budget:.1f}s')
+            raise DeadlineExceeded(stage, budget)
+        return task.result()
+
+
+def get_deadline(context: dict) -> Deadline:
+    """
+    获取上下文中的截止时间，不存在时创建不限制的截止时间
+
+    Args:
+        context: 上下文信息
+
+    Returns:
+        Deadline: 截止时间
+    """
+    if not isinstance(context.get('deadline'), Deadline):
+        context['deadline'] = Deadline()
+    return context['deadline']
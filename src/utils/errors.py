@@ -0,0 +1,40 @@
+from typing import Optional
+import asyncio
+import aiohttp
+
+
+class LLMError(Exception):
+    """LLM调用错误"""
+
+    def __init__(self, message: str = '', status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class RateLimitError(LLMError):
+    """LLM限流错误（HTTP 429）"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message, status=429)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(LLMError):
+    """熔断器打开，快速失败"""
+    pass
+
+
+def is_server_failure(error: Exception) -> bool:
+    """判断是否为服务端/网络故障（计入熔断器）"""
+    if isinstance(error, LLMError):
+        return error.status is not None and error.status >= 500
+    return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError))
+
+
+def is_retryable(error: Exception) -> bool:
+    """判断是否为可重试的瞬时错误"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, LLMError):
+        return error.status in (408, 429) or (error.status is not None and error.status >= 500)
+    return is_server_failure(error)
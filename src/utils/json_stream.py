@@ -0,0 +1,255 @@
+from typing import Any, List, Optional
+import json
+import re
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 对象或数组结束前的多余逗号
+TRAILING_COMMA_PATTERN = re.compile(r',(\s*[}\]])')
+# Python风格字面量
+PYTHON_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
+
+
+class JSONParseError(ValueError):
+    """JSON解析失败，offset为失败位置的UTF-8字节偏移"""
+
+    def __init__(self, message: str, offset: int):
+        self.offset = offset
+        super().__init__(f'{message} (byte offset {offset})')
+
+
+def repair_json(text: str) -> str:
+    """
+    修复模型输出中常见的JSON缺陷：单引号字符串、多余逗号、Python字面量
+
+    Args:
+        text: 单个JSON值的文本
+
+    Returns:
+        str: 修复后的文本
+    """
+    out = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char in '"\'':
+            # 读取完整字符串，单引号字符串转为双引号
+            j = i + 1
+            body = []
+            while j < len(text) and text[j] != char:
+                if text[j] == '\\' and j + 1 < len(text):
+                    body.append("'" if text[j + 1] == "'" else text[j:j + 2])
+                    j += 2
+                    continue
+                body.append('\\"' if text[j] == '"' else text[j])
+                j += 1
+            out.append('"' + ''.join(body) + '"')
+            i = j + 1
+            continue
+        if char.isalpha():
+            j = i
+            while j < len(text) and text[j].isalpha():
+                j += 1
+            word = text[i:j]
+            out.append(PYTHON_LITERALS.get(word, word))
+            i = j
+            continue
+        out.append(char)
+        i += 1
+    return TRAILING_COMMA_PATTERN.sub(r'\1', ''.join(out))
+
+
+def loads_lenient(text: str) -> Any:
+    """
+    先按标准JSON解析，失败后修复再解析
+
+    Args:
+        text: JSON文本
+
+    Returns:
+        Any: 解析结果
+    """
+    try:
+        return json.loads(text, strict=False)
+    except json.JSONDecodeError as error:
+        try:
+            return json.loads(repair_json(text), strict=False)
+        except json.JSONDecodeError:
+            # 报告原文中的错误位置
+            raise error
+
+
+class JSONArrayStreamParser:
+    """
+    流式JSON数组解析器：每个顶层元素对象的右括号到达时立即解析并产出
+
+    - 跳过数组前的说明文字和 ```json 代码块标记，数组之后的内容忽略
+    - 数组中没有可解析的元素时（例如说明文字中的 [{goal}]）从该数组之后继续寻找
+    - 没有找到任务数组时，结束时把第一个可解析的顶层对象按只有一个元素的数组处理
+    - 元素解析失败时尝试修复（单引号、多余逗号、Python字面量），仍失败则跳过并记录
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.items: List[Any] = []
+        self.errors: List[JSONParseError] = []
+        self.started = False
+        self.finished = False
+        self._pos = 0
+        self._depth = 0
+        self._quote: Optional[str] = None
+        self._escaped = False
+        self._item_start: Optional[int] = None
+        self._pending_array: Optional[int] = None
+        # 数组之外的 '{' 位置：单个对象计划的候选
+        self._objects: List[int] = []
+
+    def _offset(self, index: int) -> int:
+        """字符位置转换为UTF-8字节偏移"""
+        return len(self.buffer[:index].encode('utf-8'))
+
+    def _parse(self, start: int, end: int) -> Optional[Any]:
+        """解析 buffer[start:end]，失败时记录错误并返回None"""
+        try:
+            return loads_lenient(self.buffer[start:end])
+        except json.JSONDecodeError as e:
+            error = JSONParseError(f'Invalid array item: {e.msg}', self._offset(start + e.pos))
+            logger.warning(f'Skip unparseable plan item: {error}')
+            self.errors.append(error)
+            return None
+
+    def _emit(self, end: int) -> Optional[Any]:
+        start = self._item_start
+        self._item_start = None
+        item = self._parse(start, end)
+        if item is not None:
+            self.items.append(item)
+        return item
+
+    def _object_end(self, start: int) -> Optional[int]:
+        """从 '{' 开始寻找与之匹配的右括号之后的位置，对象未结束时返回None"""
+        depth = 0
+        quote = None
+        escaped = False
+        for index in range(start, len(self.buffer)):
+            char = self.buffer[index]
+            if quote:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == quote:
+                    quote = None
+            elif char in '"\'':
+                quote = char
+            elif char in '{[':
+                depth += 1
+            elif char in '}]':
+                depth -= 1
+                if depth == 0:
+                    return index + 1
+        return None
+
+    def _seek(self) -> bool:
+        """寻找顶层任务数组的起点，返回是否已找到"""
+        while self._pos < len(self.buffer):
+            char = self.buffer[self._pos]
+            if self._pending_array is not None:
+                # '[' 之后第一个非空白字符为 '{' 或 ']' 才认为是任务数组，避免误判 [Plan] 之类的文字
+                if char.isspace():
+                    self._pos += 1
+                    continue
+                if char in '{]':
+                    self.started = True
+                    self._depth = 1
+                    self._pending_array = None
+                    return True
+                self._pending_array = None
+            if char == '[':
+                self._pending_array = self._pos
+            elif char == '{':
+                self._objects.append(self._pos)
+            self._pos += 1
+        return False
+
+    def _restart(self) -> None:
+        """当前数组没有可解析的元素：从数组之后继续寻找"""
+        self.started = False
+        self._depth = 0
+        self._quote = None
+        self._escaped = False
+        self._item_start = None
+
+    def feed(self, delta: str) -> List[Any]:
+        """
+        接收一段增量
+
+        Args:
+            delta: 增量内容
+
+        Returns:
+            List[Any]: 本段增量中完成的元素
+        """
+        self.buffer += delta
+        completed = []
+        while not self.finished:
+            if not self.started and not self._seek():
+                break
+            if self._pos >= len(self.buffer):
+                break
+            char = self.buffer[self._pos]
+            if self._quote:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == self._quote:
+                    self._quote = None
+            elif char in '"\'':
+                # 单引号只在元素内部视为字符串（如 'tools': ['x']），顶层忽略
+                if self._item_start is not None:
+                    self._quote = char
+            elif char in '{[':
+                if self._depth == 1 and char == '{':
+                    self._item_start = self._pos
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._item_start is not None and self._depth == 1:
+                    item = self._emit(self._pos + 1)
+                    if item is not None:
+                        completed.append(item)
+                if self._depth <= 0:
+                    if self.items:
+                        self.finished = True
+                    else:
+                        self._restart()
+            self._pos += 1
+        return completed
+
+    def close(self) -> List[Any]:
+        """
+        结束解析
+
+        Returns:
+            List[Any]: 全部元素（没有任务数组时为单个对象计划）
+
+        Raises:
+            JSONParseError: 没有解析出任何元素
+        """
+        if not self.items:
+            for start in self._objects:
+                end = self._object_end(start)
+                item = self._parse(start, end) if end is not None else None
+                if isinstance(item, dict):
+                    self.items.append(item)
+                    return list(self.items)
+            if self.errors:
+                raise self.errors[0]
+            if self._item_start is not None:
+                raise JSONParseError('Unterminated array item', self._offset(self._item_start))
+            if self._objects:
+                raise JSONParseError('Unterminated object', self._offset(self._objects[0]))
+            raise JSONParseError('No JSON array found', self._offset(len(self.buffer)))
+        return list(self.items)
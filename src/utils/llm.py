@@ -1,15 +1,103 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator, Callable
 import os
 import json
+import asyncio
+import contextlib
 import aiohttp
 from src.config import get_config
 from src.logger import get_logger
+from src.utils.errors import LLMError, RateLimitError, CircuitOpenError, is_retryable as _is_retryable
+from src.utils.llm_cache import get_llm_cache, make_cache_key
+from src.utils.retry import get_retry_policy
+from src.utils.router import get_router
+from src.utils.single_flight import SingleFlight
+from src.utils.telemetry import get_telemetry
+from src.utils.token_budget import get_output_budget, build_continuation
+import time
 
 logger = get_logger(__name__)
 
-class LLMError(Exception):
-    """LLM调用错误"""
-    pass
+# 进程级请求合并：相同请求在途时复用同一结果
+_single_flight = SingleFlight()
+
+# options中可覆盖默认配置的采样参数
+SAMPLING_PARAMS = ('temperature', 'top_p', 'max_tokens', 'stop', 'seed', 'presence_penalty', 'frequency_penalty')
+
+def _build_request(prompt: str, role: str, options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    构建chat/completions请求体
+    
+    Args:
+        prompt: 提示词
+        role: 角色
+        options: 选项，未显式指定max_tokens时按stage取自适应输出预算
+        
+    Returns:
+        Dict[str, Any]: 请求体
+    """
+    config = get_config()
+    
+    # 准备消息
+    messages = options.get('messages', []) if options else []
+    if prompt:
+        messages.append({"role": role, "content": prompt})
+    
+    data = {
+        "model": config.MODEL_NAME,
+        "messages": messages,
+        "temperature": config.MODEL_TEMPERATURE,
+        "max_tokens": config.MODEL_MAX_TOKENS
+    }
+    if config.LLM_ADAPTIVE_MAX_TOKENS:
+        data["max_tokens"] = get_output_budget().max_tokens(options.get('stage') if options else None)
+    
+    # 采样参数覆盖
+    if options:
+        for key in SAMPLING_PARAMS:
+            if key in options:
+                data[key] = options[key]
+    
+    return data
+
+def _use_cache(data: Dict[str, Any], options: Optional[Dict[str, Any]]) -> bool:
+    """
+    判断本次调用是否走响应缓存：默认仅缓存temperature为0的调用，options['cache']可显式开关
+    """
+    if not get_config().LLM_CACHE_ENABLED:
+        return False
+    if options and 'cache' in options:
+        return bool(options['cache'])
+    return data.get('temperature') == 0
+
+def _use_coalesce(data: Dict[str, Any], options: Optional[Dict[str, Any]]) -> bool:
+    """
+    判断本次调用是否与在途的相同请求合并：默认仅合并temperature为0且没有stop_when的确定性调用
+    （采样调用各自的结果本就不同，stop_when需要逐段检测增量），options['coalesce']可显式开关
+    """
+    if options and 'coalesce' in options:
+        return bool(options['coalesce'])
+    return data.get('temperature') == 0 and not (options and options.get('stop_when'))
+
+async def stream(
+    prompt: str,
+    conversation_id: str,
+    role: str = "user",
+    options: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[str]:
+    """
+    以SSE流式调用LLM，逐段产出增量内容
+    
+    Args:
+        prompt: 提示词
+        conversation_id: 对话ID
+        role: 角色
+        options: 选项
+        
+    Yields:
+        str: 增量内容
+    """
+    async for delta in get_router().stream(_build_request(prompt, role, options)):
+        yield delta
 
 async def call(
     prompt: str,
@@ -24,56 +112,176 @@ async def call(
         prompt: 提示词
         conversation_id: 对话ID
         role: 角色
-        options: 选项
+        options: 选项，on_delta回调存在（或stream为True）时走流式请求，
+            每段增量调用on_delta，最终仍返回完整内容；cache为False时跳过响应缓存；
+            默认仅temperature为0且没有stop_when的调用与在途的相同请求合并，coalesce可显式开关；stage/task_id用于遥测标记和输出预算；
+            响应因max_tokens截断时自动续写，最多LLM_MAX_CONTINUATIONS次；
+            stop_when为带feed(delta)/finish()方法的检测器（如ActionParser），
+            feed返回截断位置时立即中止生成，正常结束时追加finish()返回的内容
         
     Returns:
         str: 响应内容
     """
+    # 遥测信息
+    started_at = time.monotonic()
+    stats = {
+        'conversation_id': conversation_id,
+        'task_id': options.get('task_id') if options else None,
+        'stage': options.get('stage') if options else None,
+        'ttft': None,
+        'retries': 0,
+        'continuations': 0,
+        'truncated': False,
+        'cutoff': False,
+        'cache': 'bypass'
+    }
+    data: Dict[str, Any] = {}
+    content = ''
     try:
         # 获取配置
         config = get_config()
-        
-        # 构建请求头
-        headers = {
-            'Authorization': f'Bearer {config.OPENAI_API_KEY}',
-            'Content-Type': 'application/json'
-        }
-        
-        # 准备消息
-        messages = options.get('messages', []) if options else []
-        if prompt:
-            messages.append({"role": role, "content": prompt})
+        on_delta: Optional[Callable[[str], Any]] = options.get('on_delta') if options else None
+        stop_when = options.get('stop_when') if options else None
         
         # 构建请求体
-        data = {
-            "model": config.MODEL_NAME,
-            "messages": messages,
-            "temperature": config.MODEL_TEMPERATURE,
-            "max_tokens": config.MODEL_MAX_TOKENS
-        }
+        data = _build_request(prompt, role, options)
+        stats['model'] = data['model']
+        stats['max_tokens'] = data.get('max_tokens')
+        
+        # 查询响应缓存
+        request_key = make_cache_key(data)
+        cache = get_llm_cache() if _use_cache(data, options) else None
+        if cache:
+            cached = cache.get(request_key)
+            if cached is not None:
+                stats['cache'] = 'hit'
+                if on_delta:
+                    on_delta(cached)
+                content = cached
+                return cached
+            stats['cache'] = 'miss'
         
         # 记录请求
         # logger.info(f'OpenAI request: model={config.MODEL_NAME}, conversation_id={conversation_id}')
         # logger.debug(f'OpenAI request data: {json.dumps(data, ensure_ascii=False)}')
         
-        # 发送请求
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f'{config.OPENAI_API_BASE}/chat/completions',
-                headers=headers,
-                json=data
-            ) as response:
-                if response.status != 200:
-                    error = await response.text()
-                    logger.error(f'OpenAI API error: {error}')
-                    raise LLMError(f'OpenAI API error: {error}')
-                    
-                result = await response.json()
-                return result['choices'][0]['message']['content']
+        streaming = bool(on_delta or (options and options.get('stream')))
+        router = get_router()
+        state = {'emitted': False}
+        
+        async def request(request_data: Dict[str, Any]) -> Dict[str, Any]:
+            if streaming:
+                # 流式请求：边收边回调，最后拼接完整内容
+                parts = []
+                meta: Dict[str, Any] = {}
+                async with contextlib.aclosing(router.stream(request_data, meta)) as deltas:
+                    async for delta in deltas:
+                        if stats['ttft'] is None:
+                            stats['ttft'] = time.monotonic() - started_at
+                        cut = stop_when.feed(delta) if stop_when else None
+                        if cut is not None:
+                            delta = delta[:cut]
+                        parts.append(delta)
+                        state['emitted'] = True
+                        if on_delta and delta:
+                            on_delta(delta)
+                        if cut is not None:
+                            # 第一个完整动作已生成：关闭流以中止服务端继续生成
+                            stats['cutoff'] = True
+                            meta['finish_reason'] = 'stop'
+                            break
+                stats.update({'provider': meta.get('provider'), 'model': meta.get('model', data['model'])})
+                return {'content': ''.join(parts), 'finish_reason': meta.get('finish_reason')}
+            result = await router.complete(request_data)
+            if stop_when and result['content']:
+                cut = stop_when.feed(result['content'])
+                if cut is not None:
+                    stats['cutoff'] = True
+                    result = {**result, 'content': result['content'][:cut], 'finish_reason': 'stop'}
+            usage = result.get('usage') or {}
+            stats.update({
+                'provider': result.get('provider'),
+                'model': result.get('model', data['model'])
+            })
+            # 续写时累加各次请求的用量
+            for key, alias in (('prompt_tokens', 'input_tokens'), ('completion_tokens', 'output_tokens')):
+                used = usage.get(key) or usage.get(alias)
+                if used:
+                    stats[key] = (stats.get(key) or 0) + used
+            return result
+        
+        async def attempt() -> str:
+            result = await request(data)
+            content = result['content'] or ''
+            continuations = 0
+            while result.get('finish_reason') == 'length' and continuations < config.LLM_MAX_CONTINUATIONS:
+                # 响应被max_tokens截断：带上已生成内容请求续写，避免静默截断的代码
+                continuations += 1
+                logger.warning(f'LLM response truncated at max_tokens={data.get("max_tokens")}, continuing ({continuations}/{config.LLM_MAX_CONTINUATIONS})')
+                result = await request({**data, 'messages': build_continuation(data['messages'], content)})
+                content += result['content'] or ''
+            stats['continuations'] = continuations
+            stats['truncated'] = result.get('finish_reason') == 'length'
+            if stop_when and result.get('finish_reason') == 'stop' and not stats['cutoff']:
+                # 服务端stop序列不返回序列本身，由检测器补全
+                suffix = stop_when.finish()
+                if suffix:
+                    content += suffix
+                    if on_delta:
+                        on_delta(suffix)
+            return content
+        
+        def is_retryable(error: Exception) -> bool:
+            # 已向调用方推送过增量的流式请求不再重放，避免重复输出
+            return not state['emitted'] and _is_retryable(error)
+        
+        def get_delay(error: Exception, attempt_count: int) -> Optional[float]:
+            # 429由限流器按Retry-After统一暂停，这里不再额外等待
+            return 0.0 if isinstance(error, RateLimitError) else None
+        
+        def on_retry(error: Exception, attempt_count: int) -> None:
+            stats['retries'] = attempt_count
+        
+        async def execute() -> str:
+            return await get_retry_policy().run(attempt, is_retryable, get_delay, on_retry)
+        
+        if not _use_coalesce(data, options):
+            content = await execute()
+        else:
+            # 相同请求已在途时等待其结果，不再重复发送（合并键包含输出预算，预算不同的请求不合并）
+            content, shared = await _single_flight.do(f'{request_key}:{data.get("max_tokens")}', execute)
+            if shared:
+                stats['cache'] = 'coalesced'
+                if on_delta:
+                    on_delta(content)
+        
+        if cache and not stats['truncated']:
+            cache.set(request_key, content)
+        return content
                 
+    except LLMError as e:
+        stats.update({'status': 'error', 'error': str(e)})
+        raise
     except Exception as e:
+        stats.update({'status': 'error', 'error': str(e)})
         logger.error(f"调用LLM失败: {str(e)}")
         raise LLMError(f"调用LLM失败: {str(e)}")
+    finally:
+        # 流式响应或服务端未返回usage时按字符数估算token
+        if not stats.get('prompt_tokens'):
+            stats['prompt_tokens'] = sum(len(msg.get('content') or '') for msg in data.get('messages', [])) // 3
+            stats['tokens_estimated'] = True
+        if not stats.get('completion_tokens'):
+            stats['completion_tokens'] = len(content) // 3
+        stats['latency'] = time.monotonic() - started_at
+        get_telemetry().record(**stats)
+        # 仅用真实生成的完整响应更新输出预算
+        if stats.get('status') != 'error' and stats['cache'] in ('bypass', 'miss'):
+            get_output_budget().record(stats['stage'], stats['completion_tokens'], stats['continuations'])
+
+def get_coalesce_stats() -> Dict[str, Any]:
+    """获取请求合并统计"""
+    return _single_flight.get_stats()
     
 
 
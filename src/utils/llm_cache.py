@@ -0,0 +1,173 @@
+from typing import Dict, Any, Optional
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import json
+import os
+import time
+from src.config import get_config
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 参与缓存键计算的采样参数（max_tokens随自适应预算变化，截断的响应会被续写完整，因此不参与）
+CACHE_KEY_PARAMS = ('model', 'messages', 'temperature', 'top_p', 'stop', 'seed',
+                    'presence_penalty', 'frequency_penalty')
+
+
+def make_cache_key(data: Dict[str, Any]) -> str:
+    """
+    计算请求体的规范化哈希
+
+    Args:
+        data: chat/completions请求体
+
+    Returns:
+        str: sha256十六进制摘要
+    """
+    canonical = {k: data[k] for k in CACHE_KEY_PARAMS if k in data}
+    # 消息只保留role和content，忽略时间戳等附加字段
+    canonical['messages'] = [
+        {'role': msg.get('role'), 'content': msg.get('content')}
+        for msg in canonical.get('messages', [])
+    ]
+    raw = json.dumps(canonical, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """LLM响应两级缓存：内存LRU（按字节淘汰）+ 磁盘（按TTL过期）"""
+
+    def __init__(self, max_bytes: Optional[int] = None, ttl: Optional[float] = None, cache_dir: Optional[Path] = None):
+        """
+        初始化缓存
+
+        Args:
+            max_bytes: 内存层最大字节数
+            ttl: 磁盘层过期时间（秒）
+            cache_dir: 磁盘层目录，默认为项目根目录下 cache/llm
+        """
+        config = get_config()
+        self.max_bytes = max_bytes if max_bytes is not None else config.LLM_CACHE_MAX_BYTES
+        self.ttl = ttl if ttl is not None else config.LLM_CACHE_TTL
+        self.cache_dir = cache_dir or Path(__file__).parent.parent.parent / 'cache' / 'llm'
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._memory: 'OrderedDict[str, str]' = OrderedDict()
+        self._memory_bytes = 0
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'bytes_served': 0,
+            'bytes_written': 0
+        }
+
+    def _get_file_path(self, key: str) -> Path:
+        """获取磁盘缓存文件路径"""
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _put_memory(self, key: str, content: str) -> None:
+        """写入内存层并按字节数淘汰最久未使用的条目"""
+        size = len(content.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key).encode('utf-8'))
+        self._memory[key] = content
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.encode('utf-8'))
+            self.stats['evictions'] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取缓存，先查内存层再查磁盘层
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Optional[str]: 缓存内容，未命中返回None
+        """
+        content = self._memory.get(key)
+        if content is not None:
+            self._memory.move_to_end(key)
+            self.stats['memory_hits'] += 1
+            self.stats['bytes_served'] += len(content.encode('utf-8'))
+            return content
+
+        file_path = self._get_file_path(key)
+        if file_path.exists():
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                if time.time() - entry.get('created_at', 0) <= self.ttl:
+                    content = entry['content']
+                    self._put_memory(key, content)
+                    self.stats['disk_hits'] += 1
+                    self.stats['bytes_served'] += len(content.encode('utf-8'))
+                    return content
+                os.remove(file_path)
+            except Exception as e:
+                logger.error(f'Error reading llm cache {key}: {e}')
+
+        self.stats['misses'] += 1
+        return None
+
+    def set(self, key: str, content: str) -> None:
+        """
+        写入缓存（内存层和磁盘层）
+
+        Args:
+            key: 缓存键
+            content: 响应内容
+        """
+        self._put_memory(key, content)
+        file_path = self._get_file_path(key)
+        try:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            raw = json.dumps({'created_at': time.time(), 'content': content}, ensure_ascii=False)
+            # 先写临时文件再替换，避免并发读到半截内容
+            tmp_path = file_path.with_suffix('.tmp')
+            tmp_path.write_text(raw, encoding='utf-8')
+            os.replace(tmp_path, file_path)
+            self.stats['bytes_written'] += len(raw.encode('utf-8'))
+        except Exception as e:
+            logger.error(f'Error writing llm cache {key}: {e}')
+
+    def clear(self) -> None:
+        """清空内存层和磁盘层"""
+        self._memory.clear()
+        self._memory_bytes = 0
+        for file_path in self.cache_dir.glob('*/*.json'):
+            try:
+                file_path.unlink()
+            except Exception as e:
+                logger.error(f'Error clearing llm cache file {file_path}: {e}')
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        return {
+            **self.stats,
+            'hits': self.stats['memory_hits'] + self.stats['disk_hits'],
+            'memory_entries': len(self._memory),
+            'memory_bytes': self._memory_bytes
+        }
+
+
+_cache: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> LLMCache:
+    """获取进程级LLM缓存"""
+    global _cache
+    if _cache is None:
+        _cache = LLMCache()
+    return _cache
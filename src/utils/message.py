@@ -1,4 +1,4 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Optional
 from datetime import datetime
 import json
 import os
@@ -76,6 +76,36 @@ class MessageFormatter:
             'timestamp': datetime.now().isoformat()
         }
     
+    @staticmethod
+    def stream_handler(
+        on_token_stream: Optional[Callable[[Dict[str, Any]], Any]],
+        action_type: str,
+        task_id: Any = None
+    ) -> Optional[Callable[[str], None]]:
+        """
+        构建增量回调，将LLM流式增量包装为消息帧推送给on_token_stream
+        
+        Args:
+            on_token_stream: 消息回调
+            action_type: 动作类型
+            task_id: 任务ID
+            
+        Returns:
+            Optional[Callable[[str], None]]: 增量回调，on_token_stream为空时返回None
+        """
+        if not on_token_stream:
+            return None
+        
+        def on_delta(delta: str) -> None:
+            on_token_stream(MessageFormatter.format({
+                'status': 'streaming',
+                'task_id': task_id,
+                'action_type': action_type,
+                'content': delta
+            }))
+        
+        return on_delta
+    
     @staticmethod
     async def save_to_db(message: Dict[str, Any], conversation_id: str) -> None:
         """
@@ -0,0 +1,387 @@
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import random
+import time
+from aiohttp import web
+from src.logger import get_logger
+from src.utils.llm_cache import make_cache_key
+from src.utils.token_budget import CONTINUE_PROMPT
+
+logger = get_logger(__name__)
+
+# 默认脚本：规划请求返回任务JSON，其余请求返回一个write_code动作
+DEFAULT_PLAN_RESPONSE = json.dumps([
+    {
+        'title': '编写示例脚本',
+        'description': '编写 mock/hello.py 并输出 hello world',
+        'tools': ['write_code']
+    }
+], ensure_ascii=False)
+
+DEFAULT_ACTION_RESPONSE = """<write_code>
+<path>mock/hello.py</path>
+<content>
+print("hello world")
+</content>
+</write_code>"""
+
+# 为续写请求保留的最近响应数
+MAX_SERVED_RESPONSES = 256
+
+
+class MockLLM:
+    """离线LLM模拟器：脚本化/录制响应 + 首token延迟、生成速度、错误率和429模拟"""
+
+    def __init__(
+        self,
+        ttft: float = 0.0,
+        tps: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        seed: int = 0,
+        script: Optional[str] = None
+    ):
+        """
+        初始化模拟器
+
+        Args:
+            ttft: 首token延迟（秒）
+            tps: 每秒生成token数，0表示瞬间生成
+            error_rate: 返回500的概率
+            rate_limit_rate: 返回429的概率
+            retry_after: 429响应的Retry-After秒数
+            seed: 随机种子，保证结果可复现
+            script: 脚本文件路径，JSON列表（按顺序循环返回）或
+                {"responses": [...], "recorded": {请求哈希: 响应}}
+        """
+        self.ttft = ttft
+        self.tps = tps
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.responses: List[str] = []
+        self.recorded: Dict[str, str] = {}
+        self._cursor = 0
+        # 请求消息哈希 -> 完整响应，续写请求据此返回对应原请求的剩余部分
+        self._served: 'OrderedDict[str, str]' = OrderedDict()
+        self.stats = {
+            'requests': 0,
+            'errors': 0,
+            'rate_limited': 0,
+            'completion_tokens': 0
+        }
+        if script:
+            self.load_script(script)
+
+    @classmethod
+    def from_url(cls, url: str) -> 'MockLLM':
+        """
+        从mock地址构建模拟器，例如 mock://local?ttft=0.3&tps=50&error_rate=0.05
+
+        Args:
+            url: mock地址
+
+        Returns:
+            MockLLM: 模拟器
+        """
+        query = {key: values[-1] for key, values in parse_qs(urlparse(url).query).items()}
+        return cls(
+            ttft=float(query.get('ttft', 0)),
+            tps=float(query.get('tps', 0)),
+            error_rate=float(query.get('error_rate', 0)),
+            rate_limit_rate=float(query.get('rate_limit_rate', 0)),
+            retry_after=float(query.get('retry_after', 1)),
+            seed=int(query.get('seed', 0)),
+            script=query.get('script')
+        )
+
+    def load_script(self, path: str) -> None:
+        """加载脚本文件"""
+        script = json.loads(Path(path).read_text(encoding='utf-8'))
+        if isinstance(script, list):
+            self.responses = script
+        else:
+            self.responses = script.get('responses', [])
+            self.recorded = script.get('recorded', {})
+
+    def respond(self, data: Dict[str, Any]) -> str:
+        """
+        根据请求选择响应内容：录制响应 > 脚本顺序响应 > 默认响应，续写请求返回剩余部分
+
+        Args:
+            data: chat/completions请求体
+
+        Returns:
+            str: 响应内容
+        """
+        messages = data.get('messages', [])
+        if len(messages) >= 2 and messages[-1].get('content') == CONTINUE_PROMPT and messages[-2].get('role') == 'assistant':
+            partial = messages[-2].get('content') or ''
+            full = self._served.get(make_cache_key({'messages': messages[:-2]}))
+            if full is None:
+                full = self.respond({**data, 'messages': messages[:-2]})
+            return full[len(partial):] if full.startswith(partial) else full
+        content = self.select(data)
+        key = make_cache_key({'messages': messages})
+        self._served.pop(key, None)
+        self._served[key] = content
+        if len(self._served) > MAX_SERVED_RESPONSES:
+            self._served.popitem(last=False)
+        return content
+
+    def select(self, data: Dict[str, Any]) -> str:
+        """按录制响应 > 脚本顺序响应 > 默认响应选择新请求的响应内容"""
+        recorded = self.recorded.get(make_cache_key(data))
+        if recorded is not None:
+            return recorded
+        if self.responses:
+            content = self.responses[self._cursor % len(self.responses)]
+            self._cursor += 1
+            return content
+        prompt = '\n'.join(msg.get('content') or '' for msg in data.get('messages', []))
+        if 'task planning expert' in prompt:
+            return DEFAULT_PLAN_RESPONSE
+        return DEFAULT_ACTION_RESPONSE
+
+    def fault(self) -> Optional[Tuple[int, str, Dict[str, str]]]:
+        """
+        按概率注入故障
+
+        Returns:
+            Optional[Tuple[int, str, Dict[str, str]]]: (状态码, 响应体, 响应头)，无故障返回None
+        """
+        self.stats['requests'] += 1
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            self.stats['rate_limited'] += 1
+            return 429, 'mock rate limited', {'Retry-After': str(self.retry_after)}
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.stats['errors'] += 1
+            return 500, 'mock server error', {}
+        return None
+
+    @staticmethod
+    def tokenize(content: str) -> List[str]:
+        """按约4字符切分为模拟token"""
+        return [content[i:i + 4] for i in range(0, len(content), 4)] or ['']
+
+    def truncate(self, data: Dict[str, Any], content: str) -> Tuple[str, str]:
+        """
+        按请求的stop序列和max_tokens截断响应（与OpenAI一致，stop序列本身不返回）
+
+        Returns:
+            Tuple[str, str]: (内容, finish_reason)
+        """
+        stop = data.get('stop') or []
+        for sequence in [stop] if isinstance(stop, str) else stop:
+            index = content.find(sequence)
+            if index >= 0:
+                content = content[:index]
+        max_tokens = data.get('max_tokens')
+        tokens = self.tokenize(content)
+        if max_tokens and len(tokens) > max_tokens:
+            return ''.join(tokens[:max_tokens]), 'length'
+        return content, 'stop'
+
+    async def generate(self, content: str) -> AsyncIterator[str]:
+        """
+        按TTFT和生成速度逐个产出token
+
+        Args:
+            content: 完整响应内容
+
+        Yields:
+            str: token
+        """
+        tokens = self.tokenize(content)
+        self.stats['completion_tokens'] += len(tokens)
+        await asyncio.sleep(self.ttft)
+        for index, token in enumerate(tokens):
+            if index and self.tps > 0:
+                await asyncio.sleep(1 / self.tps)
+            yield token
+
+    def build_completion(self, data: Dict[str, Any], content: str, finish_reason: str = 'stop') -> Dict[str, Any]:
+        """构建非流式响应体"""
+        prompt_tokens = sum(len(msg.get('content') or '') for msg in data.get('messages', [])) // 4
+        completion_tokens = len(self.tokenize(content))
+        return {
+            'id': f'mock-{self.stats["requests"]}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': data.get('model', 'mock'),
+            'choices': [{
+                'index': 0,
+                'finish_reason': finish_reason,
+                'message': {'role': 'assistant', 'content': content}
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        }
+
+    @staticmethod
+    def build_chunk(data: Dict[str, Any], delta: str, finish_reason: Optional[str] = None) -> bytes:
+        """构建一条SSE事件"""
+        chunk = {
+            'object': 'chat.completion.chunk',
+            'model': data.get('model', 'mock'),
+            'choices': [{'index': 0, 'delta': {'content': delta}, 'finish_reason': finish_reason}]
+        }
+        return f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'.encode('utf-8')
+
+
+class MockResponse:
+    """进程内模拟的HTTP响应，接口与aiohttp.ClientResponse中用到的部分一致"""
+
+    def __init__(self, status: int, body: Any = None, headers: Optional[Dict[str, str]] = None, lines: Optional[AsyncIterator[bytes]] = None):
+        self.status = status
+        self.headers = headers or {}
+        self._body = body
+        self.content = lines
+
+    async def text(self) -> str:
+        return self._body if isinstance(self._body, str) else json.dumps(self._body, ensure_ascii=False)
+
+    async def json(self) -> Any:
+        return self._body
+
+    def release(self) -> None:
+        pass
+
+    async def __aenter__(self) -> 'MockResponse':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+
+class MockTransport:
+    """进程内模拟传输层，OPENAI_API_BASE为 mock:// 地址时由 get_transport 返回"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.mock = MockLLM.from_url(base_url)
+        self.stats = {'requests': 0}
+
+    async def post(self, path: str, headers: Dict[str, str], json: Dict[str, Any]) -> MockResponse:
+        """
+        模拟POST /chat/completions
+
+        Args:
+            path: 请求路径
+            headers: 请求头
+            json: 请求体
+
+        Returns:
+            MockResponse: 模拟响应
+        """
+        self.stats['requests'] += 1
+        data = json
+        fault = self.mock.fault()
+        if fault:
+            status, body, fault_headers = fault
+            return MockResponse(status, body, fault_headers)
+
+        content, finish_reason = self.mock.truncate(data, self.mock.respond(data))
+        if data.get('stream'):
+            async def lines() -> AsyncIterator[bytes]:
+                async for token in self.mock.generate(content):
+                    yield self.mock.build_chunk(data, token)
+                yield self.mock.build_chunk(data, '', finish_reason)
+                yield b'data: [DONE]\n\n'
+            return MockResponse(200, headers={'Content-Type': 'text/event-stream'}, lines=lines())
+
+        async for _ in self.mock.generate(content):
+            pass
+        return MockResponse(200, self.mock.build_completion(data, content, finish_reason))
+
+    def get_openai_client(self, api_key: str):
+        """模拟传输层没有OpenAI SDK客户端，与build_providers的配置校验一致"""
+        raise ValueError(f'{self.base_url}: mock:// base_url only supports the openai_http type')
+
+    async def close(self) -> None:
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'base_url': self.base_url, **self.stats, 'mock': self.mock.stats}
+
+
+def create_app(mock: MockLLM) -> web.Application:
+    """
+    创建OpenAI兼容的模拟服务
+
+    Args:
+        mock: 模拟器
+
+    Returns:
+        web.Application: aiohttp应用
+    """
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        data = await request.json()
+        fault = mock.fault()
+        if fault:
+            status, body, headers = fault
+            return web.Response(status=status, text=body, headers=headers)
+
+        content, finish_reason = mock.truncate(data, mock.respond(data))
+        if not data.get('stream'):
+            async for _ in mock.generate(content):
+                pass
+            return web.json_response(mock.build_completion(data, content, finish_reason))
+
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+        async for token in mock.generate(content):
+            await response.write(mock.build_chunk(data, token))
+        await response.write(mock.build_chunk(data, '', finish_reason))
+        await response.write(b'data: [DONE]\n\n')
+        return response
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(mock.stats)
+
+    app = web.Application()
+    app.router.add_post('/v1/chat/completions', chat_completions)
+    app.router.add_get('/v1/mock/stats', stats)
+    return app
+
+
+def main() -> None:
+    """命令行启动模拟服务：python -m src.utils.mock_llm --port 8765 --ttft 0.3 --tps 50"""
+    parser = argparse.ArgumentParser(description='OpenAI兼容的离线LLM模拟服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--ttft', type=float, default=0.0, help='首token延迟（秒）')
+    parser.add_argument('--tps', type=float, default=0.0, help='每秒生成token数，0表示瞬间生成')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回500的概率')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='返回429的概率')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='429响应的Retry-After秒数')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--script', default=None, help='脚本/录制响应JSON文件')
+    args = parser.parse_args()
+
+    mock = MockLLM(
+        ttft=args.ttft,
+        tps=args.tps,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+        script=args.script
+    )
+    logger.info(f'Mock LLM server listening on http://{args.host}:{args.port}/v1')
+    web.run_app(create_app(mock), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
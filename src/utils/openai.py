@@ -1,8 +1,8 @@
 from typing import Dict, Any, Optional
 import os
 import json
-from openai import AsyncOpenAI
 from src.config import get_config
+from src.utils.transport import get_transport
 
 from src.logger import get_logger
 
@@ -34,11 +34,8 @@ async def call(
         # 获取配置
         config = get_config()
         
-        # 创建客户端
-        client = AsyncOpenAI(
-            api_key=config.OPENAI_API_KEY,
-            base_url=config.OPENAI_API_BASE
-        )
+        # 获取共享客户端
+        client = get_transport(config.OPENAI_API_BASE).get_openai_client(config.OPENAI_API_KEY)
         
         # 准备消息
         messages = [
@@ -0,0 +1,243 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Any, AsyncIterator, List, Optional
+import json
+from src.config import get_config
+from src.logger import get_logger
+from src.utils.errors import LLMError, RateLimitError
+from src.utils.transport import get_transport
+from src.utils.rate_limit import get_rate_limiter, estimate_tokens, parse_retry_after
+
+logger = get_logger(__name__)
+
+
+class ProviderAdapter(ABC):
+    """LLM服务提供方适配器基类，统一使用OpenAI chat/completions格式的请求体"""
+
+    def __init__(self, name: str, base_url: str, api_key: str, model: str):
+        """
+        初始化适配器
+
+        Args:
+            name: 提供方名称
+            base_url: API基础地址
+            api_key: API密钥
+            model: 使用的模型
+        """
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+
+    def prepare(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """将请求体中的模型替换为本提供方的模型"""
+        return {**data, 'model': self.model}
+
+    @abstractmethod
+    async def complete(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        非流式补全
+
+        Args:
+            data: 请求体
+
+        Returns:
+            Dict[str, Any]: {'content': 响应内容, 'usage': token用量, 'finish_reason': 结束原因}
+        """
+        pass
+
+    async def stream(self, data: Dict[str, Any], meta: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        流式补全，默认退化为一次性返回完整内容
+
+        Args:
+            data: 请求体
+            meta: 可选，写入结束原因finish_reason
+
+        Yields:
+            str: 增量内容
+        """
+        result = await self.complete(data)
+        if meta is not None:
+            meta['finish_reason'] = result.get('finish_reason')
+        yield result['content']
+
+
+class OpenAIHTTPAdapter(ProviderAdapter):
+    """OpenAI兼容接口，直接使用共享aiohttp连接池"""
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+
+    async def _check_response(self, response, slot) -> None:
+        """检查响应状态，429标记限流，其余非200抛出LLMError"""
+        if response.status == 429:
+            error = await response.text()
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            slot.rate_limited(retry_after)
+            raise RateLimitError(f'{self.name} API rate limited: {error}', retry_after)
+        if response.status != 200:
+            error = await response.text()
+            logger.error(f'{self.name} API error: {error}')
+            raise LLMError(f'{self.name} API error: {error}', status=response.status)
+
+    async def complete(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        data = self.prepare(data)
+        transport = get_transport(self.base_url)
+        async with await get_rate_limiter(self.model).acquire(estimate_tokens(data)) as slot:
+            async with await transport.post('/chat/completions', headers=self._headers(), json=data) as response:
+                await self._check_response(response, slot)
+                result = await response.json()
+                usage = result.get('usage') or {}
+                if usage.get('total_tokens') is not None:
+                    slot.record_usage(usage['total_tokens'])
+                choice = result['choices'][0]
+                return {'content': choice['message']['content'], 'usage': usage, 'finish_reason': choice.get('finish_reason')}
+
+    async def stream(self, data: Dict[str, Any], meta: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        data = {**self.prepare(data), 'stream': True}
+        transport = get_transport(self.base_url)
+        async with await get_rate_limiter(self.model).acquire(estimate_tokens(data)) as slot:
+            async with await transport.post('/chat/completions', headers=self._headers(), json=data) as response:
+                await self._check_response(response, slot)
+
+                # 逐行解析SSE事件
+                async for raw_line in response.content:
+                    line = raw_line.decode('utf-8').strip()
+                    if not line.startswith('data:'):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == '[DONE]':
+                        break
+                    chunk = json.loads(payload)
+                    choices = chunk.get('choices') or []
+                    if not choices:
+                        continue
+                    if choices[0].get('finish_reason') and meta is not None:
+                        meta['finish_reason'] = choices[0]['finish_reason']
+                    delta = (choices[0].get('delta') or {}).get('content')
+                    if delta:
+                        yield delta
+
+
+class OpenAISDKAdapter(ProviderAdapter):
+    """OpenAI官方SDK（AsyncOpenAI），复用传输层中的共享客户端"""
+
+    def _convert_error(self, error: Exception, slot) -> Exception:
+        """将SDK异常转换为LLMError"""
+        import openai
+        if isinstance(error, openai.RateLimitError):
+            retry_after = parse_retry_after(error.response.headers.get('Retry-After'))
+            slot.rate_limited(retry_after)
+            return RateLimitError(f'{self.name} API rate limited: {error}', retry_after)
+        if isinstance(error, openai.APIStatusError):
+            return LLMError(f'{self.name} API error: {error}', status=error.status_code)
+        if isinstance(error, openai.APIConnectionError):
+            return LLMError(f'{self.name} connection error: {error}', status=503)
+        return error
+
+    async def complete(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        data = self.prepare(data)
+        client = get_transport(self.base_url).get_openai_client(self.api_key)
+        async with await get_rate_limiter(self.model).acquire(estimate_tokens(data)) as slot:
+            try:
+                response = await client.chat.completions.create(**data)
+            except Exception as e:
+                raise self._convert_error(e, slot) from e
+            usage = response.usage.model_dump() if response.usage else {}
+            if usage.get('total_tokens') is not None:
+                slot.record_usage(usage['total_tokens'])
+            choice = response.choices[0]
+            return {'content': choice.message.content, 'usage': usage, 'finish_reason': choice.finish_reason}
+
+    async def stream(self, data: Dict[str, Any], meta: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        data = {**self.prepare(data), 'stream': True}
+        client = get_transport(self.base_url).get_openai_client(self.api_key)
+        async with await get_rate_limiter(self.model).acquire(estimate_tokens(data)) as slot:
+            try:
+                response = await client.chat.completions.create(**data)
+            except Exception as e:
+                raise self._convert_error(e, slot) from e
+            async for chunk in response:
+                if not chunk.choices:
+                    continue
+                if chunk.choices[0].finish_reason and meta is not None:
+                    meta['finish_reason'] = chunk.choices[0].finish_reason
+                if chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+
+class QwenAdapter(ProviderAdapter):
+    """DashScope（通义千问）文本生成接口"""
+
+    async def complete(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        body = {
+            'model': self.model,
+            'input': {'messages': data['messages']},
+            'parameters': {
+                key: data[key] for key in ('temperature', 'top_p', 'max_tokens', 'stop', 'seed') if key in data
+            }
+        }
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        transport = get_transport(self.base_url)
+        async with await get_rate_limiter(self.model).acquire(estimate_tokens(data)) as slot:
+            async with await transport.post(
+                '/v1/services/aigc/text-generation/generation',
+                headers=headers,
+                json=body
+            ) as response:
+                if response.status == 429:
+                    error = await response.text()
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    slot.rate_limited(retry_after)
+                    raise RateLimitError(f'{self.name} API rate limited: {error}', retry_after)
+                if response.status != 200:
+                    error = await response.text()
+                    logger.error(f'{self.name} API error: {error}')
+                    raise LLMError(f'{self.name} API error: {error}', status=response.status)
+                result = await response.json()
+                usage = result.get('usage') or {}
+                if usage.get('total_tokens') is not None:
+                    slot.record_usage(usage['total_tokens'])
+                return {
+                    'content': result['output']['text'],
+                    'usage': usage,
+                    'finish_reason': result['output'].get('finish_reason')
+                }
+
+
+ADAPTER_TYPES = {
+    'openai_http': OpenAIHTTPAdapter,
+    'openai_sdk': OpenAISDKAdapter,
+    'qwen': QwenAdapter
+}
+
+
+def build_providers() -> List[ProviderAdapter]:
+    """
+    根据配置 LLM_PROVIDERS 构建适配器列表
+
+    Returns:
+        List[ProviderAdapter]: 适配器列表
+    """
+    config = get_config()
+    providers = []
+    for item in config.LLM_PROVIDERS:
+        adapter_cls = ADAPTER_TYPES.get(item['type'])
+        if adapter_cls is None:
+            raise ValueError(f"Unknown LLM provider type: {item['type']}")
+        # 进程内模拟传输层只实现了OpenAI兼容的HTTP接口
+        if item['base_url'].startswith('mock://') and adapter_cls is not OpenAIHTTPAdapter:
+            raise ValueError(f"LLM provider {item['name']}: mock:// base_url only supports the openai_http type, got {item['type']}")
+        providers.append(adapter_cls(
+            name=item['name'],
+            base_url=item['base_url'],
+            api_key=item['api_key'],
+            model=item['model']
+        ))
+    return providers
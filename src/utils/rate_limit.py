@@ -0,0 +1,299 @@
+from typing import Dict, Any, Optional
+import asyncio
+import time
+from src.config import get_config
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TokenBucket:
+    """令牌桶，按每分钟配额匀速补充"""
+
+    def __init__(self, per_minute: float):
+        """
+        初始化令牌桶
+
+        Args:
+            per_minute: 每分钟配额，同时也是桶容量
+        """
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        """按流逝时间补充令牌"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        获取取出amount个令牌需要等待的秒数
+
+        Args:
+            amount: 令牌数
+
+        Returns:
+            float: 等待秒数，0表示可以立即取出
+        """
+        self._refill()
+        # 单次请求超过桶容量时按满桶处理，避免永远等待
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        """取出令牌（允许透支，由后续补充偿还）"""
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        """退回令牌（预估多扣的部分）"""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimitSlot:
+    """一次请求占用的限流槽位"""
+
+    def __init__(self, limiter: 'ModelRateLimiter', estimated_tokens: int):
+        self.limiter = limiter
+        self.estimated_tokens = estimated_tokens
+        self.used_tokens: Optional[int] = None
+        self.retry_after: Optional[float] = None
+        self.started_at = time.monotonic()
+
+    def record_usage(self, total_tokens: int) -> None:
+        """
+        记录实际消耗的token数，用于校正TPM桶
+
+        Args:
+            total_tokens: 实际token数
+        """
+        self.used_tokens = total_tokens
+
+    def rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """
+        标记本次请求被限流（HTTP 429）
+
+        Args:
+            retry_after: 服务端给出的Retry-After秒数
+        """
+        self.retry_after = retry_after if retry_after is not None else self.limiter.default_retry_after
+
+    async def __aenter__(self) -> 'RateLimitSlot':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.limiter._release(self, failed=exc_type is not None)
+
+
+class ModelRateLimiter:
+    """单个模型的限流器：RPM/TPM令牌桶 + AIMD自适应并发"""
+
+    def __init__(
+        self,
+        model: str,
+        rpm: int,
+        tpm: int,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+        latency_tolerance: float = 2.0,
+        default_retry_after: float = 1.0
+    ):
+        """
+        初始化限流器
+
+        Args:
+            model: 模型名称
+            rpm: 每分钟请求数配额
+            tpm: 每分钟token数配额
+            max_concurrency: 最大并发数
+            min_concurrency: 最小并发数
+            latency_tolerance: 平均延迟超过基线的倍数时收缩并发
+            default_retry_after: 429未给出Retry-After时的默认等待秒数
+        """
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.latency_tolerance = latency_tolerance
+        self.default_retry_after = default_retry_after
+        self.concurrency = float(max(min_concurrency, max_concurrency // 2))
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.baseline_latency: Optional[float] = None
+        self.avg_latency: Optional[float] = None
+        self._cond: Optional[asyncio.Condition] = None
+        self._loop = None
+        self.stats = {
+            'requests': 0,
+            'rate_limited': 0,
+            'wait_time': 0.0
+        }
+
+    async def acquire(self, estimated_tokens: int) -> RateLimitSlot:
+        """
+        等待配额和并发槽位
+
+        Args:
+            estimated_tokens: 预估token数（提示词 + max_tokens）
+
+        Returns:
+            RateLimitSlot: 槽位，需配合 async with 使用以释放
+        """
+        started_at = time.monotonic()
+        async with self._get_cond():
+            while True:
+                now = time.monotonic()
+                wait = max(
+                    self.blocked_until - now,
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(estimated_tokens)
+                )
+                if wait <= 0 and self.in_flight < int(self.concurrency):
+                    break
+                # 等待配额补充，或有槽位释放时被唤醒
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout=wait if wait > 0 else None)
+                except asyncio.TimeoutError:
+                    pass
+            self.requests.take(1)
+            self.tokens.take(estimated_tokens)
+            self.in_flight += 1
+        self.stats['requests'] += 1
+        self.stats['wait_time'] += time.monotonic() - started_at
+        return RateLimitSlot(self, estimated_tokens)
+
+    def _get_cond(self) -> asyncio.Condition:
+        """获取当前事件循环下的条件变量（事件循环变化时重建）"""
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._loop is not loop:
+            self._cond = asyncio.Condition()
+            self._loop = loop
+            self.in_flight = 0
+        return self._cond
+
+    async def _release(self, slot: RateLimitSlot, failed: bool = False) -> None:
+        """释放槽位并按AIMD调整并发上限"""
+        self.in_flight -= 1
+        latency = time.monotonic() - slot.started_at
+
+        if slot.used_tokens is not None:
+            self.tokens.refund(slot.estimated_tokens - slot.used_tokens)
+
+        if slot.retry_after is not None:
+            # 被限流：并发减半，并在Retry-After之前暂停发送
+            self.stats['rate_limited'] += 1
+            self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + slot.retry_after)
+            logger.warning(
+                f'LLM rate limited: model={self.model}, retry_after={slot.retry_after}s, '
+                f'concurrency={self.concurrency:.1f}'
+            )
+        elif not failed:
+            self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+            self.baseline_latency = latency if self.baseline_latency is None else min(self.baseline_latency, latency)
+            if self.avg_latency > self.baseline_latency * self.latency_tolerance:
+                # 延迟明显升高：小幅收缩
+                self.concurrency = max(self.min_concurrency, self.concurrency * 0.9)
+            else:
+                # 加性增长，约每个并发窗口+1
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+
+        # 唤醒等待槽位的请求
+        cond = self._get_cond()
+        async with cond:
+            cond.notify_all()
+
+    def retry_delay(self) -> float:
+        """
+        被限流后距离可再次发送请求的时间
+
+        Returns:
+            float: 等待秒数
+        """
+        return max(0.0, self.blocked_until - time.monotonic(), self.requests.wait_time(1))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取限流统计
+
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        return {
+            'model': self.model,
+            **self.stats,
+            'concurrency': round(self.concurrency, 2),
+            'in_flight': self.in_flight,
+            'avg_latency': self.avg_latency,
+            'baseline_latency': self.baseline_latency
+        }
+
+
+_limiters: Dict[str, ModelRateLimiter] = {}
+
+
+def get_rate_limiter(model: str) -> ModelRateLimiter:
+    """
+    获取指定模型的进程级限流器
+
+    Args:
+        model: 模型名称
+
+    Returns:
+        ModelRateLimiter: 限流器
+    """
+    limiter = _limiters.get(model)
+    if limiter is None:
+        config = get_config()
+        limits = {**config.LLM_RATE_LIMITS['default'], **config.LLM_RATE_LIMITS.get(model, {})}
+        limiter = ModelRateLimiter(
+            model,
+            rpm=limits['rpm'],
+            tpm=limits['tpm'],
+            max_concurrency=limits['max_concurrency']
+        )
+        _limiters[model] = limiter
+    return limiter
+
+
+def get_rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有模型的限流统计"""
+    return {model: limiter.get_stats() for model, limiter in _limiters.items()}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析Retry-After响应头（仅支持秒数形式）
+
+    Args:
+        value: 响应头取值
+
+    Returns:
+        Optional[float]: 秒数，无法解析返回None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def estimate_tokens(data: Dict[str, Any]) -> int:
+    """
+    粗略估计请求消耗的token数（按约3字符/token估算提示词，加上max_tokens）
+
+    Args:
+        data: chat/completions请求体
+
+    Returns:
+        int: 预估token数
+    """
+    chars = sum(len(msg.get('content') or '') for msg in data.get('messages', []))
+    return chars // 3 + int(data.get('max_tokens') or 0)
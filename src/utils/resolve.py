@@ -1,5 +1,273 @@
-from typing import List, Dict, Any
-import xml.etree.ElementTree as ET
+from typing import List, Dict, Any, Optional, Iterable, Set
+import re
+
+# 开始标签，例如 <write_code>
+OPEN_TAG_PATTERN = re.compile(r'<([A-Za-z_][\w-]*)\s*>')
+# 批量动作的包裹标签
+BATCH_TAG = 'actions'
+# 整体跳过、不会被当作动作的块（推理模型的思考过程）
+SKIP_BLOCK_TAGS = ('think',)
+# 参数值可选的CDATA包裹
+CDATA_PATTERN = re.compile(r'^\s*<!\[CDATA\[(.*)\]\]>\s*$', re.S)
+
+
+class ActionParseError(ValueError):
+    """动作解析失败，offset为失败位置的UTF-8字节偏移"""
+
+    def __init__(self, message: str, offset: int):
+        self.offset = offset
+        super().__init__(f'{message} (byte offset {offset})')
+
+
+def get_action_names() -> Set[str]:
+    """
+    可以作为动作开始的标签：已注册的工具、finish和批量动作的包裹标签
+
+    Returns:
+        Set[str]: 标签名称
+    """
+    from src.tools.tool_manager import ToolManager
+    return {schema['name'] for schema in ToolManager().get_tool_schemas()} | {'finish', BATCH_TAG}
+
+
+class ActionParser:
+    """
+    增量、容错的动作解析器
+
+    - 忽略动作前后的说明文字，只解析第一个动作；只有已知的动作名称才开始一个动作，
+      说明文字中的其他标签（例如 List<int>）被跳过，<think>块整体跳过
+    - 参数值按原文读取直到对应的结束标签（类似CDATA），代码中的 < & 等字符无需转义
+    - 可随流式增量逐段feed，动作结束标签到达时返回截断位置，可直接作为llm.call的stop_when
+    """
+
+    SEEK = 'seek'
+    SKIP = 'skip'
+    PARAMS = 'params'
+    VALUE = 'value'
+    DONE = 'done'
+
+    def __init__(self, names: Optional[Iterable[str]] = None):
+        """
+        初始化解析器
+
+        Args:
+            names: 可以作为动作开始的标签，默认为已注册的工具、finish和actions
+        """
+        self.names = set(names) if names is not None else get_action_names()
+        self.buffer = ''
+        self.state = self.SEEK
+        self.tag: Optional[str] = None
+        self.params: Dict[str, str] = {}
+        self._pos = 0
+        self._tag_start = 0
+        self._param: Optional[str] = None
+        self._param_open = 0
+        self._param_start = 0
+        self._skip_tag: Optional[str] = None
+        self.body_start = 0
+        self.body_end: Optional[int] = None
+
+    def _offset(self, index: int) -> int:
+        """字符位置转换为UTF-8字节偏移"""
+        return len(self.buffer[:index].encode('utf-8'))
+
+    def _set_param(self, end: int) -> None:
+        value = self.buffer[self._param_start:end]
+        match = CDATA_PATTERN.match(value)
+        if match:
+            value = match.group(1)
+        self.params[self._param] = value.strip()
+        self._param = None
+
+    def _advance(self) -> None:
+        """从上次停下的位置继续解析已缓冲的内容"""
+        while self.state != self.DONE:
+            if self.state == self.SEEK:
+                match = OPEN_TAG_PATTERN.search(self.buffer, self._pos)
+                if not match:
+                    # 保留末尾一段重新扫描，避免漏掉跨增量的开始标签
+                    self._pos = max(self._pos, len(self.buffer) - 64)
+                    return
+                name = match.group(1)
+                if name in SKIP_BLOCK_TAGS:
+                    self._skip_tag = name
+                    self._pos = match.end()
+                    self.state = self.SKIP
+                    continue
+                if name not in self.names:
+                    # 说明文字中的非动作标签
+                    self._pos = match.end()
+                    continue
+                self.tag = name
+                self._tag_start = match.start()
+                self._pos = match.end()
+                self.body_start = match.end()
+                self.state = self.PARAMS
+            elif self.state == self.SKIP:
+                close_tag = f'</{self._skip_tag}>'
+                index = self.buffer.find(close_tag, self._pos)
+                if index < 0:
+                    self._pos = max(self._pos, len(self.buffer) - len(close_tag) + 1)
+                    return
+                self._pos = index + len(close_tag)
+                self.state = self.SEEK
+            elif self.state == self.PARAMS:
+                index = self.buffer.find('<', self._pos)
+                if index < 0:
+                    self._pos = len(self.buffer)
+                    return
+                close_tag = f'</{self.tag}>'
+                if self.buffer.startswith(close_tag, index):
+                    self.body_end = index
+                    self._pos = index + len(close_tag)
+                    self.state = self.DONE
+                    return
+                match = OPEN_TAG_PATTERN.match(self.buffer, index)
+                if match:
+                    self._param = match.group(1)
+                    self._param_open = index
+                    self._param_start = match.end()
+                    self._pos = match.end()
+                    self.state = self.VALUE
+                    continue
+                if '>' not in self.buffer[index:]:
+                    # 标签尚未接收完整
+                    self._pos = index
+                    return
+                # 参数之间的多余文字或不匹配的标签：跳过
+                self._pos = index + 1
+            elif self.state == self.VALUE:
+                close_tag = f'</{self._param}>'
+                index = self.buffer.find(close_tag, self._pos)
+                if index < 0:
+                    self._pos = max(self._pos, len(self.buffer) - len(close_tag) + 1)
+                    return
+                self._set_param(index)
+                self._pos = index + len(close_tag)
+                self.state = self.PARAMS
+
+    def feed(self, delta: str) -> Optional[int]:
+        """
+        接收一段增量
+
+        Args:
+            delta: 增量内容
+
+        Returns:
+            Optional[int]: 动作在本段增量内的结束位置，尚未结束返回None
+        """
+        if self.state == self.DONE:
+            return 0
+        start = len(self.buffer)
+        self.buffer += delta
+        self._advance()
+        if self.state == self.DONE:
+            return self._pos - start
+        return None
+
+    def finish(self) -> str:
+        """
+        生成正常结束时调用：服务端stop序列不会返回动作结束标签本身，此时补全
+
+        Returns:
+            str: 需要追加的内容
+        """
+        if self.state == self.PARAMS:
+            suffix = f'</{self.tag}>'
+            self.feed(suffix)
+            return suffix
+        return ''
+
+    def close(self) -> Dict[str, Any]:
+        """
+        结束解析并返回动作
+
+        Returns:
+            Dict[str, Any]: {'type': 动作名称, 'params': 参数}
+
+        Raises:
+            ActionParseError: 没有找到动作或参数未闭合
+        """
+        if self.state in (self.SEEK, self.SKIP):
+            raise ActionParseError('No action tag found', self._offset(len(self.buffer)))
+        if self.state == self.VALUE:
+            # 参数缺少结束标签时以动作结束标签为界
+            index = self.buffer.find(f'</{self.tag}>', self._param_start)
+            if index < 0:
+                raise ActionParseError(f'Unclosed <{self._param}> in <{self.tag}>', self._offset(self._param_open))
+            self._set_param(index)
+            self.state = self.DONE
+        # 缺少动作结束标签（例如输出被截断在参数之后）时按已解析的参数容错返回
+        return {'type': self.tag, 'params': dict(self.params)}
+
+
+def parse_action(content: str) -> Dict[str, Any]:
+    """
+    解析回复中的第一个动作
+
+    Args:
+        content: 模型回复
+
+    Returns:
+        Dict[str, Any]: {'type': 动作名称, 'params': 参数}
+
+    Raises:
+        ActionParseError: 解析失败
+    """
+    parser = ActionParser()
+    parser.feed(content)
+    return parser.close()
+
+
+def parse_actions(content: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    解析回复中的动作：<actions>包裹时依次解析其中的每个动作，否则只解析第一个动作
+
+    动作参数中的depends_on（逗号分隔的批内序号，从1开始）转换为批内下标列表
+
+    Args:
+        content: 模型回复
+        limit: 最多解析的动作数
+
+    Returns:
+        List[Dict[str, Any]]: 动作列表
+
+    Raises:
+        ActionParseError: 解析失败
+    """
+    names = get_action_names()
+    parser = ActionParser(names)
+    parser.feed(content)
+    action = parser.close()
+    if action['type'] != BATCH_TAG:
+        return [action]
+
+    body_start = parser.body_start
+    body_end = parser.body_end if parser.body_end is not None else len(content)
+    actions = []
+    position = body_start
+    while position < body_end and (limit is None or len(actions) < limit):
+        item = ActionParser(names - {BATCH_TAG})
+        cut = item.feed(content[position:body_end])
+        if item.state in (ActionParser.SEEK, ActionParser.SKIP):
+            break
+        try:
+            action = item.close()
+        except ActionParseError as e:
+            # 换算为整个回复中的字节偏移
+            raise ActionParseError(str(e).rsplit(' (byte offset', 1)[0], len(content[:position].encode('utf-8')) + e.offset)
+        depends_on = action['params'].pop('depends_on', '')
+        action['depends_on'] = [
+            int(dep) - 1 for dep in re.findall(r'\d+', depends_on) if 0 < int(dep) <= len(actions)
+        ]
+        actions.append(action)
+        if cut is None:
+            break
+        position += cut
+    if not actions:
+        raise ActionParseError(f'Empty <{BATCH_TAG}> batch', len(content[:body_start].encode('utf-8')))
+    return actions
+
 
 def resolve_xml(content: str) -> Dict[str, Any]:
     """
@@ -12,21 +280,9 @@ def resolve_xml(content: str) -> Dict[str, Any]:
         Dict[str, Any]: 工具名称和参数的字典
     """
     try:
-        root = ET.fromstring(content.strip())
-        result = {}
-        
-        # 获取工具名称作为key
-        tool_name = root.tag
-        
-        # 获取所有子元素作为参数
-        params = {}
-        for child in root:
-            params[child.tag] = child.text.strip() if child.text else ""
-            
-        result[tool_name] = params
-        return result
-        
-    except Exception as e:
+        action = parse_action(content)
+        return {action['type']: action['params']}
+    except ActionParseError as e:
         print(f"解析XML错误: {e}")
         return {}
 
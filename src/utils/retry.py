@@ -0,0 +1,374 @@
+from typing import Dict, Any, Optional, Callable, Awaitable, TypeVar
+import asyncio
+import random
+import time
+import aiohttp
+from src.config import get_config
+from src.logger import get_logger
+from src.utils.errors import LLMError, RateLimitError, is_server_failure
+from src.utils.rate_limit import get_rate_limiter
+from src.utils.resolve import ActionParseError
+from src.utils.deadline import DeadlineExceeded
+
+logger = get_logger(__name__)
+
+T = TypeVar('T')
+
+
+class RetryPolicy:
+    """重试策略：带full jitter的指数退避"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 20.0):
+        """
+        初始化重试策略
+
+        Args:
+            max_attempts: 最大尝试次数（含首次）
+            base_delay: 退避基准延迟（秒）
+            max_delay: 单次退避上限（秒）
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {
+            'retries': 0,
+            'gave_up': 0,
+            'backoff_time': 0.0
+        }
+
+    def compute_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        计算第attempt次重试前的等待时间
+
+        Args:
+            attempt: 已失败次数（从1开始）
+            retry_after: 服务端建议的等待秒数
+
+        Returns:
+            float: 等待秒数
+        """
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(0, cap)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    async def run(
+        self,
+        func: Callable[[], Awaitable[T]],
+        is_retryable: Callable[[Exception], bool],
+        get_delay: Optional[Callable[[Exception, int], Optional[float]]] = None,
+        on_retry: Optional[Callable[[Exception, int], None]] = None
+    ) -> T:
+        """
+        执行函数，失败时按策略重试
+
+        Args:
+            func: 无参异步函数，每次尝试调用一次
+            is_retryable: 判断异常是否可重试（需同时考虑幂等性）
+            get_delay: 可选，按异常和失败次数返回等待秒数，返回None时使用指数退避
+            on_retry: 可选，每次决定重试时回调（异常, 失败次数）
+
+        Returns:
+            T: 函数返回值
+        """
+        attempt = 0
+        while True:
+            try:
+                return await func()
+            except Exception as e:
+                attempt += 1
+                if attempt >= self.max_attempts or not is_retryable(e):
+                    if attempt > 1:
+                        self.stats['gave_up'] += 1
+                    raise
+                delay = get_delay(e, attempt) if get_delay else None
+                if delay is None:
+                    delay = self.compute_delay(attempt)
+                self.stats['retries'] += 1
+                self.stats['backoff_time'] += delay
+                if on_retry:
+                    on_retry(e, attempt)
+                logger.warning(f'Retrying after error ({attempt}/{self.max_attempts - 1}), sleep {delay:.2f}s: {e}')
+                await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后打开，冷却后半开放行一个探测请求"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        """
+        初始化熔断器
+
+        Args:
+            name: 名称（通常为endpoint）
+            failure_threshold: 连续失败阈值
+            recovery_timeout: 打开后进入半开状态的冷却时间（秒）
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.stats = {
+            'opened': 0,
+            'rejected': 0
+        }
+
+    def available(self) -> bool:
+        """
+        判断当前是否可能放行请求（不改变状态，用于路由选择）
+
+        Returns:
+            bool: 是否可用
+        """
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.recovery_timeout
+        if self.state == self.HALF_OPEN:
+            return not self._probing
+        return True
+
+    def allow(self) -> bool:
+        """
+        判断是否放行请求
+
+        Returns:
+            bool: 是否放行
+        """
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                self.stats['rejected'] += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN:
+            # 半开状态只放行一个探测请求
+            if self._probing:
+                self.stats['rejected'] += 1
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        """记录成功，关闭熔断器"""
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """释放半开状态的探测名额（探测请求被取消，不计为成功或失败）"""
+        self._probing = False
+
+    def record_error(self, error: Exception) -> None:
+        """
+        按错误类型记录一次失败的请求
+
+        - 服务端/网络故障：计为失败
+        - 限流（429）：不计为成功或失败，由限流器减半并发并等待Retry-After
+        - 其他客户端错误：后端本身可用，计为成功
+
+        Args:
+            error: 请求抛出的异常
+        """
+        if is_server_failure(error):
+            self.record_failure()
+        elif not isinstance(error, RateLimitError):
+            self.record_success()
+
+    def record_failure(self) -> None:
+        """记录失败，达到阈值或探测失败时打开熔断器"""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.stats['opened'] += 1
+                logger.error(f'Circuit breaker opened: {self.name}, failures={self.failures}')
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取熔断器统计
+
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        return {'name': self.name, 'state': self.state, 'failures': self.failures, **self.stats}
+
+
+class FailureRetryPolicy:
+    """
+    任务级重试策略：按失败类别使用各自的退避曲线，并统计每类失败消耗的墙钟时间
+
+    失败类别：
+    - parse: 回复无法解析为动作，立即重试
+    - tool: 动作执行失败或反思判定未完成
+    - transport: LLM请求/网络错误（llm.call内部重试耗尽后）
+    - rate_limit: 被限流，等待时间跟随限流器
+    - timeout: 思考/动作超时，预算已耗尽，立即重试
+    """
+
+    PARSE = 'parse'
+    TOOL = 'tool'
+    TRANSPORT = 'transport'
+    RATE_LIMIT = 'rate_limit'
+    TIMEOUT = 'timeout'
+
+    def __init__(self, backoff: Dict[str, Dict[str, float]], model: Optional[str] = None):
+        """
+        初始化重试策略
+
+        Args:
+            backoff: 各类别的退避参数 {类别: {'base_delay', 'max_delay'}}，未配置的类别使用tool的参数
+            model: 限流器对应的模型名称，rate_limit类别按其剩余限流时间等待
+        """
+        self.backoff = backoff
+        self.model = model
+        self._attempt_started_at = time.monotonic()
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    def start_attempt(self) -> None:
+        """标记一次尝试开始（失败时从此刻起计入该类失败的耗时）"""
+        self._attempt_started_at = time.monotonic()
+
+    def compute_delay(self, failure_class: str, attempt: int, error: Optional[Exception] = None) -> float:
+        """
+        计算第attempt次重试前的等待时间
+
+        Args:
+            failure_class: 失败类别
+            attempt: 该次失败是连续第几次（从1开始）
+            error: 失败的异常
+
+        Returns:
+            float: 等待秒数
+        """
+        if failure_class == self.RATE_LIMIT:
+            delay = get_rate_limiter(self.model).retry_delay() if self.model else 0.0
+            return max(delay, getattr(error, 'retry_after', None) or 0.0)
+        params = self.backoff.get(failure_class, self.backoff.get(self.TOOL, {}))
+        cap = min(params.get('max_delay', 0.0), params.get('base_delay', 0.0) * (2 ** (attempt - 1)))
+        # 在退避上限的后半段取随机值，避免并行任务同时重试
+        return random.uniform(cap / 2, cap) if cap > 0 else 0.0
+
+    async def backoff_for(self, failure_class: str, attempt: int, error: Optional[Exception] = None) -> float:
+        """
+        记录一次失败并等待退避时间
+
+        Args:
+            failure_class: 失败类别
+            attempt: 该次失败是连续第几次（从1开始）
+            error: 失败的异常
+
+        Returns:
+            float: 实际等待秒数
+        """
+        lost = time.monotonic() - self._attempt_started_at
+        delay = self.compute_delay(failure_class, attempt, error)
+        entry = self.stats.setdefault(failure_class, {'retries': 0, 'attempt_time': 0.0, 'backoff_time': 0.0})
+        entry['retries'] += 1
+        entry['attempt_time'] += lost
+        entry['backoff_time'] += delay
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取每类失败的重试次数与耗时（失败尝试本身的耗时 + 退避等待）
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 统计信息
+        """
+        return {
+            failure_class: {
+                **entry,
+                'wall_time': round(entry['attempt_time'] + entry['backoff_time'], 3)
+            }
+            for failure_class, entry in self.stats.items()
+        }
+
+
+def classify_failure(error: Exception) -> str:
+    """
+    判断异常所属的失败类别
+
+    Args:
+        error: 异常
+
+    Returns:
+        str: 失败类别
+    """
+    if isinstance(error, ActionParseError):
+        return FailureRetryPolicy.PARSE
+    if isinstance(error, RateLimitError):
+        return FailureRetryPolicy.RATE_LIMIT
+    if isinstance(error, DeadlineExceeded):
+        return FailureRetryPolicy.TIMEOUT
+    if is_llm_failure(error):
+        return FailureRetryPolicy.TRANSPORT
+    return FailureRetryPolicy.TOOL
+
+
+def is_llm_failure(error: Exception) -> bool:
+    """判断是否为LLM请求或网络错误"""
+    return isinstance(error, (LLMError, aiohttp.ClientError, asyncio.TimeoutError))
+
+
+def create_failure_retry_policy() -> FailureRetryPolicy:
+    """按配置创建任务级重试策略（每次任务执行一个实例）"""
+    config = get_config()
+    return FailureRetryPolicy(config.AGENT_RETRY_BACKOFF, model=config.MODEL_NAME)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_policy: Optional[RetryPolicy] = None
+
+
+def get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    """
+    获取指定endpoint的进程级熔断器
+
+    Args:
+        endpoint: 服务地址
+
+    Returns:
+        CircuitBreaker: 熔断器
+    """
+    breaker = _breakers.get(endpoint)
+    if breaker is None:
+        config = get_config()
+        breaker = CircuitBreaker(
+            endpoint,
+            failure_threshold=config.LLM_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=config.LLM_BREAKER_RECOVERY_TIMEOUT
+        )
+        _breakers[endpoint] = breaker
+    return breaker
+
+
+def get_retry_policy() -> RetryPolicy:
+    """获取LLM调用的进程级重试策略"""
+    global _policy
+    if _policy is None:
+        config = get_config()
+        _policy = RetryPolicy(
+            max_attempts=config.LLM_RETRY_MAX_ATTEMPTS,
+            base_delay=config.LLM_RETRY_BASE_DELAY,
+            max_delay=config.LLM_RETRY_MAX_DELAY
+        )
+    return _policy
+
+
+def get_retry_stats() -> Dict[str, Any]:
+    """获取重试与熔断统计"""
+    return {
+        'retry': get_retry_policy().stats,
+        'breakers': {name: breaker.get_stats() for name, breaker in _breakers.items()}
+    }
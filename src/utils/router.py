@@ -0,0 +1,241 @@
+from typing import Dict, Any, AsyncIterator, List, Optional
+from collections import deque
+import asyncio
+import contextlib
+import time
+from src.config import get_config
+from src.logger import get_logger
+from src.utils.errors import CircuitOpenError
+from src.utils.providers import ProviderAdapter, build_providers
+from src.utils.retry import get_circuit_breaker
+
+logger = get_logger(__name__)
+
+
+class LatencyTracker:
+    """滑动窗口延迟统计"""
+
+    def __init__(self, window: int = 100):
+        """
+        初始化延迟统计
+
+        Args:
+            window: 保留的最近样本数
+        """
+        self.samples = deque(maxlen=window)
+
+    def record(self, latency: float) -> None:
+        """记录一次延迟（秒）"""
+        self.samples.append(latency)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        计算分位数
+
+        Args:
+            p: 分位（0-100）
+
+        Returns:
+            Optional[float]: 分位延迟，无样本返回None
+        """
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'samples': len(self.samples),
+            'p50': self.percentile(50),
+            'p95': self.percentile(95)
+        }
+
+
+class LLMRouter:
+    """多提供方路由：选择最快的健康后端，可选基于p95的对冲请求"""
+
+    def __init__(
+        self,
+        providers: List[ProviderAdapter],
+        hedge_enabled: bool = False,
+        hedge_min_delay: float = 1.0,
+        hedge_min_samples: int = 5
+    ):
+        """
+        初始化路由
+
+        Args:
+            providers: 适配器列表（顺序即同等条件下的优先级）
+            hedge_enabled: 是否开启对冲请求
+            hedge_min_delay: 对冲请求的最小等待时间（秒）
+            hedge_min_samples: 主后端样本数达到该值后才开启对冲
+        """
+        self.providers = providers
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.latency: Dict[str, LatencyTracker] = {}
+        self.stats = {
+            'requests': 0,
+            'hedged': 0,
+            'hedge_wins': 0
+        }
+
+    def _key(self, provider: ProviderAdapter) -> str:
+        return f'{provider.name}/{provider.model}'
+
+    def _tracker(self, provider: ProviderAdapter) -> LatencyTracker:
+        key = self._key(provider)
+        if key not in self.latency:
+            self.latency[key] = LatencyTracker()
+        return self.latency[key]
+
+    def _breaker(self, provider: ProviderAdapter):
+        return get_circuit_breaker(provider.base_url)
+
+    def rank(self) -> List[ProviderAdapter]:
+        """
+        按（连续失败次数, p50延迟）排序健康的后端，无样本的后端优先（用于探测）
+
+        Returns:
+            List[ProviderAdapter]: 排序后的后端
+        """
+        healthy = [p for p in self.providers if self._breaker(p).available()]
+        return sorted(healthy, key=lambda p: (self._breaker(p).failures, self._tracker(p).percentile(50) or 0.0))
+
+    def _select(self) -> List[ProviderAdapter]:
+        """选择可用后端，全部熔断时抛出CircuitOpenError"""
+        ranked = self.rank()
+        if not ranked:
+            raise CircuitOpenError('All LLM providers are unavailable (circuit open)')
+        return ranked
+
+    async def _run(self, provider: ProviderAdapter, data: Dict[str, Any]) -> Dict[str, Any]:
+        """在单个后端上执行请求并记录延迟和健康状态"""
+        breaker = self._breaker(provider)
+        if not breaker.allow():
+            raise CircuitOpenError(f'LLM provider circuit open: {provider.name}')
+        started_at = time.monotonic()
+        try:
+            result = await provider.complete(data)
+        except Exception as e:
+            breaker.record_error(e)
+            raise
+        finally:
+            # 请求被取消（对冲落败、stop()）时释放探测名额，否则半开的熔断器不再放行任何请求
+            breaker.release_probe()
+        breaker.record_success()
+        self._tracker(provider).record(time.monotonic() - started_at)
+        return {**result, 'provider': provider.name, 'model': provider.model}
+
+    def _hedge_delay(self, provider: ProviderAdapter) -> Optional[float]:
+        """根据主后端p95计算对冲等待时间，样本不足时不对冲"""
+        tracker = self._tracker(provider)
+        if len(tracker.samples) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, tracker.percentile(95))
+
+    async def complete(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        非流式补全，路由到最快的健康后端
+
+        Args:
+            data: 请求体
+
+        Returns:
+            Dict[str, Any]: {'content', 'usage', 'finish_reason', 'provider', 'model'}
+        """
+        self.stats['requests'] += 1
+        ranked = self._select()
+        primary = ranked[0]
+        delay = self._hedge_delay(primary) if self.hedge_enabled and len(ranked) > 1 else None
+        if delay is None:
+            return await self._run(primary, data)
+
+        primary_task = asyncio.ensure_future(self._run(primary, data))
+        tasks = {primary_task}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                # 主后端超过p95仍未返回：向次优后端发送对冲请求，先返回者胜出
+                self.stats['hedged'] += 1
+                logger.info(f'Hedging LLM request to {ranked[1].name} after {delay:.2f}s')
+                tasks.add(asyncio.ensure_future(self._run(ranked[1], data)))
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary_task:
+                            self.stats['hedge_wins'] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def stream(self, data: Dict[str, Any], meta: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        流式补全，路由到最快的健康后端（流式请求不做对冲）
+
+        Args:
+            data: 请求体
+            meta: 可选，写入实际使用的provider、model和结束原因finish_reason
+
+        Yields:
+            str: 增量内容
+        """
+        self.stats['requests'] += 1
+        provider = self._select()[0]
+        if meta is not None:
+            meta.update({'provider': provider.name, 'model': provider.model})
+        breaker = self._breaker(provider)
+        if not breaker.allow():
+            raise CircuitOpenError(f'LLM provider circuit open: {provider.name}')
+        started_at = time.monotonic()
+        try:
+            async with contextlib.aclosing(provider.stream(data, meta)) as deltas:
+                async for delta in deltas:
+                    yield delta
+        except GeneratorExit:
+            # 调用方提前关闭流（例如已生成完整动作），后端本身是健康的
+            breaker.record_success()
+            raise
+        except Exception as e:
+            breaker.record_error(e)
+            raise
+        finally:
+            # 流式请求被取消时同样释放探测名额
+            breaker.release_probe()
+        breaker.record_success()
+        self._tracker(provider).record(time.monotonic() - started_at)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取路由统计
+
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        return {
+            **self.stats,
+            'providers': {key: tracker.get_stats() for key, tracker in self.latency.items()}
+        }
+
+
+_router: Optional[LLMRouter] = None
+
+
+def get_router() -> LLMRouter:
+    """获取进程级LLM路由"""
+    global _router
+    if _router is None:
+        config = get_config()
+        _router = LLMRouter(
+            build_providers(),
+            hedge_enabled=config.LLM_HEDGE_ENABLED,
+            hedge_min_delay=config.LLM_HEDGE_MIN_DELAY
+        )
+    return _router
@@ -0,0 +1,66 @@
+from typing import Dict, Any, Callable, Awaitable, Tuple, TypeVar
+import asyncio
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """合并相同key的并发调用：同一时刻只有一个调用真正执行，其余等待同一结果"""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.stats = {
+            'executed': 0,
+            'coalesced': 0
+        }
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        执行或加入一个调用
+
+        Args:
+            key: 调用标识（请求的规范化哈希）
+            func: 无参异步函数
+
+        Returns:
+            Tuple[T, bool]: (结果, 是否复用了其他调用的结果)
+        """
+        future = self._calls.get(key)
+        if future is not None and future.get_loop() is asyncio.get_running_loop():
+            self.stats['coalesced'] += 1
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                # 发起方被取消而自身未被取消时，自己重新执行
+                if not future.cancelled():
+                    raise
+                return await self.do(key, func)
+
+        future = asyncio.get_running_loop().create_future()
+        # 没有等待者时也视为已读取异常，避免事件循环告警
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        self.stats['executed'] += 1
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取合并统计
+
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        return {**self.stats, 'in_flight': len(self._calls)}
@@ -0,0 +1,254 @@
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+from pathlib import Path
+import json
+from src.config import get_config
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _percentile(values: List[float], p: float) -> Optional[float]:
+    """计算分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class LLMTelemetry:
+    """LLM调用遥测：逐次记录token、延迟、重试和缓存状态，并按对话/阶段汇总"""
+
+    def __init__(self, max_records: int = 100000):
+        """
+        初始化遥测
+
+        Args:
+            max_records: 内存中保留的最大记录数
+        """
+        self.max_records = max_records
+        self.records: List[Dict[str, Any]] = []
+        # 任务记忆后台摘要压缩的记录
+        self.compactions: List[Dict[str, Any]] = []
+
+    def estimate_cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """
+        按配置单价估算费用
+
+        Args:
+            model: 模型名称
+            prompt_tokens: 提示词token数
+            completion_tokens: 生成token数
+
+        Returns:
+            float: 费用（与 LLM_PRICING 单位一致，每百万token）
+        """
+        pricing = get_config().LLM_PRICING.get(model)
+        if not pricing:
+            return 0.0
+        return (prompt_tokens * pricing['prompt'] + completion_tokens * pricing['completion']) / 1_000_000
+
+    def record(self, **fields: Any) -> Dict[str, Any]:
+        """
+        记录一次LLM调用
+
+        Args:
+            fields: conversation_id, task_id, stage, model, provider, prompt_tokens,
+                completion_tokens, max_tokens, ttft, latency, retries, continuations,
+                truncated, cutoff, cache, status, error
+
+        Returns:
+            Dict[str, Any]: 记录
+        """
+        record = {
+            'conversation_id': fields.get('conversation_id'),
+            'task_id': fields.get('task_id'),
+            'stage': fields.get('stage') or 'unknown',
+            'model': fields.get('model'),
+            'provider': fields.get('provider'),
+            'prompt_tokens': fields.get('prompt_tokens', 0),
+            'completion_tokens': fields.get('completion_tokens', 0),
+            'tokens_estimated': fields.get('tokens_estimated', False),
+            'max_tokens': fields.get('max_tokens'),
+            'ttft': fields.get('ttft'),
+            'latency': fields.get('latency', 0.0),
+            'retries': fields.get('retries', 0),
+            'continuations': fields.get('continuations', 0),
+            'truncated': fields.get('truncated', False),
+            'cutoff': fields.get('cutoff', False),
+            'cache': fields.get('cache', 'miss'),
+            'status': fields.get('status', 'success'),
+            'error': fields.get('error'),
+            'timestamp': datetime.now().isoformat()
+        }
+        # 缓存命中和合并请求不产生费用
+        billable = record['cache'] not in ('hit', 'coalesced')
+        record['cost'] = self.estimate_cost(
+            record['model'], record['prompt_tokens'], record['completion_tokens']
+        ) if billable else 0.0
+        self.records.append(record)
+        if len(self.records) > self.max_records:
+            self.records = self.records[-self.max_records:]
+        logger.debug(f'LLM call: {json.dumps(record, ensure_ascii=False)}')
+        return record
+
+    def record_compaction(self, **fields: Any) -> Dict[str, Any]:
+        """
+        记录一次任务记忆摘要压缩
+
+        Args:
+            fields: conversation_id, task_id, key, messages（被归档的消息数）,
+                tokens_before, tokens_after, duration, status, error
+
+        Returns:
+            Dict[str, Any]: 记录，ratio为压缩后与压缩前的token数之比
+        """
+        tokens_before = fields.get('tokens_before', 0)
+        tokens_after = fields.get('tokens_after', 0)
+        record = {
+            'conversation_id': fields.get('conversation_id'),
+            'task_id': fields.get('task_id'),
+            'key': fields.get('key'),
+            'messages': fields.get('messages', 0),
+            'tokens_before': tokens_before,
+            'tokens_after': tokens_after,
+            'ratio': tokens_after / tokens_before if tokens_before else None,
+            'duration': fields.get('duration', 0.0),
+            'status': fields.get('status', 'success'),
+            'error': fields.get('error'),
+            'timestamp': datetime.now().isoformat()
+        }
+        self.compactions.append(record)
+        if len(self.compactions) > self.max_records:
+            self.compactions = self.compactions[-self.max_records:]
+        logger.debug(f'Memory compaction: {json.dumps(record, ensure_ascii=False)}')
+        return record
+
+    def summarize_compactions(self, conversation_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        汇总任务记忆摘要压缩
+
+        Args:
+            conversation_id: 对话ID，为空时汇总全部
+
+        Returns:
+            Dict[str, Any]: 汇总信息
+        """
+        records = [
+            record for record in self.compactions
+            if conversation_id is None or record['conversation_id'] == conversation_id
+        ]
+        succeeded = [r for r in records if r['status'] == 'success']
+        tokens_before = sum(r['tokens_before'] for r in succeeded)
+        tokens_after = sum(r['tokens_after'] for r in succeeded)
+        durations = [r['duration'] for r in records]
+        return {
+            'compactions': len(records),
+            'errors': len(records) - len(succeeded),
+            'messages_archived': sum(r['messages'] for r in succeeded),
+            'tokens_before': tokens_before,
+            'tokens_after': tokens_after,
+            'ratio': tokens_after / tokens_before if tokens_before else None,
+            'time_total': sum(durations),
+            'time_avg': sum(durations) / len(durations) if durations else None
+        }
+
+    def query(self, **filters: Any) -> List[Dict[str, Any]]:
+        """
+        按字段过滤记录，例如 query(conversation_id='xxx', stage='thinking')
+
+        Returns:
+            List[Dict[str, Any]]: 记录列表
+        """
+        return [
+            record for record in self.records
+            if all(record.get(key) == value for key, value in filters.items())
+        ]
+
+    @staticmethod
+    def aggregate(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        汇总一组记录
+
+        Args:
+            records: 记录列表
+
+        Returns:
+            Dict[str, Any]: 汇总信息
+        """
+        latencies = [r['latency'] for r in records]
+        ttfts = [r['ttft'] for r in records if r['ttft'] is not None]
+        return {
+            'calls': len(records),
+            'errors': sum(1 for r in records if r['status'] != 'success'),
+            'prompt_tokens': sum(r['prompt_tokens'] for r in records),
+            'completion_tokens': sum(r['completion_tokens'] for r in records),
+            'retries': sum(r['retries'] for r in records),
+            'continuations': sum(r['continuations'] for r in records),
+            'truncated': sum(1 for r in records if r['truncated']),
+            'cutoff': sum(1 for r in records if r['cutoff']),
+            'cache_hits': sum(1 for r in records if r['cache'] == 'hit'),
+            'coalesced': sum(1 for r in records if r['cache'] == 'coalesced'),
+            'latency_total': sum(latencies),
+            'latency_avg': sum(latencies) / len(latencies) if latencies else None,
+            'latency_p95': _percentile(latencies, 95),
+            'ttft_avg': sum(ttfts) / len(ttfts) if ttfts else None,
+            'cost': sum(r['cost'] for r in records)
+        }
+
+    def summarize(self, conversation_id: Optional[str] = None, group_by: str = 'stage') -> Dict[str, Any]:
+        """
+        按字段分组汇总
+
+        Args:
+            conversation_id: 对话ID，为空时汇总全部
+            group_by: 分组字段（stage / task_id / conversation_id / provider）
+
+        Returns:
+            Dict[str, Any]: {'total': 总体汇总, group_by: {分组值: 汇总}}
+        """
+        records = self.query(conversation_id=conversation_id) if conversation_id else self.records
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            groups.setdefault(str(record.get(group_by)), []).append(record)
+        return {
+            'total': self.aggregate(records),
+            group_by: {key: self.aggregate(items) for key, items in groups.items()}
+        }
+
+    def write_summary(self, conversation_id: str, log_file: str = 'task_log.md') -> Path:
+        """
+        将对话的汇总和明细写入任务日志同目录下的 llm_telemetry_<conversation_id>.json
+
+        Args:
+            conversation_id: 对话ID
+            log_file: 任务日志路径
+
+        Returns:
+            Path: 写入的文件路径
+        """
+        file_path = Path(log_file).parent / f'llm_telemetry_{conversation_id}.json'
+        summary = {
+            'conversation_id': conversation_id,
+            'by_stage': self.summarize(conversation_id, 'stage'),
+            'by_task': self.summarize(conversation_id, 'task_id')['task_id'],
+            'memory_compaction': self.summarize_compactions(conversation_id),
+            'records': self.query(conversation_id=conversation_id)
+        }
+        try:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.error(f'Error writing llm telemetry for {conversation_id}: {e}')
+        return file_path
+
+
+_telemetry: Optional[LLMTelemetry] = None
+
+
+def get_telemetry() -> LLMTelemetry:
+    """获取进程级LLM遥测"""
+    global _telemetry
+    if _telemetry is None:
+        _telemetry = LLMTelemetry()
+    return _telemetry
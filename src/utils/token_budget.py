@@ -0,0 +1,134 @@
+from typing import Dict, Any, List, Optional
+from collections import deque
+from src.config import get_config
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 响应因max_tokens截断时追加的续写提示
+CONTINUE_PROMPT = 'Your previous response was cut off. Continue exactly where you stopped, without repeating anything.'
+
+
+def build_continuation(messages: List[Dict[str, Any]], partial: str) -> List[Dict[str, Any]]:
+    """
+    构建续写请求的消息列表：原消息 + 已生成的部分回复 + 续写提示
+
+    Args:
+        messages: 原请求消息
+        partial: 已生成的内容
+
+    Returns:
+        List[Dict[str, Any]]: 新的消息列表
+    """
+    return [
+        *messages,
+        {'role': 'assistant', 'content': partial},
+        {'role': 'user', 'content': CONTINUE_PROMPT}
+    ]
+
+
+class OutputBudget:
+    """按调用阶段自适应输出预算：取历史生成长度的高分位并留余量，样本不足时使用阶段默认值"""
+
+    def __init__(
+        self,
+        defaults: Dict[str, int],
+        percentile: float = 99,
+        headroom: float = 1.25,
+        min_tokens: int = 256,
+        min_samples: int = 20,
+        window: int = 500
+    ):
+        """
+        初始化输出预算
+
+        Args:
+            defaults: 各阶段的默认（也是最大）预算，未配置的阶段使用default
+            percentile: 取历史生成长度的分位
+            headroom: 在分位值上乘以的余量系数
+            min_tokens: 预算下限
+            min_samples: 样本数达到该值后才开始自适应
+            window: 每个阶段保留的最近样本数
+        """
+        self.defaults = defaults
+        self.percentile = percentile
+        self.headroom = headroom
+        self.min_tokens = min_tokens
+        self.min_samples = min_samples
+        self.window = window
+        self.samples: Dict[str, deque] = {}
+        self.stats = {
+            'truncated': 0,
+            'continuations': 0
+        }
+
+    def _default(self, stage: Optional[str]) -> int:
+        return self.defaults.get(stage or 'default', self.defaults['default'])
+
+    def max_tokens(self, stage: Optional[str]) -> int:
+        """
+        计算阶段的max_tokens
+
+        Args:
+            stage: 调用阶段（planning / thinking ...）
+
+        Returns:
+            int: 输出预算
+        """
+        ceiling = self._default(stage)
+        samples = self.samples.get(stage or 'default')
+        if not samples or len(samples) < self.min_samples:
+            return ceiling
+        ordered = sorted(samples)
+        value = ordered[min(len(ordered) - 1, int(round(self.percentile / 100 * (len(ordered) - 1))))]
+        return max(self.min_tokens, min(ceiling, int(value * self.headroom)))
+
+    def record(self, stage: Optional[str], completion_tokens: int, continuations: int = 0) -> None:
+        """
+        记录一次完整响应的生成长度（含续写部分）
+
+        Args:
+            stage: 调用阶段
+            completion_tokens: 生成token数
+            continuations: 续写次数
+        """
+        key = stage or 'default'
+        if key not in self.samples:
+            self.samples[key] = deque(maxlen=self.window)
+        self.samples[key].append(completion_tokens)
+        if continuations:
+            self.stats['truncated'] += 1
+            self.stats['continuations'] += continuations
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取各阶段当前预算与截断统计
+
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        return {
+            **self.stats,
+            'stages': {
+                stage: {'samples': len(samples), 'max_tokens': self.max_tokens(stage)}
+                for stage, samples in self.samples.items()
+            }
+        }
+
+
+_budget: Optional[OutputBudget] = None
+
+
+def get_output_budget() -> OutputBudget:
+    """获取进程级输出预算"""
+    global _budget
+    if _budget is None:
+        config = get_config()
+        _budget = OutputBudget(
+            {'default': config.MODEL_MAX_TOKENS, **config.LLM_STAGE_MAX_TOKENS},
+            percentile=config.LLM_MAX_TOKENS_PERCENTILE,
+            headroom=config.LLM_MAX_TOKENS_HEADROOM,
+            min_tokens=config.LLM_MAX_TOKENS_MIN,
+            min_samples=config.LLM_MAX_TOKENS_MIN_SAMPLES
+        )
+    return _budget
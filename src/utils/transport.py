@@ -0,0 +1,211 @@
+from typing import Dict, Any, Optional
+import asyncio
+import aiohttp
+from src.config import get_config
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class LLMTransport:
+    """LLM HTTP传输层，每个base URL一个实例，进程内共享连接池"""
+
+    def __init__(
+        self,
+        base_url: str,
+        limit: Optional[int] = None,
+        limit_per_host: Optional[int] = None,
+        keepalive_timeout: Optional[float] = None
+    ):
+        """
+        初始化传输层
+
+        Args:
+            base_url: API基础地址
+            limit: 连接池总连接数上限
+            limit_per_host: 单个host的连接数上限
+            keepalive_timeout: keep-alive空闲超时（秒）
+        """
+        config = get_config()
+        self.base_url = base_url.rstrip('/')
+        self.limit = limit or config.LLM_POOL_LIMIT
+        self.limit_per_host = limit_per_host or config.LLM_POOL_LIMIT_PER_HOST
+        self.keepalive_timeout = keepalive_timeout or config.LLM_KEEPALIVE_TIMEOUT
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._openai_clients: Dict[str, Any] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop = None
+        self.stats = {
+            'requests': 0,
+            'pool_hits': 0,
+            'pool_misses': 0,
+            'sessions_created': 0,
+            'openai_clients_created': 0
+        }
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        """构建连接追踪配置，用于统计连接复用命中/未命中"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_reuse(session, ctx, params):
+            self.stats['pool_hits'] += 1
+
+        async def on_create(session, ctx, params):
+            self.stats['pool_misses'] += 1
+
+        trace_config.on_connection_reuseconn.append(on_reuse)
+        trace_config.on_connection_create_end.append(on_create)
+        return trace_config
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        获取共享的aiohttp会话，首次调用时创建
+
+        Returns:
+            aiohttp.ClientSession: 共享会话
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 事件循环已更换（如脚本中多次asyncio.run），旧会话无法复用，关闭后再创建新会话
+            if self._session is not None:
+                await self._close_stale_session(self._session, self._loop)
+            self._session = None
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        if self._session and not self._session.closed:
+            return self._session
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,
+                    ttl_dns_cache=300
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    trace_configs=[self._build_trace_config()]
+                )
+                self.stats['sessions_created'] += 1
+                logger.info(f'LLM transport session created: {self.base_url}')
+        return self._session
+
+    @staticmethod
+    async def _close_stale_session(session: aiohttp.ClientSession, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """
+        关闭属于旧事件循环的会话，释放其连接池
+
+        Args:
+            session: 旧会话
+            loop: 会话所属的事件循环
+        """
+        if session.closed:
+            return
+        if loop is not None and loop.is_running():
+            # 旧事件循环仍在其他线程中运行：交给它自己关闭
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        try:
+            await session.close()
+        except Exception as e:
+            # 旧事件循环已关闭时其中的socket由垃圾回收释放，会话和连接器仍会被标记为已关闭
+            logger.debug(f'Error closing stale LLM transport session: {e}')
+
+    async def post(self, path: str, headers: Dict[str, str], json: Dict[str, Any]) -> aiohttp.ClientResponse:
+        """
+        发送POST请求，调用方负责释放响应（async with）
+
+        Args:
+            path: 请求路径（相对base_url）
+            headers: 请求头
+            json: 请求体
+
+        Returns:
+            aiohttp.ClientResponse: 响应
+        """
+        session = await self.get_session()
+        self.stats['requests'] += 1
+        return await session.post(f'{self.base_url}{path}', headers=headers, json=json)
+
+    def get_openai_client(self, api_key: str):
+        """
+        获取共享的AsyncOpenAI客户端（同一api_key复用）
+
+        Args:
+            api_key: API密钥
+
+        Returns:
+            AsyncOpenAI: 客户端
+        """
+        client = self._openai_clients.get(api_key)
+        if client is None:
+            from openai import AsyncOpenAI
+            # SDK客户端自带httpx连接池（keep-alive），进程内复用同一实例即可
+            client = AsyncOpenAI(api_key=api_key, base_url=self.base_url)
+            self._openai_clients[api_key] = client
+            self.stats['openai_clients_created'] += 1
+        return client
+
+    async def close(self) -> None:
+        """关闭会话和客户端，释放连接池"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        for client in self._openai_clients.values():
+            try:
+                await client.close()
+            except Exception as e:
+                logger.error(f'Error closing openai client: {e}')
+        self._openai_clients = {}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取连接池统计
+
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        return {'base_url': self.base_url, **self.stats}
+
+
+_transports: Dict[str, LLMTransport] = {}
+
+
+def get_transport(base_url: str) -> LLMTransport:
+    """
+    获取指定base URL的进程级传输层
+
+    Args:
+        base_url: API基础地址，mock:// 开头时返回进程内模拟传输层
+
+    Returns:
+        LLMTransport: 传输层实例
+    """
+    key = base_url.rstrip('/')
+    transport = _transports.get(key)
+    if transport is None:
+        if key.startswith('mock://'):
+            # 离线模拟：进程内直接生成响应，不走网络
+            from src.utils.mock_llm import MockTransport
+            transport = MockTransport(key)
+        else:
+            transport = LLMTransport(key)
+        _transports[key] = transport
+    return transport
+
+
+async def close_transports() -> None:
+    """关闭所有传输层"""
+    for transport in list(_transports.values()):
+        await transport.close()
+    _transports.clear()
+
+
+def get_transport_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    获取所有传输层的统计信息
+
+    Returns:
+        Dict[str, Dict[str, Any]]: base URL到统计信息的映射
+    """
+    return {key: transport.get_stats() for key, transport in _transports.items()}
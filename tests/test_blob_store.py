@@ -0,0 +1,61 @@
+from src.utils.blob_store import BlobStore
+
+
+def make_store(tmp_path, **kwargs) -> BlobStore:
+    params = {'min_size': 100, 'max_bytes': 1 << 20, 'level': 6, 'blob_dir': tmp_path}
+    params.update(kwargs)
+    store = BlobStore(**params)
+    store.enabled = True
+    return store
+
+
+def test_put_get_round_trip_from_disk(tmp_path):
+    text = '中文内容 and code\n' * 200
+    digest = make_store(tmp_path).put(text)
+    fresh = make_store(tmp_path)
+    assert fresh.get(digest) == text
+    assert fresh.get(digest) == text
+    assert fresh.stats['disk_hits'] == 1
+    assert fresh.stats['memory_hits'] == 1
+    # 磁盘上保存的是压缩后的内容
+    assert fresh._get_file_path(digest).stat().st_size < len(text.encode('utf-8'))
+
+
+def test_identical_content_is_written_once(tmp_path):
+    store = make_store(tmp_path)
+    text = 'x' * 1000
+    assert store.put(text) == store.put(text)
+    stats = store.get_stats()
+    assert stats['puts'] == 2
+    assert stats['dedup_hits'] == 1
+    assert len(list(tmp_path.glob('*/*.z'))) == 1
+
+
+def test_ref_only_replaces_long_text(tmp_path):
+    store = make_store(tmp_path)
+    assert store.ref('short') == 'short'
+    assert store.ref({'not': 'text'}) == {'not': 'text'}
+    ref = store.ref('y' * 200)
+    assert ref.startswith('[[blob:') and ref.endswith(']]')
+    assert store.ref(ref) == ref
+    store.enabled = False
+    assert store.ref('y' * 200) == 'y' * 200
+
+
+def test_dehydrate_and_resolve_nested_refs(tmp_path):
+    store = make_store(tmp_path)
+    code = 'print(1)\n' * 50
+    message = f'<write_code><path>a.py</path><content>{code}</content></write_code>' + ' note' * 40
+    dehydrated = store.dehydrate(message)
+    assert code not in dehydrated
+    assert len(dehydrated) < len(message)
+
+    record = {'messages': [{'content': dehydrated}], 'result': store.ref('z' * 300), 'count': 3}
+    assert store.resolve(record) == {'messages': [{'content': message}], 'result': 'z' * 300, 'count': 3}
+
+
+def test_missing_blob_keeps_reference(tmp_path):
+    store = make_store(tmp_path)
+    ref = '[[blob:' + '0' * 64 + ']]'
+    assert store.resolve(f'before {ref} after') == f'before {ref} after'
+    assert store.stats['missing'] == 1
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from src.agent.code_act import code_act
+from src.agent.memory.local_memory import LocalMemory
+from src.utils.errors import LLMError
+from src.utils.retry import FailureRetryPolicy
+
+
+def run_code_act(monkeypatch, tmp_path, error):
+    calls = []
+
+    async def failing_thinking(requirement, context):
+        calls.append(requirement)
+        raise error
+
+    monkeypatch.setattr(code_act, 'thinking', failing_thinking)
+    monkeypatch.setattr(code_act, 'LocalMemory', lambda options: LocalMemory({**options, 'cache_dir': tmp_path}))
+    # 测试中不做退避等待
+    monkeypatch.setattr(code_act, 'create_failure_retry_policy', lambda: FailureRetryPolicy({}))
+    task = {'id': 1, 'description': '编写 hello.py', 'tools': ['write_code']}
+    context = {'conversation_id': 'code-act-test', 'max_retry_times': 2}
+    return asyncio.run(code_act.complete_code_act(task, context)), calls
+
+
+def test_llm_failures_are_retried(monkeypatch, tmp_path):
+    result, calls = run_code_act(monkeypatch, tmp_path, LLMError('service unavailable'))
+    assert result['status'] == 'failure'
+    assert len(calls) == 3
+
+
+def test_programming_errors_are_raised_without_retry(monkeypatch, tmp_path):
+    with pytest.raises(KeyError):
+        run_code_act(monkeypatch, tmp_path, KeyError('missing'))
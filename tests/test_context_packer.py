@@ -0,0 +1,75 @@
+from src.utils.context_packer import ContextPacker, estimate_text_tokens
+
+
+def chars(text: str) -> int:
+    """按字符计数的估算函数，便于构造预算"""
+    return len(text)
+
+
+def write_code(path: str, lines: int) -> dict:
+    body = '\n'.join(f'print({i})' for i in range(lines))
+    return {'role': 'assistant', 'content': f'<write_code><path>{path}</path><content>{body}</content></write_code>'}
+
+
+def conversation(turns: int) -> list:
+    messages = [{'role': 'user', 'content': 'TASK: build the project'}]
+    for i in range(turns):
+        messages.append(write_code(f'src/file_{i}.py', 200))
+        messages.append({'role': 'user', 'content': f'wrote file {i} ' + 'ok ' * 100, 'action_type': 'write_code'})
+    return messages
+
+
+def test_estimate_text_tokens():
+    assert estimate_text_tokens('') == 0
+    assert estimate_text_tokens('abcd' * 10) == 11
+    assert estimate_text_tokens('中文') == 3
+
+
+def test_messages_within_budget_are_unchanged():
+    packer = ContextPacker(budget=10000, estimator=chars)
+    messages = [{'role': 'user', 'content': 'task', 'action_type': None}, {'role': 'assistant', 'content': 'reply'}]
+    assert packer.pack(messages) == [{'role': 'user', 'content': 'task'}, {'role': 'assistant', 'content': 'reply'}]
+    assert packer.get_stats()['packed'] == 0
+
+
+def test_elide_replaces_long_code_with_file_reference():
+    packer = ContextPacker(budget=100, elide_chars=200, estimator=chars)
+    elided = packer.elide(write_code('src/app.py', 50))
+    assert '50 lines elided, already written to src/app.py' in elided['content']
+    assert '<path>src/app.py</path>' in elided['content']
+    short = {'role': 'assistant', 'content': 'short'}
+    assert packer.elide(short) is short
+
+
+def test_pack_elides_older_code_before_folding():
+    messages = conversation(4)
+    packer = ContextPacker(budget=5000, recent=2, elide_chars=500, estimator=chars)
+    packed = packer.pack(messages)
+    assert len(packed) == len(messages)
+    assert packed[0]['content'] == 'TASK: build the project'
+    assert 'lines elided, already written to src/file_0.py' in packed[1]['content']
+    # 最近消息保留原文
+    assert packed[-2] == {'role': 'assistant', 'content': messages[-2]['content']}
+    assert sum(chars(msg['content']) + 4 for msg in packed) <= 5000
+
+
+def test_pack_folds_oldest_messages_into_summary():
+    messages = conversation(6)
+    messages.insert(3, {'role': 'user', 'content': 'reflection: keep going', 'action_type': 'reflection'})
+    packer = ContextPacker(budget=1500, recent=2, elide_chars=200, estimator=chars)
+    packed = packer.pack(messages)
+
+    assert packed[0]['content'] == 'TASK: build the project'
+    summary = packed[1]['content']
+    assert summary.startswith('Summary of 10 earlier messages:')
+    # 超出预算时先丢弃最早的摘要行
+    assert 'src/file_0.py' not in summary
+    assert '- assistant: write_code src/file_2.py' in summary
+    contents = [msg['content'] for msg in packed]
+    assert 'reflection: keep going' in contents
+    assert contents[-1] == messages[-1]['content']
+    assert sum(chars(msg['content']) + 4 for msg in packed) <= 1500
+    stats = packer.get_stats()
+    assert stats['packed'] == 1
+    assert stats['folded'] > 0
+    assert stats['tokens_after'] < stats['tokens_before']
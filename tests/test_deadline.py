@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from src.utils.deadline import Deadline, DeadlineExceeded
+
+
+async def sleep_then(value, delay):
+    await asyncio.sleep(delay)
+    return value
+
+
+def test_stage_budget_raises_deadline_exceeded():
+    async def main():
+        deadline = Deadline()
+        with pytest.raises(DeadlineExceeded) as info:
+            await deadline.run(sleep_then('late', 1), 'thinking', 0.05)
+        return deadline, info.value
+
+    deadline, error = asyncio.run(main())
+    assert error.stage == 'thinking' and error.timeout == 0.05
+    assert deadline.stats == {'thinking': 1}
+
+
+def test_inner_timeout_error_is_not_reported_as_deadline():
+    async def inner_timeout():
+        # 工具或传输层自身的超时
+        await asyncio.wait_for(asyncio.sleep(1), 0.01)
+
+    async def main():
+        deadline = Deadline()
+        with pytest.raises(asyncio.TimeoutError):
+            await deadline.run(inner_timeout(), 'action', 5)
+        return deadline
+
+    assert asyncio.run(main()).stats == {}
+
+
+def test_unlimited_budget_and_expired_deadline():
+    async def main():
+        assert await Deadline().run(sleep_then('done', 0), 'action') == 'done'
+        with pytest.raises(DeadlineExceeded):
+            await Deadline(0).run(sleep_then('never', 0), 'action', 5)
+
+    asyncio.run(main())
+    assert str(DeadlineExceeded('action', None)) == 'action timed out'
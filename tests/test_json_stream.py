@@ -0,0 +1,75 @@
+import pytest
+
+from src.utils.json_stream import JSONArrayStreamParser, JSONParseError, loads_lenient, repair_json
+
+
+def feed_all(parser, text, size):
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(parser.feed(text[i:i + size]))
+    return items
+
+
+def test_repair_common_defects():
+    text = "{'title': 'it\\'s', 'done': True, 'tools': ['a', 'b',], 'x': None,}"
+    assert loads_lenient(text) == {'title': "it's", 'done': True, 'tools': ['a', 'b'], 'x': None}
+    assert repair_json('[1, 2,]') == '[1, 2]'
+
+
+def test_items_are_emitted_as_soon_as_they_close():
+    head = '思考过程 [Plan]\n```json\n[{"title": "a", "tools": ["x"]}'
+    parser = JSONArrayStreamParser()
+    # 第一个元素在其右括号到达时产出，不等待整个数组
+    assert feed_all(parser, head, 1) == [{'title': 'a', 'tools': ['x']}]
+    assert parser.feed(', {"title": "b"}]\n```\n后续说明 {"ignored": 1}') == [{'title': 'b'}]
+    assert parser.close() == [{'title': 'a', 'tools': ['x']}, {'title': 'b'}]
+
+
+@pytest.mark.parametrize('size', [1, 3, 7, 1000])
+def test_chunking_does_not_change_result(size):
+    text = "[{'title': 'a}b', 'deps': [1, 2,],}, {\"title\": \"c\\\"]\"}]"
+    parser = JSONArrayStreamParser()
+    assert feed_all(parser, text, size) == [{'title': 'a}b', 'deps': [1, 2]}, {'title': 'c"]'}]
+
+
+def test_single_object_is_one_item():
+    parser = JSONArrayStreamParser()
+    parser.feed('{"title": "only"}')
+    assert parser.close() == [{'title': 'only'}]
+
+
+def test_bad_item_is_skipped_and_reported():
+    parser = JSONArrayStreamParser()
+    parser.feed('[{"title": }, {"title": "ok"}]')
+    assert parser.close() == [{'title': 'ok'}]
+    assert len(parser.errors) == 1
+
+
+def test_errors_report_byte_offset():
+    parser = JSONArrayStreamParser()
+    parser.feed('中文 [{"title": ')
+    with pytest.raises(JSONParseError) as info:
+        parser.close()
+    assert info.value.offset == len('中文 ['.encode('utf-8'))
+    with pytest.raises(JSONParseError):
+        JSONArrayStreamParser().close()
+
+
+@pytest.mark.parametrize('size', [1, 5, 1000])
+def test_braces_in_prose_before_the_array(size):
+    text = 'Plan for {goal}:\n[{"title": "a", "tools": ["x"]}, {"title": "b", "tools": ["y"]}]'
+    parser = JSONArrayStreamParser()
+    assert len(feed_all(parser, text, size)) == 2
+    assert [item['title'] for item in parser.close()] == ['a', 'b']
+
+
+def test_search_continues_after_unparseable_array():
+    parser = JSONArrayStreamParser()
+    assert parser.feed('Example: [{goal}] then [{"title": "a"}]') == [{'title': 'a'}]
+    assert parser.close() == [{'title': 'a'}]
+
+
+def test_single_object_after_prose_with_braces():
+    parser = JSONArrayStreamParser()
+    parser.feed('Plan for {goal}: {"title": "only", "tools": ["x"]}')
+    assert parser.close() == [{'title': 'only', 'tools': ['x']}]
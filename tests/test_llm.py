@@ -0,0 +1,12 @@
+from src.utils.llm import _use_coalesce
+
+
+def test_coalesce_only_deterministic_calls_by_default():
+    assert _use_coalesce({'temperature': 0}, None)
+    assert not _use_coalesce({'temperature': 0.7}, None)
+    assert not _use_coalesce({'temperature': 0}, {'stop_when': object()})
+
+
+def test_coalesce_explicit_option_wins():
+    assert _use_coalesce({'temperature': 0.7}, {'coalesce': True})
+    assert not _use_coalesce({'temperature': 0}, {'coalesce': False})
@@ -0,0 +1,57 @@
+import json
+import time
+from src.utils.llm_cache import LLMCache, make_cache_key
+
+
+def test_cache_key_ignores_max_tokens_and_message_extras():
+    data = {'model': 'm', 'temperature': 0.2, 'max_tokens': 512,
+            'messages': [{'role': 'user', 'content': 'hi', 'timestamp': 1}]}
+    same = {'model': 'm', 'temperature': 0.2, 'max_tokens': 4096,
+            'messages': [{'role': 'user', 'content': 'hi', 'timestamp': 2}]}
+    other = {**same, 'temperature': 0.7}
+    assert make_cache_key(data) == make_cache_key(same)
+    assert make_cache_key(data) != make_cache_key(other)
+
+
+def test_disk_entry_survives_new_instance(tmp_path):
+    LLMCache(max_bytes=1024, ttl=60, cache_dir=tmp_path).set('ab12', 'answer')
+    cache = LLMCache(max_bytes=1024, ttl=60, cache_dir=tmp_path)
+    assert cache.get('ab12') == 'answer'
+    assert cache.get('ab12') == 'answer'
+    assert cache.stats['disk_hits'] == 1
+    assert cache.stats['memory_hits'] == 1
+
+
+def test_expired_disk_entry_is_removed(tmp_path):
+    cache = LLMCache(max_bytes=1024, ttl=60, cache_dir=tmp_path)
+    cache.set('cd34', 'stale')
+    file_path = cache._get_file_path('cd34')
+    file_path.write_text(json.dumps({'created_at': time.time() - 120, 'content': 'stale'}), encoding='utf-8')
+
+    fresh = LLMCache(max_bytes=1024, ttl=60, cache_dir=tmp_path)
+    assert fresh.get('cd34') is None
+    assert fresh.stats['misses'] == 1
+    assert not file_path.exists()
+
+
+def test_memory_layer_evicts_least_recently_used_by_bytes(tmp_path):
+    cache = LLMCache(max_bytes=10, ttl=60, cache_dir=tmp_path)
+    cache.set('k1', 'aaaa')
+    cache.set('k2', 'bbbb')
+    assert cache.get('k1') == 'aaaa'
+    cache.set('k3', 'cccc')
+
+    stats = cache.get_stats()
+    assert stats['evictions'] == 1
+    assert stats['memory_bytes'] == 8
+    assert list(cache._memory) == ['k1', 'k3']
+    # 被淘汰的条目仍可从磁盘层读回
+    assert cache.get('k2') == 'bbbb'
+    assert cache.stats['disk_hits'] == 1
+
+
+def test_oversized_entry_skips_memory_layer(tmp_path):
+    cache = LLMCache(max_bytes=4, ttl=60, cache_dir=tmp_path)
+    cache.set('ef56', '中文内容')
+    assert cache.get_stats()['memory_entries'] == 0
+    assert cache.get('ef56') == '中文内容'
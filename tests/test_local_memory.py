@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+from src.agent.memory.local_memory import LocalMemory
+
+
+def open_memory(tmp_path, key='jsonl-test'):
+    return LocalMemory({'key': key, 'cache_dir': tmp_path, 'summarize': False})
+
+
+def contents(memory):
+    return [message['content'] for message in memory.messages]
+
+
+def test_torn_tail_is_dropped_and_truncated(tmp_path):
+    async def main():
+        memory = open_memory(tmp_path)
+        await memory.add_message('user', 'first')
+        await memory.add_message('assistant', 'second')
+
+    asyncio.run(main())
+    path = tmp_path / 'jsonl-test.jsonl'
+    size = path.stat().st_size
+    with open(path, 'ab') as f:
+        f.write(b'{"role": "assistant", "content": "thi')
+
+    memory = open_memory(tmp_path)
+    assert contents(memory) == ['first', 'second']
+    assert path.stat().st_size == size
+    asyncio.run(memory.add_message('user', 'third'))
+    assert contents(open_memory(tmp_path)) == ['first', 'second', 'third']
+
+
+def test_complete_tail_without_newline_and_corrupted_line(tmp_path):
+    path = tmp_path / 'jsonl-test.jsonl'
+    path.write_bytes(
+        json.dumps({'role': 'user', 'content': 'first'}).encode() + b'\n' +
+        b'not json\n' +
+        json.dumps({'role': 'user', 'content': 'last'}).encode()
+    )
+    memory = open_memory(tmp_path)
+    assert contents(memory) == ['first', 'last']
+    assert path.read_bytes().endswith(b'\n')
+    # 损坏的行计为无效记录，等待压缩清除
+    assert memory._records == 3
+
+
+def test_truncate_records_are_compacted(tmp_path):
+    async def main():
+        memory = open_memory(tmp_path)
+        memory.compact_min_garbage = 4
+        memory.compact_ratio = 0
+        for index in range(6):
+            await memory.add_message('user', f'message {index}')
+        memory.update_max_messages(2)
+        await memory.add_message('user', 'message 6')
+        if memory._compaction:
+            await memory._compaction
+        return memory
+
+    memory = asyncio.run(main())
+    path = tmp_path / 'jsonl-test.jsonl'
+    assert contents(memory) == ['message 4', 'message 5', 'message 6']
+    assert len(path.read_bytes().splitlines()) == 3
+    assert contents(open_memory(tmp_path)) == contents(memory)
+
+
+def test_legacy_json_file_is_migrated(tmp_path):
+    legacy = tmp_path / 'jsonl-test.json'
+    legacy.write_text(json.dumps([{'role': 'user', 'content': 'old'}]), encoding='utf-8')
+    assert contents(open_memory(tmp_path)) == ['old']
+    assert not legacy.exists()
+    assert contents(open_memory(tmp_path)) == ['old']
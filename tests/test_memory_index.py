@@ -0,0 +1,36 @@
+import asyncio
+
+from src.agent.memory.local_memory import LocalMemory
+from src.agent.memory.memory_index import MemoryIndex
+
+
+def write_memory(cache_dir, key, content):
+    async def main():
+        memory = LocalMemory({'key': key, 'cache_dir': cache_dir, 'summarize': False})
+        await memory.add_message('assistant', content, action_type='thinking', memorized=True)
+
+    asyncio.run(main())
+
+
+def test_load_only_reads_this_conversation(tmp_path):
+    write_memory(tmp_path, 'abc_1', 'write fibonacci in python')
+    write_memory(tmp_path, 'abc_2', 'run the fibonacci tests')
+    write_memory(tmp_path, 'abc_1_3', 'fibonacci from another conversation')
+    write_memory(tmp_path, 'abc_12_1', 'fibonacci from yet another conversation')
+    index = MemoryIndex('abc')
+    index.load(tmp_path)
+    assert sorted(index.by_key) == ['abc_1', 'abc_2']
+    hits = index.search('fibonacci', top_k=5)
+    assert sorted(hit['task_id'] for hit in hits) == ['1', '2']
+
+
+def test_search_ranks_matching_task_first_and_excludes_keys():
+    index = MemoryIndex('conv')
+    index.add('conv_1', {'role': 'assistant', 'content': 'created server.py with a flask app', 'memorized': True})
+    index.add('conv_2', {'role': 'assistant', 'content': 'wrote the README file', 'memorized': True})
+    index.add('conv_3', {'role': 'user', 'content': 'flask task prompt', 'action_type': 'thinking', 'memorized': True})
+    hits = index.search('flask server', top_k=2)
+    assert [hit['task_id'] for hit in hits] == ['1']
+    assert index.search('flask server', exclude_keys=['conv_1']) == []
+    index.remove('conv_1')
+    assert index.get_stats()['documents'] == 1
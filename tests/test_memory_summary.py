@@ -0,0 +1,32 @@
+import asyncio
+from src.agent.memory.local_memory import LocalMemory, cancel_summarizations
+
+
+def test_stop_cancels_background_summarization(tmp_path, monkeypatch):
+    calls = []
+
+    async def slow_call(prompt, conversation_id, role='user', options=None):
+        calls.append(options.get('stage'))
+        await asyncio.sleep(10)
+        return 'summary'
+
+    monkeypatch.setattr('src.utils.llm.call', slow_call)
+
+    async def main():
+        memory = LocalMemory({'key': 'summary-test', 'cache_dir': tmp_path, 'summarize': True})
+        memory.summarize_after = 2
+        memory.summarize_keep = 2
+        await memory.add_message('user', 'task prompt', 'thinking', True)
+        for i in range(3):
+            await memory.add_message('assistant', f'<write_code>{i}</write_code>', 'thinking', True)
+            await memory.add_message('user', f'result {i}', 'reflection', True)
+        await asyncio.sleep(0.01)
+        job = memory._summarization
+        assert calls == ['memory_summary'] and not job.done()
+
+        assert await cancel_summarizations('summary-test', timeout=1) == 1
+        assert job.cancelled()
+        view = await memory.get_messages(summarize=True)
+        assert len(view) == 7 and not any(message.get('archived') for message in view)
+
+    asyncio.run(main())
@@ -0,0 +1,33 @@
+import pytest
+
+from src.config import get_config
+from src.utils import providers
+from src.utils.mock_llm import MockLLM, MockTransport
+from src.utils.token_budget import build_continuation
+
+
+def test_continuation_resumes_its_own_request():
+    mock = MockLLM()
+    mock.responses = ['first response is long', 'second response is long']
+    first = [{'role': 'user', 'content': 'a'}]
+    second = [{'role': 'user', 'content': 'b'}]
+    assert mock.respond({'messages': first}) == 'first response is long'
+    assert mock.respond({'messages': second}) == 'second response is long'
+    # 交错的续写请求各自返回原请求的剩余部分
+    assert mock.respond({'messages': build_continuation(first, 'first ')}) == 'response is long'
+    assert mock.respond({'messages': build_continuation(second, 'second resp')}) == 'onse is long'
+
+
+def test_mock_base_url_rejects_non_http_provider(monkeypatch):
+    config = get_config()
+    config.LLM_PROVIDERS = [
+        {'name': 'qwen', 'type': 'qwen', 'base_url': 'mock://local', 'api_key': '', 'model': 'qwen-plus'}
+    ]
+    monkeypatch.setattr(providers, 'get_config', lambda: config)
+    with pytest.raises(ValueError, match='openai_http'):
+        providers.build_providers()
+
+
+def test_mock_transport_has_no_sdk_client():
+    with pytest.raises(ValueError, match='openai_http'):
+        MockTransport('mock://local').get_openai_client('key')
@@ -0,0 +1,29 @@
+import asyncio
+import importlib
+
+import pytest
+
+# src.agent.planning 导出了同名的planning函数，这里需要模块本身
+planning_module = importlib.import_module('src.agent.planning.planning')
+
+
+def run_planning(monkeypatch, tmp_path, reply):
+    async def fake_call(prompt, conversation_id, role='user', options=None):
+        for i in range(0, len(reply), 4):
+            options['on_delta'](reply[i:i + 4])
+        return reply
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(planning_module, 'call_llm', fake_call)
+    streamed = []
+    tasks = asyncio.run(planning_module.planning('goal', [], '', 'plan-test', None, streamed.append))
+    return tasks, streamed
+
+
+@pytest.mark.parametrize('reply', [
+    'Plan for {goal}:\n[{"title": "a", "description": "a", "tools": ["x"]}, {"title": "b", "description": "b", "tools": ["y"]}]',
+    'Plan for {goal}: {"title": "only", "description": "only", "tools": ["x"]}',
+])
+def test_every_planned_task_reaches_on_task(monkeypatch, tmp_path, reply):
+    tasks, streamed = run_planning(monkeypatch, tmp_path, reply)
+    assert tasks and streamed == tasks
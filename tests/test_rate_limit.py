@@ -0,0 +1,118 @@
+import asyncio
+import time
+import pytest
+from src.utils.rate_limit import ModelRateLimiter, TokenBucket, parse_retry_after
+
+
+def make_limiter(**kwargs) -> ModelRateLimiter:
+    params = {'rpm': 6000, 'tpm': 1000000, 'max_concurrency': 8}
+    params.update(kwargs)
+    return ModelRateLimiter('test-model', **params)
+
+
+def test_successful_requests_grow_concurrency_additively():
+    async def main():
+        # 测试中的延迟抖动很大，放宽延迟容忍度只观察加性增长
+        limiter = make_limiter(latency_tolerance=1e9)
+        assert limiter.concurrency == 4
+        for _ in range(4):
+            async with await limiter.acquire(10):
+                pass
+        # 每次成功 +1/concurrency，四次约+1
+        assert 4.9 < limiter.concurrency < 5.0
+        for _ in range(100):
+            async with await limiter.acquire(10):
+                pass
+        assert limiter.concurrency == limiter.max_concurrency
+        assert limiter.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_rising_latency_shrinks_concurrency():
+    async def main():
+        limiter = make_limiter()
+        async with await limiter.acquire(10):
+            pass
+        baseline = limiter.concurrency
+        slot = await limiter.acquire(10)
+        slot.started_at -= 10
+        async with slot:
+            pass
+        assert limiter.concurrency == pytest.approx(baseline * 0.9)
+
+    asyncio.run(main())
+
+
+def test_rate_limited_request_halves_concurrency_and_blocks():
+    async def main():
+        limiter = make_limiter()
+        async with await limiter.acquire(10) as slot:
+            slot.rate_limited(0.2)
+        assert limiter.concurrency == 2
+        assert limiter.stats['rate_limited'] == 1
+        assert 0.1 < limiter.retry_delay() <= 0.2
+
+        started_at = time.monotonic()
+        async with await limiter.acquire(10):
+            pass
+        assert time.monotonic() - started_at >= 0.15
+
+        for _ in range(3):
+            async with await limiter.acquire(10) as slot:
+                slot.rate_limited(0)
+        assert limiter.concurrency == limiter.min_concurrency
+
+    asyncio.run(main())
+
+
+def test_failed_request_leaves_concurrency_unchanged():
+    async def main():
+        limiter = make_limiter()
+        with pytest.raises(RuntimeError):
+            async with await limiter.acquire(10):
+                raise RuntimeError('boom')
+        assert limiter.concurrency == 4
+        assert limiter.avg_latency is None
+        assert limiter.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_concurrency_limit_queues_extra_requests():
+    async def main():
+        limiter = make_limiter(max_concurrency=2, min_concurrency=1)
+        running = []
+        peak = []
+
+        async def request():
+            async with await limiter.acquire(10):
+                running.append(1)
+                peak.append(len(running))
+                await asyncio.sleep(0.01)
+                running.pop()
+
+        await asyncio.gather(*(request() for _ in range(5)))
+        # 初始并发为 max_concurrency // 2，成功后增长但不超过上限
+        assert peak[0] == 1
+        assert max(peak) == 2
+        assert limiter.stats['requests'] == 5
+
+    asyncio.run(main())
+
+
+def test_token_bucket_refunds_overestimate():
+    bucket = TokenBucket(600)
+    bucket.take(600)
+    assert bucket.wait_time(100) > 0
+    bucket.refund(500)
+    assert bucket.wait_time(100) == 0
+    # 超过容量的请求按满桶等待，而不是永远等待
+    assert bucket.wait_time(10000) <= 600 / bucket.rate
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('2.5') == 2.5
+    assert parse_retry_after('-1') == 0.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') is None
+    assert parse_retry_after(None) is None
@@ -0,0 +1,53 @@
+import pytest
+from src.utils.resolve import ActionParser, ActionParseError, parse_action, parse_actions
+
+
+def test_prose_with_angle_brackets_is_skipped():
+    content = 'I will use a List<int> here.\n<write_code>\n<path>a.py</path>\n<content>x = 1</content>\n</write_code>'
+    assert parse_action(content) == {'type': 'write_code', 'params': {'path': 'a.py', 'content': 'x = 1'}}
+
+
+def test_leading_think_block_is_skipped():
+    content = '<think>Let me plan this, maybe <terminal_run> first</think>\n<finish>\n<message>done</message>\n</finish>'
+    assert parse_action(content) == {'type': 'finish', 'params': {'message': 'done'}}
+
+
+def test_only_think_block_has_no_action():
+    with pytest.raises(ActionParseError):
+        parse_action('<think>Let me plan this</think>')
+
+
+def test_code_content_is_read_verbatim():
+    content = '<write_code><path>a.py</path><content>if a < b && c:\n    print("<x>")</content></write_code>'
+    assert parse_action(content)['params']['content'] == 'if a < b && c:\n    print("<x>")'
+
+
+def test_split_deltas_cut_only_at_known_closing_tag():
+    parser = ActionParser()
+    assert parser.feed('<think>plan</th') is None
+    assert parser.feed('ink>\n<write_code>') is None
+    assert parser.feed('<path>a.py</path><content>List<int> x</content></wri') is None
+    delta = 'te_code> trailing text'
+    cut = parser.feed(delta)
+    assert delta[:cut] == 'te_code>'
+    assert parser.close() == {'type': 'write_code', 'params': {'path': 'a.py', 'content': 'List<int> x'}}
+
+
+def test_unclosed_param_reports_byte_offset():
+    content = '说明<write_code><path>a.py</path><content>x = 1'
+    with pytest.raises(ActionParseError) as error:
+        parse_action(content)
+    assert error.value.offset == len('说明<write_code><path>a.py</path>'.encode('utf-8'))
+
+
+def test_batch_actions_with_dependencies():
+    content = (
+        'Plan: use <int> values.\n<actions>\n'
+        '<write_code><path>a.py</path><content>print(1)</content></write_code>\n'
+        '<terminal_run><command>python a.py</command><depends_on>1</depends_on></terminal_run>\n'
+        '</actions>'
+    )
+    actions = parse_actions(content)
+    assert [action['type'] for action in actions] == ['write_code', 'terminal_run']
+    assert actions[0]['depends_on'] == []
+    assert actions[1]['depends_on'] == [0]
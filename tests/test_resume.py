@@ -0,0 +1,104 @@
+import asyncio
+
+from src.agent.code_act import code_act
+from src.agent.memory.local_memory import LocalMemory
+from src.agent.scheduler import TaskScheduler
+from src.agent.task_manager import TaskManager
+from src.config import get_config
+from src.tools.base_tool import ToolResult
+from src.utils.retry import FailureRetryPolicy
+
+INTERRUPTED = '<terminal_run><command>rm -rf build</command></terminal_run>'
+
+
+class FakeRuntime:
+    def __init__(self):
+        self.executed = []
+
+    async def execute_action(self, action, context, task_id):
+        self.executed.append(action['params'])
+        return ToolResult(status='success', meta={'content': 'ok'})
+
+
+def run_resumed_task(monkeypatch, tmp_path, replies, interrupted=INTERRUPTED, checkpoint='terminal_run'):
+    key = 'resume-test_1'
+
+    async def prepare():
+        memory = LocalMemory({'key': key, 'cache_dir': tmp_path, 'summarize': False})
+        await memory.add_message('user', 'prompt', action_type='thinking', memorized=True)
+        await memory.add_message('assistant', interrupted, action_type='thinking', memorized=True)
+        await memory.add_message('system', checkpoint, action_type='checkpoint')
+
+    async def fake_thinking(requirement, context):
+        messages = [msg for msg in await context['memory'].get_messages() if msg.get('action_type') != 'checkpoint']
+        # 最后一条是助手回复时thinking直接返回它（重放）
+        if messages[-1]['role'] == 'assistant':
+            return messages[-1]['content']
+        reply = replies.pop(0)
+        await context['memory'].add_message('assistant', reply, action_type='thinking', memorized=True)
+        return reply
+
+    async def fake_reflection(requirement, action_result, conversation_id):
+        return {'status': 'success', 'comments': ''}
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(code_act, 'thinking', fake_thinking)
+    monkeypatch.setattr(code_act, 'reflection', fake_reflection)
+    monkeypatch.setattr(code_act, 'LocalMemory', lambda options: LocalMemory({**options, 'cache_dir': tmp_path}))
+    monkeypatch.setattr(code_act, 'create_failure_retry_policy', lambda: FailureRetryPolicy({}))
+    # 批量动作模式下执行结果作为观察写入记忆，模型才能在检查状态后继续
+    config = get_config()
+    config.AGENT_MULTI_ACTION = True
+    monkeypatch.setattr(code_act, 'get_config', lambda: config)
+    runtime = FakeRuntime()
+    task = {'id': 1, 'description': '清理构建目录', 'tools': ['write_code']}
+    context = {'conversation_id': 'resume-test', 'resume': True, 'runtime': runtime}
+
+    async def main():
+        await prepare()
+        return await code_act.complete_code_act(task, context)
+
+    return asyncio.run(main()), runtime
+
+
+def test_interrupted_side_effect_is_not_replayed_before_state_check(monkeypatch, tmp_path):
+    replies = [
+        INTERRUPTED,
+        '<terminal_run><command>ls build</command></terminal_run>',
+        INTERRUPTED,
+        '<finish><message>done</message></finish>'
+    ]
+    result, runtime = run_resumed_task(monkeypatch, tmp_path, replies)
+    assert result['status'] == 'success'
+    # 第一次原样重发被拦截，检查状态之后才允许再次执行
+    assert runtime.executed == [{'command': 'ls build'}, {'command': 'rm -rf build'}]
+
+
+def test_interrupted_idempotent_action_is_replayed(monkeypatch, tmp_path):
+    replies = ['<finish><message>done</message></finish>']
+    interrupted = '<search><query>python</query></search>'
+    result, runtime = run_resumed_task(monkeypatch, tmp_path, replies, interrupted, 'search')
+    assert result['status'] == 'success'
+    assert runtime.executed == [{'query': 'python'}]
+
+
+def test_resumed_results_have_the_same_shape(tmp_path):
+    manager = TaskManager(str(tmp_path / 'tasks.json'), 'resume-test')
+    manager.add_task({'title': 'a', 'tools': ['write_code'], 'depends_on': []})
+    manager.update_task_status(1, 'completed', {'result': 'print(1)', 'memorized': 'memory'})
+
+    async def main():
+        scheduler = TaskScheduler(manager, None)
+        for task in manager.get_tasks():
+            scheduler.add(task)
+        scheduler.close()
+        return await scheduler.run()
+
+    results = asyncio.run(main())
+    assert results == [{
+        'status': 'success',
+        'comments': 'Task Success !',
+        'content': 'print(1)',
+        'memorized': 'memory',
+        'meta': {'action_type': 'finish'}
+    }]
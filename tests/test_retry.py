@@ -0,0 +1,66 @@
+import asyncio
+import time
+import aiohttp
+from src.utils.deadline import DeadlineExceeded
+from src.utils.errors import LLMError, RateLimitError
+from src.utils.rate_limit import get_rate_limiter
+from src.utils.resolve import ActionParseError
+from src.utils.retry import FailureRetryPolicy, classify_failure
+
+BACKOFF = {
+    'parse': {'base_delay': 0.0, 'max_delay': 0.0},
+    'tool': {'base_delay': 0.25, 'max_delay': 2.0},
+    'transport': {'base_delay': 1.0, 'max_delay': 20.0}
+}
+
+
+def test_classify_failure():
+    assert classify_failure(ActionParseError('no action', 0)) == FailureRetryPolicy.PARSE
+    assert classify_failure(RateLimitError('rate limited', 1.0)) == FailureRetryPolicy.RATE_LIMIT
+    assert classify_failure(DeadlineExceeded('thinking', 30)) == FailureRetryPolicy.TIMEOUT
+    assert classify_failure(LLMError('bad gateway', status=502)) == FailureRetryPolicy.TRANSPORT
+    assert classify_failure(aiohttp.ClientConnectionError()) == FailureRetryPolicy.TRANSPORT
+    assert classify_failure(RuntimeError('tool failed')) == FailureRetryPolicy.TOOL
+
+
+def test_backoff_grows_per_class_with_jitter_and_cap():
+    policy = FailureRetryPolicy(BACKOFF)
+    for attempt, cap in ((1, 1.0), (2, 2.0), (3, 4.0), (6, 20.0), (10, 20.0)):
+        for _ in range(20):
+            assert cap / 2 <= policy.compute_delay(FailureRetryPolicy.TRANSPORT, attempt) <= cap
+    for _ in range(20):
+        assert 1.0 <= policy.compute_delay(FailureRetryPolicy.TOOL, 4) <= 2.0
+
+
+def test_parse_and_unconfigured_classes():
+    policy = FailureRetryPolicy(BACKOFF)
+    assert policy.compute_delay(FailureRetryPolicy.PARSE, 5) == 0.0
+    # 未配置的类别使用tool的参数
+    assert 0.125 <= policy.compute_delay(FailureRetryPolicy.TIMEOUT, 1) <= 0.25
+
+
+def test_rate_limit_delay_follows_limiter_and_retry_after():
+    limiter = get_rate_limiter('retry-test-model')
+    limiter.blocked_until = time.monotonic() + 3.0
+    policy = FailureRetryPolicy(BACKOFF, model='retry-test-model')
+    assert 2.5 < policy.compute_delay(FailureRetryPolicy.RATE_LIMIT, 1) <= 3.0
+    assert policy.compute_delay(FailureRetryPolicy.RATE_LIMIT, 1, RateLimitError('rate limited', 5.0)) == 5.0
+    limiter.blocked_until = 0.0
+    assert FailureRetryPolicy(BACKOFF).compute_delay(FailureRetryPolicy.RATE_LIMIT, 1) == 0.0
+
+
+def test_backoff_for_records_wall_time_per_class():
+    async def main():
+        policy = FailureRetryPolicy({'tool': {'base_delay': 0.02, 'max_delay': 0.02}})
+        policy.start_attempt()
+        await asyncio.sleep(0.01)
+        delay = await policy.backoff_for(FailureRetryPolicy.TOOL, 1)
+        await policy.backoff_for(FailureRetryPolicy.PARSE, 1)
+        return delay, policy.get_stats()
+
+    delay, stats = asyncio.run(main())
+    assert 0.01 <= delay <= 0.02
+    assert stats['tool']['retries'] == 1
+    assert stats['tool']['attempt_time'] >= 0.01
+    assert stats['tool']['wall_time'] >= 0.02
+    assert stats['parse']['retries'] == 1
@@ -0,0 +1,123 @@
+import asyncio
+import time
+import pytest
+from src.utils.errors import LLMError, RateLimitError
+from src.utils.retry import CircuitBreaker, get_circuit_breaker
+from src.utils.router import LLMRouter
+
+
+class SlowProvider:
+    """响应很慢的后端，用于在请求进行中取消"""
+
+    def __init__(self, base_url: str):
+        self.name = 'slow'
+        self.model = 'slow-model'
+        self.base_url = base_url
+        self.api_key = ''
+
+    async def complete(self, data):
+        await asyncio.sleep(10)
+        return {'content': 'late', 'usage': {}, 'finish_reason': 'stop'}
+
+    async def stream(self, data, meta=None):
+        yield 'partial'
+        await asyncio.sleep(10)
+        yield 'late'
+
+
+class FailingProvider:
+    """每次请求都抛出指定错误的后端"""
+
+    def __init__(self, base_url: str, error: Exception):
+        self.name = 'failing'
+        self.model = 'failing-model'
+        self.base_url = base_url
+        self.api_key = ''
+        self.error = error
+
+    async def complete(self, data):
+        raise self.error
+
+    async def stream(self, data, meta=None):
+        raise self.error
+        yield
+
+
+def half_open(base_url: str) -> CircuitBreaker:
+    """把后端的熔断器置为冷却结束的打开状态，下一次请求即为半开探测"""
+    breaker = get_circuit_breaker(base_url)
+    breaker.state = CircuitBreaker.OPEN
+    breaker.opened_at = time.monotonic() - breaker.recovery_timeout - 1
+    return breaker
+
+
+def test_cancelled_probe_releases_half_open_slot():
+    async def main():
+        breaker = half_open('mock://router-test-complete')
+        router = LLMRouter([SlowProvider('mock://router-test-complete')])
+        task = asyncio.ensure_future(router.complete({'messages': []}))
+        await asyncio.sleep(0.01)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert breaker.allow() is True
+
+    asyncio.run(main())
+
+
+def test_cancelled_streaming_probe_releases_half_open_slot():
+    async def main():
+        breaker = half_open('mock://router-test-stream')
+        router = LLMRouter([SlowProvider('mock://router-test-stream')])
+        received = []
+
+        async def consume():
+            async for delta in router.stream({'messages': []}):
+                received.append(delta)
+
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.01)
+        assert received == ['partial']
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert breaker.allow() is True
+
+    asyncio.run(main())
+
+
+def test_rate_limited_request_does_not_reset_breaker_failures():
+    async def main():
+        breaker = get_circuit_breaker('mock://router-test-429')
+        breaker.record_failure()
+        router = LLMRouter([FailingProvider('mock://router-test-429', RateLimitError('rate limited', 1.0))])
+        with pytest.raises(RateLimitError):
+            await router.complete({'messages': []})
+        with pytest.raises(RateLimitError):
+            async for _ in router.stream({'messages': []}):
+                pass
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.failures == 1
+
+    asyncio.run(main())
+
+
+def test_rate_limited_probe_keeps_breaker_half_open():
+    async def main():
+        breaker = half_open('mock://router-test-429-probe')
+        router = LLMRouter([FailingProvider('mock://router-test-429-probe', RateLimitError('rate limited', 1.0))])
+        with pytest.raises(RateLimitError):
+            await router.complete({'messages': []})
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow() is True
+
+    asyncio.run(main())
+
+
+def test_breaker_record_error_by_error_type():
+    breaker = CircuitBreaker('record-error', failure_threshold=3, recovery_timeout=60)
+    breaker.record_error(LLMError('server error', status=503))
+    breaker.record_error(RateLimitError('rate limited'))
+    assert breaker.failures == 1
+    breaker.record_error(LLMError('bad request', status=400))
+    assert breaker.failures == 0
@@ -0,0 +1,107 @@
+import asyncio
+
+from src.agent.scheduler import TaskScheduler
+
+
+class RecordingTaskManager:
+    def __init__(self):
+        self.updates = []
+
+    def update_task_status(self, task_id, status, result=None):
+        self.updates.append((task_id, status))
+
+
+def make_scheduler(fail=(), delay=0.01, **kwargs):
+    started = []
+
+    async def run_task(task):
+        started.append(task['id'])
+        await asyncio.sleep(delay)
+        if task['id'] in fail:
+            return {'status': 'failure'}
+        return {'status': 'success', 'content': task['id']}
+
+    return TaskScheduler(RecordingTaskManager(), run_task, **kwargs), started
+
+
+def test_dependency_failure_cancels_dependents():
+    async def main():
+        cancelled = []
+        scheduler, started = make_scheduler(fail={1}, on_cancel=lambda task, reason: cancelled.append(task['id']))
+        for task in [
+            {'id': 1, 'depends_on': []},
+            {'id': 2, 'depends_on': [1]},
+            {'id': 3, 'depends_on': [2]},
+            {'id': 4, 'depends_on': []}
+        ]:
+            scheduler.add(task)
+        scheduler.close()
+        results = await scheduler.run()
+        return scheduler, started, cancelled, results
+
+    scheduler, started, cancelled, results = asyncio.run(main())
+    assert sorted(started) == [1, 4]
+    assert cancelled == [2, 3]
+    assert scheduler.status == {'1': 'failed', '2': 'cancelled', '3': 'cancelled', '4': 'completed'}
+    assert (3, 'cancelled') in scheduler.task_manager.updates
+    assert results == [{'status': 'success', 'content': 4}]
+
+
+def test_independent_tasks_run_in_parallel_up_to_limit():
+    async def main():
+        scheduler, _ = make_scheduler(delay=0.1, max_parallel=2)
+        for task_id in range(1, 5):
+            scheduler.add({'id': task_id, 'depends_on': []})
+        scheduler.close()
+        start = asyncio.get_running_loop().time()
+        results = await scheduler.run()
+        return results, asyncio.get_running_loop().time() - start
+
+    results, elapsed = asyncio.run(main())
+    assert [result['content'] for result in results] == [1, 2, 3, 4]
+    assert 0.2 <= elapsed < 0.35
+
+
+def test_tasks_added_while_running_and_unsatisfiable_dependencies():
+    async def main():
+        scheduler, started = make_scheduler()
+        runner = asyncio.ensure_future(scheduler.run())
+        scheduler.add({'id': 1, 'depends_on': []})
+        await asyncio.sleep(0.02)
+        # 流水线规划中后产出的任务，依赖已完成的任务时立即执行
+        scheduler.add({'id': 2, 'depends_on': [1]})
+        scheduler.add({'id': 3, 'depends_on': [4]})
+        scheduler.add({'id': 4, 'depends_on': [3]})
+        scheduler.close()
+        await runner
+        return scheduler, started
+
+    scheduler, started = asyncio.run(main())
+    assert started == [1, 2]
+    assert scheduler.status['3'] == scheduler.status['4'] == 'cancelled'
+
+
+def test_tasks_without_depends_on_run_in_order():
+    async def main():
+        running = []
+        overlaps = []
+
+        async def run_task(task):
+            running.append(task['id'])
+            overlaps.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(task['id'])
+            return {'status': 'failure'} if task['id'] == 2 else {'status': 'success', 'content': task['id']}
+
+        scheduler = TaskScheduler(RecordingTaskManager(), run_task, max_parallel=3)
+        for task_id in range(1, 5):
+            scheduler.add({'id': task_id})
+        scheduler.close()
+        results = await scheduler.run()
+        return scheduler, overlaps, results
+
+    scheduler, overlaps, results = asyncio.run(main())
+    # 旧计划没有depends_on：依次执行，失败后其余任务取消
+    assert overlaps == [1, 1]
+    assert results == [{'status': 'success', 'content': 1}]
+    assert scheduler.status == {'1': 'completed', '2': 'failed', '3': 'cancelled', '4': 'cancelled'}
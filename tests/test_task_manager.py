@@ -0,0 +1,17 @@
+import json
+
+from src.agent.task_manager import TaskManager
+
+
+def test_loads_legacy_list_task_file(tmp_path):
+    log_file = tmp_path / 'tasks.json'
+    log_file.write_text(json.dumps([
+        {'title': '编写脚本', 'description': '编写 hello.py'},
+        {'id': 2, 'title': '运行脚本', 'status': 'completed'}
+    ]), encoding='utf-8')
+    manager = TaskManager(str(log_file), 'conversation')
+    tasks = manager.get_tasks()
+    assert manager.planned
+    assert [task['id'] for task in tasks] == [1, 2]
+    assert [task['status'] for task in tasks] == ['pending', 'completed']
+    assert tasks[0]['requirement'] == '编写 hello.py'
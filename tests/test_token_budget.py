@@ -0,0 +1,86 @@
+import asyncio
+from src.config import get_config
+from src.utils import llm
+from src.utils.token_budget import CONTINUE_PROMPT, OutputBudget, build_continuation
+
+
+class TruncatingRouter:
+    """按顺序返回预设响应的路由，用于模拟max_tokens截断"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.requests = []
+
+    async def complete(self, data):
+        self.requests.append(data)
+        content, finish_reason = self.results.pop(0)
+        return {'content': content, 'finish_reason': finish_reason,
+                'usage': {'completion_tokens': len(content)}, 'provider': 'fake', 'model': data['model']}
+
+
+def patch_llm(monkeypatch, router, max_continuations: int = 2):
+    config = get_config()
+    config.LLM_MAX_CONTINUATIONS = max_continuations
+    config.LLM_CACHE_ENABLED = False
+    monkeypatch.setattr(llm, 'get_config', lambda: config)
+    monkeypatch.setattr(llm, 'get_router', lambda: router)
+
+
+def test_budget_uses_stage_default_until_enough_samples():
+    budget = OutputBudget({'default': 4096, 'planning': 2048}, min_samples=3)
+    budget.record('planning', 100)
+    budget.record('planning', 100)
+    assert budget.max_tokens('planning') == 2048
+    assert budget.max_tokens('thinking') == 4096
+    budget.record('planning', 100)
+    # 样本足够后取分位值乘余量，但不低于下限
+    assert budget.max_tokens('planning') == 256
+
+
+def test_budget_takes_percentile_with_headroom_capped_by_default():
+    budget = OutputBudget({'default': 4096}, percentile=99, headroom=1.25, min_samples=5)
+    for tokens in (400, 500, 600, 700, 800):
+        budget.record('thinking', tokens)
+    assert budget.max_tokens('thinking') == 1000
+    budget.record('thinking', 5000, continuations=2)
+    assert budget.max_tokens('thinking') == 4096
+    stats = budget.get_stats()
+    assert stats['truncated'] == 1
+    assert stats['continuations'] == 2
+    assert stats['stages']['thinking']['samples'] == 6
+
+
+def test_budget_window_drops_old_samples():
+    budget = OutputBudget({'default': 4096}, min_samples=2, window=2)
+    budget.record(None, 3000)
+    budget.record(None, 400)
+    budget.record(None, 400)
+    assert budget.max_tokens(None) == 500
+
+
+def test_build_continuation_appends_partial_and_prompt():
+    messages = [{'role': 'user', 'content': 'write code'}]
+    continued = build_continuation(messages, 'def f(')
+    assert continued[:1] == messages
+    assert continued[1] == {'role': 'assistant', 'content': 'def f('}
+    assert continued[2] == {'role': 'user', 'content': CONTINUE_PROMPT}
+    assert len(messages) == 1
+
+
+def test_truncated_response_is_continued(monkeypatch):
+    router = TruncatingRouter([('def f(', 'length'), ('x):\n', 'length'), ('    return x', 'stop')])
+    patch_llm(monkeypatch, router)
+    content = asyncio.run(llm.call('write code', 'test-continuation', options={'stage': 'thinking'}))
+    assert content == 'def f(x):\n    return x'
+    assert len(router.requests) == 3
+    last = router.requests[-1]['messages']
+    assert last[-2] == {'role': 'assistant', 'content': 'def f(x):\n'}
+    assert last[-1]['content'] == CONTINUE_PROMPT
+
+
+def test_continuations_stop_at_configured_limit(monkeypatch):
+    router = TruncatingRouter([('a', 'length'), ('b', 'length'), ('c', 'length')])
+    patch_llm(monkeypatch, router, max_continuations=1)
+    content = asyncio.run(llm.call('write code', 'test-continuation-limit', options={'stage': 'thinking'}))
+    assert content == 'ab'
+    assert len(router.requests) == 2
@@ -0,0 +1,31 @@
+import asyncio
+
+from src.utils.transport import LLMTransport
+
+
+def test_session_from_previous_event_loop_is_closed():
+    transport = LLMTransport('http://example.invalid')
+
+    async def get_session():
+        return await transport.get_session()
+
+    first = asyncio.run(get_session())
+    second = asyncio.run(get_session())
+    assert first is not second
+    assert first.closed
+    assert asyncio.run(get_session()) is not second and second.closed
+    assert transport.stats['sessions_created'] == 3
+    asyncio.run(transport.close())
+
+
+def test_session_is_reused_within_one_event_loop():
+    transport = LLMTransport('http://example.invalid')
+
+    async def main():
+        sessions = [await transport.get_session() for _ in range(3)]
+        await transport.close()
+        return sessions
+
+    sessions = asyncio.run(main())
+    assert sessions[0] is sessions[1] is sessions[2]
+    assert sessions[0].closed